@@ -6,10 +6,20 @@
 #   export WP_APP_PASSWORD=MivGtw7W7S6z7RTWqJmkbGCu
 #   python import_addresses_rest.py              # uses office.csv next to this script
 #   python import_addresses_rest.py /path/to/offices.csv
+#
+# Incremental: each post keeps the fingerprint of the row it was written from
+# (meta seed_fingerprint, seed-fingerprint.php), so only added and changed rows
+# are pushed. Env (optional):
+#   DRAFT_REMOVED=1  move posts whose csv_id is no longer in the CSV to draft
+#   SYNC_ALL=1       push every row, e.g. to undo edits made in wp-admin
 
 import csv, os, sys, re, requests
 from typing import Dict, Optional
 
+from wpclient import (
+    FINGERPRINT_META, BatchWriter, StateStore, SyncedCollection, WPClient, WriteOp, diff_rows, row_fingerprint,
+)
+
 CSV_REQUIRED = ["ID","ID2","Office","Address","TEL","FAX","Email","URL","Work"]
 
 WP_BASE_URL = os.environ.get("WP_BASE_URL","").rstrip("/")
@@ -17,11 +27,17 @@ WP_USERNAME = os.environ.get("WP_USERNAME","")
 WP_APP_PASSWORD = (os.environ.get("WP_APP_PASSWORD","") or "").replace(" ","")
 if not (WP_BASE_URL and WP_USERNAME and WP_APP_PASSWORD):
     print("Set WP_BASE_URL, WP_USERNAME, WP_APP_PASSWORD", file=sys.stderr); sys.exit(1)
+DRAFT_REMOVED = os.environ.get("DRAFT_REMOVED","0").lower() in ("1","true","yes","on")
+SYNC_ALL = os.environ.get("SYNC_ALL","0").lower() in ("1","true","yes","on")
 
 API = f"{WP_BASE_URL}/wp-json/wp/v2/address"
-S = requests.Session()
-S.auth = (WP_USERNAME, WP_APP_PASSWORD)
-S.headers.update({"Accept":"application/json","Content-Type":"application/json; charset=utf-8"})
+CLIENT = WPClient(WP_BASE_URL, WP_USERNAME, WP_APP_PASSWORD)
+S = CLIENT.session  # pooled keep-alive session shared by every call below
+WRITER = BatchWriter(CLIENT)  # upserts go out 25 per /batch/v1 call
+# existing Address posts (drafts too, so a removed row that returns is found again),
+# cached between runs in the local sync state (SEED_STATE=0 disables)
+ADDRESSES = SyncedCollection(CLIENT, StateStore.for_client(CLIENT), "address",
+                             fields=("id","slug","status","meta"), params={"context":"edit","status":"publish,draft"})
 
 def slugify_id(csv_id: str) -> str:
     # stable, deterministic slug tied to CSV ID
@@ -29,39 +45,33 @@ def slugify_id(csv_id: str) -> str:
     s = re.sub(r"-+","-", s).strip("-").lower()
     return f"address-{s}" if s else "address-unnamed"
 
-def fetch_existing_maps() -> tuple[Dict[str,int], Dict[str,int]]:
-    """Return (by_csv_id, by_slug) maps for existing posts."""
-    by_csv_id: Dict[str,int] = {}
-    by_slug: Dict[str,int] = {}
-    page = 1
-    total = 0
-    while True:
-        r = S.get(API, params={
-            "per_page": 100, "page": page,
-            "context": "edit",                # ensure meta is included with permissions
-            "_fields": "id,slug,meta"         # keep payload small, include meta
-        })
-        if r.status_code == 401:
+def fetch_existing_maps() -> tuple[Dict[str,dict], Dict[str,dict]]:
+    """Return (by_csv_id, by_slug) maps of existing posts.
+
+    Served from the local sync state when it is still valid (see wpclient/state.py);
+    otherwise one paged sweep of id,slug,status,meta (context=edit so meta is included).
+    """
+    by_csv_id: Dict[str,dict] = {}
+    by_slug: Dict[str,dict] = {}
+    try:
+        items = ADDRESSES.load()
+    except requests.HTTPError as e:
+        if e.response.status_code == 401:
             print("401 Unauthorized: check creds/capabilities", file=sys.stderr); sys.exit(1)
-        if r.status_code == 404:
+        if e.response.status_code == 404:
             print("CPT /address not found (is plugin active?)", file=sys.stderr); sys.exit(1)
-        r.raise_for_status()
-        items = r.json()
-        if not items: break
-        for p in items:
-            pid = int(p["id"])
-            total += 1
-            slug = (p.get("slug") or "").strip()
-            if slug: by_slug[slug] = pid
-            meta = p.get("meta") or {}
-            cid = (meta.get("csv_id") or "").strip()
-            if cid: by_csv_id[cid] = pid
-        if len(items) < 100: break
-        page += 1
-    print(f"[INFO] Preloaded {total} address posts (csv_id:{len(by_csv_id)}, slug:{len(by_slug)})")
+        raise
+    for p in items.values():
+        slug = (p.get("slug") or "").strip()
+        if slug: by_slug[slug] = p
+        meta = p.get("meta") or {}
+        cid = (meta.get("csv_id") or "").strip()
+        if cid: by_csv_id[cid] = p
+    src = "sync state" if ADDRESSES.synced_from_cache else "site"
+    print(f"[INFO] Preloaded {len(items)} address posts from {src} (csv_id:{len(by_csv_id)}, slug:{len(by_slug)})")
     return by_csv_id, by_slug
 
-def upsert(row: Dict[str,str], pid: Optional[int]) -> int:
+def upsert(row: Dict[str,str], pid: Optional[int], on_done=None) -> WriteOp:
     payload = {
         "status": "publish",
         "title": row["Office"],
@@ -74,16 +84,12 @@ def upsert(row: Dict[str,str], pid: Optional[int]) -> int:
             "email":   row["Email"],
             "url":     row["URL"],
             "work":    row["Work"],
+            FINGERPRINT_META: row_fingerprint(row),
         },
         # make slug stable so future runs can find it even if meta lookup fails
         "slug": slugify_id(row["ID"]),
     }
-    if pid:
-        r = S.post(f"{API}/{pid}", json=payload)
-    else:
-        r = S.post(API, json=payload)
-    r.raise_for_status()
-    return int(r.json()["id"])
+    return WRITER.add("POST", f"address/{pid}" if pid else "address", payload, on_done=on_done)
 
 def main():
     # default to office.csv in the same directory as this script,
@@ -110,7 +116,8 @@ def main():
 
     by_csv_id, by_slug = fetch_existing_maps()
 
-    created = updated = skipped = 0
+    rows: Dict[str,Dict[str,str]] = {}
+    skipped = 0
     with open(csv_path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         missing = [h for h in CSV_REQUIRED if h not in reader.fieldnames]
@@ -121,27 +128,60 @@ def main():
             row = {k:(raw.get(k,"") or "").strip() for k in CSV_REQUIRED}
             if not row["ID"] or not row["Office"]:
                 print(f"[WARN] Row {i}: missing ID or Office — skipping"); skipped += 1; continue
-
-            # primary: by csv_id; fallback: by expected slug
-            pid = by_csv_id.get(row["ID"])
-            if not pid:
-                pid = by_slug.get(slugify_id(row["ID"]))
-
-            try:
-                nid = upsert(row, pid)
-                if pid:
-                    updated += 1
-                    print(f"[OK] Updated {row['ID']} (post_id={nid})")
-                else:
-                    created += 1
-                    print(f"[OK] Created {row['ID']} (post_id={nid})")
-                # keep maps up-to-date for subsequent duplicates in same run
-                by_csv_id[row["ID"]] = nid
-                by_slug[slugify_id(row["ID"])] = nid
-            except requests.HTTPError as e:
-                print(f"[FAIL] Row {i} {row['ID']}: HTTP {e.response.status_code} -> {e.response.text}", file=sys.stderr)
-
-    print(f"\nDone. Created: {created}, Updated: {updated}, Skipped: {skipped}")
+            if row["ID"] in rows:
+                print(f"[WARN] Row {i}: {row['ID']} repeated — this row replaces the earlier one")
+            rows[row["ID"]] = row
+
+    # the post each row was written to: primary by csv_id, fallback by expected slug
+    existing = dict(by_csv_id)
+    for cid in rows:
+        if cid not in existing and slugify_id(cid) in by_slug:
+            existing[cid] = by_slug[slugify_id(cid)]
+    diff = diff_rows(rows, existing)
+    push = diff.added + diff.changed + (diff.unchanged if SYNC_ALL else [])
+    print(f"[INFO] Rows: {len(diff.added)} added, {len(diff.changed)} changed, "
+          f"{len(diff.unchanged)} unchanged{' (pushed anyway: SYNC_ALL)' if SYNC_ALL else ''}, "
+          f"{len(diff.removed)} no longer in the CSV")
+
+    created = updated = drafted = failed = 0
+
+    def report(cid: str, pid: Optional[int], what: str = ""):
+        def done(op: WriteOp):
+            nonlocal created, updated, drafted, failed
+            if not op.ok:
+                failed += 1
+                print(f"[FAIL] {cid}: HTTP {op.status} -> {op.data}", file=sys.stderr)
+                return
+            ADDRESSES.put(op.data)
+            if what == "draft":
+                drafted += 1
+                print(f"[OK] Drafted {cid} (post_id={op.data['id']}): no longer in the CSV")
+            elif pid:
+                updated += 1
+                print(f"[OK] Updated {cid} (post_id={op.data['id']})")
+            else:
+                created += 1
+                print(f"[OK] Created {cid} (post_id={op.data['id']})")
+        return done
+
+    for cid in push:
+        pid = int(existing[cid]["id"]) if existing.get(cid) else None
+        upsert(rows[cid], pid, on_done=report(cid, pid))
+
+    if DRAFT_REMOVED:
+        for cid in diff.removed:
+            post = existing[cid]
+            if post.get("status", "publish") != "publish":
+                continue
+            # clearing the fingerprint makes the row count as changed (and republish) if it comes back
+            WRITER.add("POST", f"address/{post['id']}", {"status":"draft", "meta":{FINGERPRINT_META:""}},
+                       on_done=report(cid, int(post["id"]), "draft"))
+    elif diff.removed:
+        print(f"[INFO] Left {len(diff.removed)} posts not in the CSV as they are (DRAFT_REMOVED=1 drafts them)")
+    WRITER.flush()
+
+    print(f"\nDone. Created: {created}, Updated: {updated}, Unchanged: {0 if SYNC_ALL else len(diff.unchanged)}, "
+          f"Drafted: {drafted}, Skipped: {skipped}, Failed: {failed} ({WRITER.requests_sent} write requests)")
 
 if __name__ == "__main__":
     main()
@@ -8,9 +8,13 @@ Optional:
   OFFICES_CSV   (default: seeders/offices.csv)
   ENSURE_ADDRESS=1 to create/update Address if missing (default: 0)
 """
-import os, sys, csv, re, requests
+import os, sys, csv, re
 from typing import Dict, Tuple, Optional
 
+import requests
+
+from wpclient import BatchWriter, StateStore, SyncedCollection, WPClient, WriteOp
+
 CSV_REQUIRED = ["ID","ID2","Office","Address","TEL","FAX","Email","URL","Work"]
 
 BASE = (os.environ.get("WP_BASE_URL") or "").rstrip("/")
@@ -24,9 +28,16 @@ ENSURE_ADDRESS = str(os.environ.get("ENSURE_ADDRESS","0")).lower() in ("1","true
 API_ADDR = f"{BASE}/wp-json/wp/v2/address"
 API_CAT  = f"{BASE}/wp-json/wp/v2/categories"
 
-S = requests.Session()
-S.auth = (USER, PASS)
-S.headers.update({"Accept":"application/json","Content-Type":"application/json; charset=utf-8"})
+CLIENT = WPClient(BASE, USER, PASS)
+S = CLIENT.session  # pooled keep-alive session shared by every call below
+WRITER = BatchWriter(CLIENT)  # address/category upserts go out 25 per /batch/v1 call
+# Remote inventories, cached between runs in the local sync state (SEED_STATE=0 disables).
+# Same field set as data-seeding-addresses.py so both scripts share one cache entry.
+STATE = StateStore.for_client(CLIENT)
+ADDRESSES = SyncedCollection(CLIENT, STATE, "address", fields=("id","slug","status","meta"),
+                             params={"context":"edit","status":"publish,draft"})
+CATEGORIES = SyncedCollection(CLIENT, STATE, "categories", fields=("id","slug","parent","meta","name"),
+                              params={"context":"edit"}, deltas=False)  # terms have no modified_after: swept every run
 
 def slugify(s:str)->str:
     s = re.sub(r"[^a-zA-Z0-9_-]+","-", (s or "").strip())
@@ -39,20 +50,6 @@ def get_csv_path()->str:
     here = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(here,"offices.csv")
 
-def fetch_all(url, fields)->list:
-    out, page = [], 1
-    while True:
-        r = S.get(url, params={"per_page":100,"page":page,"context":"edit","_fields":fields}, timeout=15)
-        if r.status_code == 404:
-            print(f"404 at {url} (is endpoint/meta registered?)", file=sys.stderr); sys.exit(1)
-        r.raise_for_status()
-        items = r.json()
-        if not items: break
-        out.extend(items)
-        if len(items) < 100: break
-        page += 1
-    return out
-
 def ensure_parent_branch()->int:
     r = S.get(API_CAT, params={"slug":"branch","_fields":"id,slug"}, timeout=10); r.raise_for_status()
     items = r.json()
@@ -60,9 +57,20 @@ def ensure_parent_branch()->int:
     r = S.post(API_CAT, json={"name":"Branch","slug":"branch","parent":0}, timeout=15); r.raise_for_status()
     return int(r.json()["id"])
 
+def load_all(coll:SyncedCollection)->Dict[int,dict]:
+    """coll.load(), exiting with a hint when the route is missing (CPT/plugin not active)."""
+    try:
+        return coll.load()
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            print(f"404 at {e.response.url} (is endpoint/meta registered?)", file=sys.stderr); sys.exit(1)
+        raise
+
 def load_address_maps()->Tuple[Dict[str,int], Dict[str,int]]:
     by_csv, by_slug = {}, {}
-    for a in fetch_all(API_ADDR,"id,slug,meta,title"):
+    for a in load_all(ADDRESSES).values():
+        # the shared inventory also holds addresses the address seeder drafted; never link to those
+        if a.get("status") != "publish": continue
         aid  = int(a["id"])
         slug = (a.get("slug") or "").strip()
         if slug: by_slug[slug] = aid
@@ -74,7 +82,7 @@ def load_address_maps()->Tuple[Dict[str,int], Dict[str,int]]:
 def load_branch_cat_maps(parent_id:int)->Tuple[Dict[str,int], Dict[str,int]]:
     by_code, by_slug = {}, {}
     # Get only descendants of the parent to keep scope tight
-    cats = fetch_all(API_CAT, "id,slug,parent,meta,name")
+    cats = load_all(CATEGORIES).values()
     for c in cats:
         if int(c.get("parent") or 0) != parent_id: continue
         tid  = int(c["id"])
@@ -88,7 +96,7 @@ def load_branch_cat_maps(parent_id:int)->Tuple[Dict[str,int], Dict[str,int]]:
 def addr_slug(csv_id:str)->str:   return f"address-{slugify(csv_id)}"
 def branch_slug(csv_id:str)->str: return f"branch-{slugify(csv_id)}"
 
-def upsert_address(row:dict, existing_id:Optional[int])->int:
+def upsert_address(row:dict, existing_id:Optional[int], on_done=None)->WriteOp:
     payload = {
         "status":"publish",
         "title": row["Office"],
@@ -99,20 +107,17 @@ def upsert_address(row:dict, existing_id:Optional[int])->int:
             "url":     row["URL"], "work":   row["Work"],
         }
     }
-    r = S.post(f"{API_ADDR}/{existing_id}" if existing_id else API_ADDR, json=payload, timeout=15)
-    r.raise_for_status()
-    return int(r.json()["id"])
+    return WRITER.add("POST", f"address/{existing_id}" if existing_id else "address", payload, on_done=on_done)
 
-def upsert_branch_category(code:str, name:str, parent_id:int, address_id:int, existing_id:Optional[int])->int:
+def upsert_branch_category(code:str, name:str, parent_id:int, address_id:int, existing_id:Optional[int],
+                           on_done=None)->WriteOp:
     payload = {
         "name":  name or f"Branch {code}",
         "slug":  branch_slug(code),
         "parent": parent_id,
         "meta": {"csv_id": code, "address_post_id": address_id}
     }
-    r = S.post(f"{API_CAT}/{existing_id}" if existing_id else API_CAT, json=payload, timeout=15)
-    r.raise_for_status()
-    return int(r.json()["id"])
+    return WRITER.add("POST", f"categories/{existing_id}" if existing_id else "categories", payload, on_done=on_done)
 
 def main():
     csv_path = get_csv_path()
@@ -127,8 +132,9 @@ def main():
     addr_by_csv, addr_by_slug = load_address_maps()
     br_by_code, br_by_slug   = load_branch_cat_maps(parent_id)
 
-    created_b = updated_b = created_a = skipped = 0
+    created_b = updated_b = created_a = skipped = failed = 0
 
+    rows = []
     with open(csv_path, newline="", encoding="utf-8") as f:
         rdr = csv.DictReader(f)
         missing = [h for h in CSV_REQUIRED if h not in rdr.fieldnames]
@@ -139,40 +145,80 @@ def main():
             row = {k:(raw.get(k,"") or "").strip() for k in CSV_REQUIRED}
             if not row["ID"] or not row["Office"]:
                 print(f"[WARN] Row {i}: missing ID or Office — skipping"); skipped += 1; continue
-
+            rows.append(row)
+
+    # Pass 1: create missing Address posts (batched) so every category below has its addr_id
+    addr_failed = set()
+
+    def address_done(code:str):
+        def done(op:WriteOp):
+            nonlocal created_a
+            if not op.ok:
+                addr_failed.add(code)
+                print(f"[FAIL] Address {code}: HTTP {op.status} -> {op.data}", file=sys.stderr)
+                return
+            aid = int(op.data["id"])
+            ADDRESSES.put(op.data)
+            created_a += 1
+            addr_by_csv[code] = aid
+            addr_by_slug[addr_slug(code)] = aid
+            print(f"[OK] Created Address {code} (post_id={aid})")
+        return done
+
+    if ENSURE_ADDRESS:
+        queued = set()
+        for row in rows:
             code = row["ID"]
-            aid = addr_by_csv.get(code) or addr_by_slug.get(addr_slug(code))
-            if not aid and ENSURE_ADDRESS:
-                try:
-                    aid = upsert_address(row, None)
-                    created_a += 1
-                    addr_by_csv[code] = aid
-                    addr_by_slug[addr_slug(code)] = aid
-                    print(f"[OK] Created Address {code} (post_id={aid})")
-                except requests.HTTPError as e:
-                    print(f"[FAIL] Address {code}: HTTP {e.response.status_code} -> {e.response.text}", file=sys.stderr)
-                    continue
-            if not aid:
-                print(f"[SKIP] {code}: Address not found and ENSURE_ADDRESS=0", file=sys.stderr)
-                skipped += 1
+            if code in queued or addr_by_csv.get(code) or addr_by_slug.get(addr_slug(code)):
                 continue
-
-            tid = br_by_code.get(code) or br_by_slug.get(branch_slug(code))
-            try:
-                nid = upsert_branch_category(code, row["Office"], parent_id, aid, tid)
-                if tid:
-                    updated_b += 1
-                    print(f"[OK] Updated Branch category {code} (term_id={nid}, addr_id={aid})")
-                else:
-                    created_b += 1
-                    print(f"[OK] Created Branch category {code} (term_id={nid}, addr_id={aid})")
-                br_by_code[code] = nid
-                br_by_slug[branch_slug(code)] = nid
-            except requests.HTTPError as e:
-                print(f"[FAIL] Branch {code}: HTTP {e.response.status_code} -> {e.response.text}", file=sys.stderr)
+            queued.add(code)
+            upsert_address(row, None, on_done=address_done(code))
+        WRITER.flush()
+
+    # Pass 2: upsert Branch categories (batched)
+    def branch_done(code:str, aid:int, tid:Optional[int]):
+        def done(op:WriteOp):
+            nonlocal created_b, updated_b, failed
+            if not op.ok:
+                failed += 1
+                print(f"[FAIL] Branch {code}: HTTP {op.status} -> {op.data}", file=sys.stderr)
+                return
+            nid = int(op.data["id"])
+            CATEGORIES.put(op.data)
+            if tid:
+                updated_b += 1
+                print(f"[OK] Updated Branch category {code} (term_id={nid}, addr_id={aid})")
+            else:
+                created_b += 1
+                print(f"[OK] Created Branch category {code} (term_id={nid}, addr_id={aid})")
+            br_by_code[code] = nid
+            br_by_slug[branch_slug(code)] = nid
+        return done
+
+    queued_new = set()  # codes whose category create is still queued
+    for row in rows:
+        code = row["ID"]
+        if code in addr_failed:
+            continue
+        aid = addr_by_csv.get(code) or addr_by_slug.get(addr_slug(code))
+        if not aid:
+            print(f"[SKIP] {code}: Address not found and ENSURE_ADDRESS=0", file=sys.stderr)
+            skipped += 1
+            continue
+
+        tid = br_by_code.get(code) or br_by_slug.get(branch_slug(code))
+        # a repeated code must update the term its first row creates
+        if not tid and code in queued_new:
+            WRITER.flush()
+            tid = br_by_code.get(code)
+        if not tid:
+            queued_new.add(code)
+        upsert_branch_category(code, row["Office"], parent_id, aid, tid, on_done=branch_done(code, aid, tid))
+    WRITER.flush()
 
     print(f"\nDone. Branch cats created:{created_b}, updated:{updated_b}, "
-          f"Addresses created:{created_a}, Skipped:{skipped}")
+          f"Addresses created:{created_a}, Skipped:{skipped}, Failed:{failed} "
+          f"({WRITER.requests_sent} write requests)")
 
 if __name__ == "__main__":
     main()
@@ -12,41 +12,40 @@ Usage:
 """
 from __future__ import annotations
 import os, sys, json, argparse, html
-from urllib.parse import urljoin
-import requests
 from string import Template
 
+from wpclient import SlugIndex, WPClient
+
 BASE = (os.getenv("WP_BASE_URL") or os.getenv("WP_URL") or "").rstrip("/")
 USER = os.getenv("WP_USERNAME") or os.getenv("ADMIN_USER") or ""
 PASS = (os.getenv("WP_APP_PASSWORD") or "").replace(" ", "")
 VERIFY = os.getenv("WP_VERIFY_SSL", "1").lower() not in ("0","false","no")
-HDRS = {"Accept":"application/json","Content-Type":"application/json; charset=utf-8"}
+_CLIENT: WPClient | None = None
+_INDEX: dict[str, SlugIndex] = {}
 
 def die(msg: str, code: int = 1):
     print(msg, file=sys.stderr); sys.exit(code)
 
+def client() -> WPClient:
+    global _CLIENT
+    if _CLIENT is None:
+        if not (BASE and USER and PASS):
+            die("Set WP_BASE_URL, WP_USERNAME, WP_APP_PASSWORD")
+        _CLIENT = WPClient(BASE, USER, PASS, verify=VERIFY)
+    return _CLIENT
+
 def req(method: str, path: str, *, params: dict | None = None, body: dict | None = None):
-    if not (BASE and USER and PASS):
-        die("Set WP_BASE_URL, WP_USERNAME, WP_APP_PASSWORD")
-    url = urljoin(BASE + "/", f"wp-json/wp/v2/{path}")
-    r = requests.request(
-        method,
-        url,
-        params=params,
-        data=(json.dumps(body) if body else None),
-        auth=(USER, PASS),
-        headers=HDRS,
-        timeout=30,
-        verify=VERIFY,
-    )
+    r = client().request(method, path, params=params, json=(body if body else None), timeout=30)
     if r.status_code == 404:
         return None
     r.raise_for_status()
     return r.json()
 
 def get_by_slug(kind: str, slug: str):
-    arr = req("GET", kind, params={"slug": slug})
-    return arr[0] if isinstance(arr, list) and arr else None
+    # id/slug only: the full item (with block content) is never needed here
+    if kind not in _INDEX:
+        _INDEX[kind] = SlugIndex(client(), kind)
+    return _INDEX[kind].get(slug)
 
 def upsert(kind: str, slug: str, payload: dict, *, update: bool):
     ex = get_by_slug(kind, slug)
@@ -57,7 +56,10 @@ def upsert(kind: str, slug: str, payload: dict, *, update: bool):
         print(f"[update] {kind} #{ex['id']} ({slug})")
         return req("POST", f"{kind}/{ex['id']}", body=payload)
     print(f"[create] {kind} {slug}")
-    return req("POST", kind, body=payload)
+    created = req("POST", kind, body=payload)
+    if created:
+        _INDEX[kind].put(created)
+    return created
 
 def pick_media():
     """Prefer the newest attachment; fall back to picsum."""
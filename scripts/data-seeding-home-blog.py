@@ -25,9 +25,10 @@ import json
 from typing import Optional
 
 try:
-    import requests
-except ImportError:
-    sys.stderr.write("This script requires the 'requests' package.\n")
+    from wpclient import SlugIndex, WPClient
+except ImportError as e:
+    sys.stderr.write(f"This script requires the 'wpclient' package (scripts/wpclient) and its "
+                     f"dependency 'requests' ({e}).\nRun it from scripts/; install with: pip install requests\n")
     sys.exit(1)
 
 BASE = os.environ.get("WP_BASE_URL") or os.environ.get("WP_URL") or "https://wp.lan"
@@ -40,16 +41,13 @@ if not PASS:
     sys.stderr.write("[skip] reading setup: missing WP_APP_PASSWORD\n")
     sys.exit(0)
 
-API = BASE.rstrip("/") + "/wp-json/wp/v2"
-
-s = requests.Session()
-s.auth = (USER, PASS)
-s.headers.update({"Accept": "application/json", "Content-Type": "application/json"})
+wp = WPClient(BASE, USER, PASS, verify=VERIFY, timeout=TIMEOUT)
+# context=edit returns broader visibility when authenticated
+pages = SlugIndex(wp, "pages", fields=("id", "slug", "status"), params={"context": "edit"})
 
 
 def _req(method: str, path: str, *, params=None, data=None):
-    url = f"{API}/{path.lstrip('/')}"
-    r = s.request(method, url, params=params, json=data, timeout=TIMEOUT, verify=VERIFY)
+    r = wp.request(method, path, params=params, json=data)
     # Helpful error surface
     if not r.ok:
         try:
@@ -61,11 +59,8 @@ def _req(method: str, path: str, *, params=None, data=None):
 
 
 def get_page_by_slug(slug: str) -> Optional[int]:
-    # context=edit returns broader visibility when authenticated
-    res = _req("GET", "pages", params={"slug": slug, "context": "edit", "_fields": "id,slug,status"})
-    if isinstance(res, list) and res:
-        return int(res[0]["id"])
-    return None
+    res = pages.get(slug)
+    return int(res["id"]) if res else None
 
 
 def ensure_page(slug: str, title: str) -> int:
@@ -79,6 +74,7 @@ def ensure_page(slug: str, title: str) -> int:
         "pages",
         data={"title": title, "slug": slug, "status": "publish"},
     )
+    pages.put(created)
     pid = int(created["id"])
     print(f"[OK] Created {title!r} page (id={pid})")
     return pid
@@ -95,6 +91,7 @@ def update_settings(payload: dict) -> dict:
 
 def main():
     print("[STEP] Ensuring Home / Blog pages…")
+    pages.prefetch(["home", "blog"])  # one lookup for both
     home_id = ensure_page("home", "Home")
     blog_id = ensure_page("blog", "Blog")
 
@@ -6,10 +6,16 @@ Seed WordPress media library with images from Pexels (idempotent).
 Idempotence:
   - For each Pexels photo, we compute slug = "pexels-<id>".
   - If a media item already exists with that slug, we SKIP uploading.
-    (Uses GET /wp/v2/media?slug=pexels-<id>)
+    (One upfront sweep of the media library (id/slug/title/alt/caption)
+    answers every existence check, including legacy "Pexels <id>" titles,
+    with no per-photo requests, and tells which text fields need a write.)
+  - Each upload stores the sha256 of its bytes in attachment meta
+    (`seed_sha256`, seed-fingerprint.php mu-plugin). A photo whose bytes are
+    already in the library (e.g. fetched under another src key, or with
+    --force-new) is not uploaded again.
 
 Auth (required):
-  PEXELS_API_KEY       - your Pexels API key
+  PEXELS_API_KEY       - your Pexels API key (not needed with --offline)
   WP_APP_PASSWORD      - WordPress application password for WP user
 
 Behavior:
@@ -21,8 +27,36 @@ Behavior:
   PEXELS_SRC_KEY       - src key to upload from Pexels
                          [original|large2x|large|medium|small|portrait|landscape|tiny]
                          (default: original)
-  MEDIA_FORCE_NEW      - "1" to bypass idempotence and always upload (default: 0)
-  MEDIA_UPDATE_EXISTING- "1" to update title/alt/caption if item exists (default: 1)
+  MEDIA_FORCE_NEW      - "1" to bypass slug idempotence and always upload (default: 0)
+  MEDIA_DEDUP          - "0" to upload even when identical bytes exist (default: 1)
+  MEDIA_UPDATE_EXISTING- "1" to update title/alt/caption if item exists (default: 1);
+                         only fields that differ from the stored ones are written
+  API_CACHE_TTL        - seconds Pexels search/curated responses are reused
+                         without asking (default: 21600); older ones are
+                         revalidated (wpclient/httpcache.py; API_CACHE=0 disables)
+  MEDIA_OFFLINE        - "1" to seed only from the local asset cache, with no
+                         Pexels traffic at all (mode/query are ignored)
+  MEDIA_MULTIPART      - "0" to skip the one-request multipart upload and always
+                         create + update in two steps (default: 1; falls back
+                         automatically when the server rejects multipart)
+  MEDIA_DERIVATIVES    - "0" to let WordPress render thumbnail/medium/large itself
+                         (default: 1 when Pillow is installed). Sizes are rendered
+                         here in a process pool and uploaded with the original via
+                         myplugin/v1/media/bundle (pdf-preview-stub mu-plugin); sites
+                         without that route get the plain upload.
+
+Pipeline (lookup -> download -> derive -> upload -> meta, joined by bounded queues):
+  MEDIA_LOOKUP_WORKERS   - existence checks in parallel   (default: 2)
+  MEDIA_DOWNLOAD_WORKERS - Pexels downloads in parallel   (default: 4)
+  MEDIA_DERIVE_WORKERS   - resizing processes             (default: CPU count)
+  MEDIA_UPLOAD_WORKERS   - WordPress uploads in parallel  (default: 2)
+  Downloads are streamed to a spooled temp file and uploads stream from it, so
+  memory per worker stays ~1 MiB whatever the image size.
+  Downloads go through a content-addressed, sha256-verified, size-bounded
+  LRU cache (wpclient/assetcache.py; ASSET_CACHE_DIR, ASSET_CACHE_MAX_MB,
+  ASSET_CACHE=0), so reseeding from the same photo set needs no bandwidth.
+  (meta/text updates for existing items, and for new ones after a two-step
+   fallback, are batched through /batch/v1 by a single worker)
 
 WP connection:
   WP_BASE_URL or WP_URL  - base URL (e.g., https://wp.lan)
@@ -33,15 +67,29 @@ from __future__ import annotations
 import argparse
 import math
 import mimetypes
+import multiprocessing
 import os
 import random
+import re
+import shutil
 import sys
-import time
-from typing import Any, Dict, List, Tuple
-from urllib.parse import urljoin
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
 import requests
 
+from wpclient import (
+    DEFAULT_POOL_SIZE, BatchWriter, MediaUploader, SlugIndex, Stage, StateStore, WPClient, WriteOp, make_session,
+    CONTENT_HASH_META, AssetCache, ResponseCache, changed_fields, content_hash, get_json, run_pipeline, spool,
+    stored_fingerprint,
+)
+from wpclient import derivatives
+from wpclient.streams import CHUNK
+
 
 def evar(name: str, default: str | None = None) -> str | None:
     v = os.environ.get(name)
@@ -66,6 +114,12 @@ def wp_auth() -> Tuple[str, str]:
     return user, app_pw
 
 
+def log(msg: str) -> None:
+    """One write per line: pipeline stages log from several threads at once."""
+    sys.stderr.write(msg + "\n")
+    sys.stderr.flush()
+
+
 def bool_env(name: str, default: bool = True) -> bool:
     v = os.environ.get(name)
     if v is None:
@@ -73,10 +127,16 @@ def bool_env(name: str, default: bool = True) -> bool:
     return v not in ("0", "false", "False", "no", "NO")
 
 
-def http() -> requests.Session:
-    s = requests.Session()
-    s.headers["User-Agent"] = "media-seeder/1.2-idempotent (+python-requests)"
-    return s
+USER_AGENT = "media-seeder/1.2-idempotent (+python-requests)"
+
+
+def http(pool_size: int | None = None) -> requests.Session:
+    """Pooled session for Pexels (API + image CDN); carries no WP credentials.
+
+    429s (with Retry-After) and 5xx are retried by the shared governor in
+    wpclient; budget the host with WP_RATE_LIMITS="api.pexels.com=N".
+    """
+    return make_session(pool_size=pool_size, user_agent=USER_AGENT)
 
 
 # ------------------- Pexels fetchers -------------------
@@ -85,6 +145,10 @@ def _pexels_headers(s: requests.Session, api_key: str) -> None:
     s.headers["Authorization"] = api_key
 
 
+PEXELS_SEARCH = "https://api.pexels.com/v1/search"
+PEXELS_CURATED = "https://api.pexels.com/v1/curated"
+
+
 def pexels_random_photos(
     s: requests.Session,
     api_key: str,
@@ -93,37 +157,33 @@ def pexels_random_photos(
     per_page: int = 80,
     orientation: str | None = None,
     size: str | None = None,
+    cache: ResponseCache | None = None,
 ) -> List[Dict[str, Any]]:
     _pexels_headers(s, api_key)
 
-    base_params: Dict[str, Any] = {"query": query, "per_page": 1}
+    base_params: Dict[str, Any] = {"query": query, "per_page": per_page}
     if orientation:
         base_params["orientation"] = orientation
     if size:
         base_params["size"] = size
 
-    r = s.get("https://api.pexels.com/v1/search", params=base_params, timeout=20)
-    r.raise_for_status()
-    total = int(r.json().get("total_results", 0))
-    pages = max(1, math.ceil(total / per_page))
+    # Page 1 gives total_results and is a candidate page itself (no per_page=1 probe)
+    first = get_json(s, cache, PEXELS_SEARCH, {**base_params, "page": 1}, timeout=30)
+    total = int(first.get("total_results", 0))
+    pages = list(range(1, max(1, math.ceil(total / per_page)) + 1))
+    random.shuffle(pages)
+    if cache:
+        # pages still fresh in the cache come first, so repeat runs within the TTL cost nothing
+        pages.sort(key=lambda pg: not cache.is_fresh(PEXELS_SEARCH, {**base_params, "page": pg}))
 
     photos: List[Dict[str, Any]] = []
-    while len(photos) < count:
-        page = random.randint(1, max(1, pages))
-        params = {**base_params, "per_page": per_page, "page": page}
-        r = s.get("https://api.pexels.com/v1/search", params=params, timeout=30)
-        if r.status_code == 429:
-            time.sleep(int(r.headers.get("Retry-After", "2")))
-            continue
-        r.raise_for_status()
-        batch = r.json().get("photos", []) or []
-        if not batch:
+    for page in pages:
+        if len(photos) >= count:
             break
+        data = first if page == 1 else get_json(s, cache, PEXELS_SEARCH, {**base_params, "page": page}, timeout=30)
+        batch = list(data.get("photos", []) or [])
         random.shuffle(batch)
-        for p in batch:
-            photos.append(p)
-            if len(photos) >= count:
-                break
+        photos.extend(batch[:count - len(photos)])
     return photos[:count]
 
 
@@ -132,21 +192,15 @@ def pexels_curated_photos(
     api_key: str,
     count: int,
     per_page: int = 80,
+    cache: ResponseCache | None = None,
 ) -> List[Dict[str, Any]]:
     _pexels_headers(s, api_key)
     photos: List[Dict[str, Any]] = []
     page = 1
+    # fixed page size: stable page boundaries, so pages are reusable cache entries
+    params: Dict[str, Any] = {"per_page": min(per_page, count)}
     while len(photos) < count:
-        r = s.get(
-            "https://api.pexels.com/v1/curated",
-            params={"page": page, "per_page": min(per_page, count - len(photos))},
-            timeout=30,
-        )
-        if r.status_code == 429:
-            time.sleep(int(r.headers.get("Retry-After", "2")))
-            continue
-        r.raise_for_status()
-        batch = r.json().get("photos", [])
+        batch = get_json(s, cache, PEXELS_CURATED, {**params, "page": page}, timeout=30).get("photos", [])
         if not batch:
             break
         photos.extend(batch)
@@ -162,6 +216,7 @@ def pexels_top_photos(
     per_page: int = 80,
     orientation: str | None = None,
     size: str | None = None,
+    cache: ResponseCache | None = None,
 ) -> List[Dict[str, Any]]:
     _pexels_headers(s, api_key)
     params: Dict[str, Any] = {"query": query, "page": 1, "per_page": min(per_page, count)}
@@ -171,12 +226,7 @@ def pexels_top_photos(
         params["size"] = size
     photos: List[Dict[str, Any]] = []
     while len(photos) < count:
-        r = s.get("https://api.pexels.com/v1/search", params=params, timeout=30)
-        if r.status_code == 429:
-            time.sleep(int(r.headers.get("Retry-After", "2")))
-            continue
-        r.raise_for_status()
-        batch = r.json().get("photos", [])
+        batch = get_json(s, cache, PEXELS_SEARCH, params, timeout=30).get("photos", [])
         if not batch:
             break
         photos.extend(batch)
@@ -186,140 +236,145 @@ def pexels_top_photos(
 
 # ------------------- WordPress helpers -------------------
 
-def wp_check_me(s: requests.Session, base_url: str, auth: Tuple[str, str], verify_ssl: bool) -> None:
-    endpoint = urljoin(base_url + "/", "wp-json/wp/v2/users/me")
-    r = s.get(endpoint, auth=auth, timeout=20, verify=verify_ssl)
-    r.raise_for_status()
+def wp_client(verify_ssl: bool, pool_size: int | None = None) -> WPClient:
+    user, app_pw = wp_auth()
+    return WPClient(wp_base_url(), user, app_pw, verify=verify_ssl, pool_size=pool_size, user_agent=USER_AGENT)
 
 
-def wp_find_media_by_slug(
-    s: requests.Session,
-    base_url: str,
-    auth: Tuple[str, str],
-    slug: str,
-    verify_ssl: bool,
-) -> Dict[str, Any] | None:
-    """Return first media with exact slug, else None."""
-    endpoint = urljoin(base_url + "/", "wp-json/wp/v2/media")
-    r = s.get(
-        endpoint,
-        auth=auth,
-        params={"slug": slug, "per_page": 1, "status": "inherit"},
-        timeout=20,
-        verify=verify_ssl,
-    )
+def wp_check_me(wp: WPClient) -> None:
+    r = wp.get("users/me", timeout=20)
     r.raise_for_status()
-    items = r.json() if isinstance(r.json(), list) else []
-    return items[0] if items else None
 
 
-def wp_search_media_fallback(
-    s: requests.Session,
-    base_url: str,
-    auth: Tuple[str, str],
-    query: str,
-    verify_ssl: bool,
-) -> Dict[str, Any] | None:
-    """Fallback for legacy runs (before slugs were stable)."""
-    endpoint = urljoin(base_url + "/", "wp-json/wp/v2/media")
-    r = s.get(
-        endpoint,
-        auth=auth,
-        params={"search": query, "media_type": "image", "per_page": 5},
-        timeout=20,
-        verify=verify_ssl,
-    )
-    r.raise_for_status()
-    for item in (r.json() if isinstance(r.json(), list) else []):
-        slug = (item.get("slug") or "").lower()
-        title = (item.get("title", {}).get("rendered") or "").lower()
-        if query.replace(" ", "-") in slug or query in title:
-            return item
-    return None
+LEGACY_PEXELS_RE = re.compile(r"pexels[\s_-]+(\d+)(?!\d)", re.IGNORECASE)
 
 
-def wp_update_media_fields(
-    s: requests.Session,
-    base_url: str,
-    auth: Tuple[str, str],
-    media_id: int,
-    data: Dict[str, Any],
-    verify_ssl: bool,
-) -> Dict[str, Any]:
-    """Update title/alt/caption if needed."""
-    endpoint = urljoin(base_url + "/", f"wp-json/wp/v2/media/{media_id}")
-    r = s.post(endpoint, auth=auth, data=data, timeout=30, verify=verify_ssl)
-    r.raise_for_status()
-    return r.json()
-
+def wp_media_inventory(wp: WPClient) -> Tuple[SlugIndex, Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """All media, swept once: (slug index, Pexels id -> item for legacy uploads,
+    content hash -> item).
 
-def wp_upload_media(
-    s: requests.Session,
-    base_url: str,
-    auth: tuple[str, str],
-    filename: str,
-    blob: bytes,
-    content_type: str,
-    slug: str,
-    title: str,
-    alt_text: str,
-    caption: str,
-    verify_ssl: bool,
-) -> dict[str, any]:
-    """
-    Two-step upload:
-      1) Create via raw binary body + Content-Disposition: attachment
-      2) Update fields (slug/title/alt_text/caption)
+    The legacy map covers items from runs before stable slugs, found by
+    "Pexels <id>" in their slug or title, so no per-photo search= query is
+    needed. The sweep is projected to the text fields the seeder writes
+    (raw values, via context=edit, so updates can be diffed) and served
+    from the local sync state when available (SEED_STATE=0 disables).
     """
-    # Step 1: create
-    create_url = urljoin(base_url + "/", "wp-json/wp/v2/media")
-    headers = {
-        "Content-Disposition": f'attachment; filename="{filename}"',
-        "Content-Type": content_type,
-    }
-    r = s.post(create_url, auth=auth, data=blob, headers=headers, timeout=90, verify=verify_ssl)
+    media = SlugIndex(wp, "media", fields=("id", "slug", "title", "alt_text", "caption", "meta"),
+                      params={"status": "inherit", "context": "edit"}, store=StateStore.for_client(wp))
+    if media.synced:
+        media.preload(())
+    else:
+        media.sweep()
+    legacy: Dict[str, Dict[str, Any]] = {}
+    by_hash: Dict[str, Dict[str, Any]] = {}
+    for it in media.items():
+        title = (it.get("title") or {}).get("raw") or ""
+        for m in LEGACY_PEXELS_RE.finditer(f"{it.get('slug') or ''} {title}"):
+            legacy.setdefault(m.group(1), it)
+        sha = stored_fingerprint(it, CONTENT_HASH_META)
+        if sha:
+            by_hash.setdefault(sha, it)
+    return media, legacy, by_hash
+
+
+def wp_update_media_fields(writer: BatchWriter, media_id: int, data: Dict[str, Any], on_done=None) -> WriteOp:
+    """Queue a title/alt/caption update; sent with others via /batch/v1 on flush."""
+    return writer.add("POST", f"media/{media_id}", data, on_done=on_done)
+
+
+def _open_image(s: requests.Session, url: str) -> tuple[requests.Response, str, str]:
+    r = s.get(url, stream=True, timeout=90)
     try:
         r.raise_for_status()
-    except requests.HTTPError as e:
-        # Show WP’s error body to aid debugging
-        msg = r.text.strip()
-        raise RuntimeError(f"media create failed: {e} — body: {msg[:500]}") from e
-
-    created = r.json()
-    mid = created.get("id")
-    if not mid:
-        raise RuntimeError(f"media create returned no id: {created}")
-
-    # Step 2: update meta/text fields
-    update_url = urljoin(base_url + "/", f"wp-json/wp/v2/media/{mid}")
-    data = {}
-    if slug:
-        data["slug"] = slug
-    if title:
-        data["title"] = title
-    if alt_text:
-        data["alt_text"] = alt_text
-    if caption:
-        data["caption"] = caption
-
-    if data:
-        r2 = s.post(update_url, auth=auth, data=data, timeout=30, verify=verify_ssl)
-        try:
-            r2.raise_for_status()
-        except requests.HTTPError as e:
-            msg = r2.text.strip()
-            raise RuntimeError(f"media update failed for #{mid}: {e} — body: {msg[:500]}") from e
-        return r2.json()
+    except requests.HTTPError:
+        r.close()
+        raise
+    ctype = (r.headers.get("Content-Type") or "image/jpeg").split(";")[0].strip()
+    ext = mimetypes.guess_extension(ctype) or ".jpg"
+    return r, ctype, ext
 
-    return created
 
+def download_image(s: requests.Session, url: str) -> tuple[BinaryIO, str, str]:
+    """Stream the image into a spooled temp file (RAM up to 1 MiB, then disk).
 
-def download_image(s: requests.Session, url: str) -> tuple[bytes, str, str]:
-    r = s.get(url, timeout=90)
-    r.raise_for_status()
-    ctype = (r.headers.get("Content-Type") or "image/jpeg").split(";")[0].strip()
-    ext = mimetypes.guess_extension(ctype) or ".jpg"
-    return r.content, ctype, ext
+    Returns (file positioned at 0, content type, extension); the caller closes it.
+    """
+    r, ctype, ext = _open_image(s, url)
+    body, _ = spool(r)
+    return body, ctype, ext
+
+
+def fetch_image(
+    s: requests.Session | None,
+    url: str,
+    cache: AssetCache | None,
+    key: str,
+    photo: Dict[str, Any],
+) -> tuple[BinaryIO, str, str]:
+    """download_image through the asset cache: a verified hit needs no network,
+    a miss is streamed straight into the cache. s=None means offline (hits only)."""
+    if cache:
+        hit = cache.get(key)
+        if hit:
+            return hit.open(), hit.meta.get("content_type") or "image/jpeg", hit.meta.get("ext") or ".jpg"
+    if s is None:
+        raise RuntimeError(f"{key} is not in the asset cache (offline)")
+    if not cache:
+        return download_image(s, url)
+    r, ctype, ext = _open_image(s, url)
+    try:
+        asset = cache.put(key, r.iter_content(CHUNK),
+                          {"content_type": ctype, "ext": ext, "url": url, "photo": photo})
+    finally:
+        r.close()
+    return asset.open(), ctype, ext
+
+
+def cached_photos(cache: AssetCache, src_key: str, count: int) -> List[Dict[str, Any]]:
+    """Pexels photo records of everything cached for `src_key` (offline seeding)."""
+    suffix = f"-{src_key}"
+    photos = [a.meta["photo"] for a in cache.entries("pexels-")
+              if a.key.endswith(suffix) and a.meta.get("photo")]
+    return photos[:count]
+
+# ------------------- Pipeline -------------------
+
+@dataclass
+class MediaJob:
+    """One Pexels photo on its way through lookup -> download -> upload -> meta."""
+    pid: Any
+    slug: str
+    url: str
+    fields: Dict[str, str]  # title / alt_text / caption
+    photo: Dict[str, Any]   # Pexels record, kept with the cached asset
+    body: Optional[BinaryIO] = None  # spooled download, closed once uploaded
+    ctype: str = ""
+    ext: str = ""
+    sha256: str = ""        # content_hash() of body, stored as seed_sha256
+    previews: Optional[Dict[str, derivatives.Derivative]] = None  # client-rendered sizes
+    created: Optional[Dict[str, Any]] = None
+    pending: Optional[Dict[str, Any]] = None  # fields the create could not carry
+
+
+def media_job(p: Dict[str, Any], src_key: str) -> Optional[MediaJob]:
+    pid = p.get("id")
+    src = p.get("src", {}) or {}
+    # choose the preferred URL, fall back sensibly
+    url = (src.get(src_key)
+           or src.get("original")
+           or src.get("large2x")
+           or src.get("large")
+           or src.get("medium"))
+    if not url:
+        log(f"[seed] WARN: no usable URL for photo {pid}")
+        return None
+    photographer = p.get("photographer") or "Unknown"
+    pexels_page = p.get("url") or f"https://www.pexels.com/photo/{pid}/"
+    return MediaJob(pid, f"pexels-{pid}", url, {
+        "title": f"Pexels {pid} — {photographer}",
+        "alt_text": f"Photo by {photographer} (Pexels)",
+        "caption": f'Photo by {photographer} on Pexels — <a href="{pexels_page}">{pexels_page}</a>',
+    }, p)
 
 # ------------------- Main -------------------
 
@@ -341,118 +396,240 @@ def main() -> int:
                         default=bool_env("MEDIA_FORCE_NEW", False))
     parser.add_argument("--update-existing", action="store_true",
                         default=bool_env("MEDIA_UPDATE_EXISTING", True))
+    parser.add_argument("--no-dedup", dest="dedup", action="store_false",
+                        default=bool_env("MEDIA_DEDUP", True),
+                        help="upload even when an attachment with the same bytes exists")
+    parser.add_argument("--offline", action="store_true", default=bool_env("MEDIA_OFFLINE", False),
+                        help="seed only from the local asset cache (no Pexels requests)")
+    parser.add_argument("--no-multipart", dest="multipart", action="store_false",
+                        default=bool_env("MEDIA_MULTIPART", True),
+                        help="create + update in two requests instead of one multipart upload")
+    parser.add_argument("--no-derivatives", dest="derivatives", action="store_false",
+                        default=bool_env("MEDIA_DERIVATIVES", True),
+                        help="let WordPress generate the image sizes instead of uploading them")
+    parser.add_argument("--lookup-workers", type=int,
+                        default=int(evar("MEDIA_LOOKUP_WORKERS", "2")))
+    parser.add_argument("--download-workers", type=int,
+                        default=int(evar("MEDIA_DOWNLOAD_WORKERS", "4")))
+    parser.add_argument("--derive-workers", type=int,
+                        default=int(evar("MEDIA_DERIVE_WORKERS", str(os.cpu_count() or 2))))
+    parser.add_argument("--upload-workers", type=int,
+                        default=int(evar("MEDIA_UPLOAD_WORKERS", "2")))
     args = parser.parse_args()
-
-    api_key = must("PEXELS_API_KEY")
-    base_url = wp_base_url()
-    auth = wp_auth()
+    if args.derivatives and not derivatives.available("image"):
+        log("[seed] Pillow not installed; WordPress will generate the image sizes")
+        args.derivatives = False
+
+    cache = AssetCache.from_env()
+    api_cache = ResponseCache.from_env()
+    if args.offline and not cache:
+        sys.exit("ERROR: --offline needs the asset cache (unset ASSET_CACHE=0)")
+    api_key = None if args.offline else must("PEXELS_API_KEY")
     verify_ssl = bool_env("WP_VERIFY_SSL", True)
 
-    s = http()
+    s = http(pool_size=max(DEFAULT_POOL_SIZE, args.download_workers))
+    # lookups, uploads, the meta writer and paged listings all share the WP pool
+    wp = wp_client(verify_ssl, pool_size=max(DEFAULT_POOL_SIZE, args.lookup_workers + args.upload_workers + 2))
 
     # Sanity-check WordPress credentials first
     try:
-        wp_check_me(s, base_url, auth, verify_ssl)
-        print(f"[seed] Authenticated to {base_url} as {auth[0]}", file=sys.stderr)
+        wp_check_me(wp)
+        log(f"[seed] Authenticated to {wp.base} as {wp.username}")
     except Exception as e:
-        print(f"[seed] ERROR: WordPress auth failed: {e}", file=sys.stderr)
+        log(f"[seed] ERROR: WordPress auth failed: {e}")
         return 2
 
     # Fetch photos according to mode
     try:
-        if args.mode == "popular":
-            photos = pexels_curated_photos(s, api_key, args.count, per_page=80)
+        if args.offline:
+            photos = cached_photos(cache, args.src_key, args.count)
+            log(f"[seed] offline: {len(photos)} cached photo(s) in {cache.root}")
+        elif args.mode == "popular":
+            photos = pexels_curated_photos(s, api_key, args.count, per_page=80, cache=api_cache)
         elif args.mode == "top":
             photos = pexels_top_photos(
                 s, api_key, args.query, args.count, per_page=80,
-                orientation=args.orientation, size=args.size
+                orientation=args.orientation, size=args.size, cache=api_cache
             )
         else:  # random
             photos = pexels_random_photos(
                 s, api_key, args.query, args.count, per_page=80,
-                orientation=args.orientation, size=args.size
+                orientation=args.orientation, size=args.size, cache=api_cache
             )
     except Exception as e:
-        print(f"[seed] ERROR: Pexels fetch failed: {e}", file=sys.stderr)
+        log(f"[seed] ERROR: Pexels fetch failed: {e}")
         return 3
 
-    uploaded = 0
-    skipped = 0
-    updated = 0
-
-    for p in photos:
-        pid = p.get("id")
-        slug = f"pexels-{pid}"
-        src = p.get("src", {}) or {}
-        # choose the preferred URL, fall back sensibly
-        url = (src.get(args.src_key)
-               or src.get("original")
-               or src.get("large2x")
-               or src.get("large")
-               or src.get("medium"))
-        if not url:
-            print(f"[seed] WARN: no usable URL for photo {pid}", file=sys.stderr)
-            continue
-
-        # Idempotence check (unless forced)
+    counts: Counter = Counter()
+    counts_lock = threading.Lock()
+
+    def tally(key: str) -> None:
+        with counts_lock:
+            counts[key] += 1
+
+    writer = BatchWriter(wp)
+    uploader = MediaUploader(wp, multipart=args.multipart)
+    media = SlugIndex(wp, "media", params={"status": "inherit"})
+    legacy: Dict[str, Dict[str, Any]] = {}
+    by_hash: Dict[str, Dict[str, Any]] = {}  # also claims the hashes of this run's uploads
+    hash_lock = threading.Lock()
+    if not args.force_new or args.dedup:
+        try:
+            inventory, legacy, by_hash = wp_media_inventory(wp)
+            if not args.force_new:
+                media = inventory
+            log(f"[seed] media inventory: {len(inventory)} item(s), {len(legacy)} legacy Pexels title(s), "
+                f"{len(by_hash)} content hash(es)")
+        except Exception as e:
+            log(f"[seed] WARN: media sweep failed, checking one by one: {e}")
+
+    def update_done(op: WriteOp) -> None:
+        mid = op.route.rsplit("/", 1)[-1]
+        if op.ok:
+            media.put(op.data)
+            tally("updated")
+            log(f"[seed] updated media #{mid} meta/text")
+        else:
+            log(f"[seed] WARN: update failed for #{mid}: {op.error()}")
+
+    def record_upload(res: Dict[str, Any]) -> None:
+        media.put(res)
+        tally("uploaded")
+        log(f"[seed] uploaded media #{res.get('id')}: {res.get('source_url')}")
+
+    def upload_done(op: WriteOp) -> None:
+        if op.ok:
+            record_upload(op.data)
+        else:
+            mid = op.route.rsplit("/", 1)[-1]
+            log(f"[seed] ERROR: meta update failed for new media #{mid}: {op.error()}")
+
+    # --- stages: each returns the job for the next stage, or None when done with it ---
+
+    def lookup(job: MediaJob) -> Optional[MediaJob]:
+        if args.force_new:
+            return job
         existing = None
-        if not args.force_new:
-            try:
-                existing = wp_find_media_by_slug(s, base_url, auth, slug, verify_ssl)
-                if not existing:
-                    # Fallback: search by "Pexels <id>" (for legacy runs before stable slugs)
-                    existing = wp_search_media_fallback(s, base_url, auth, f"pexels {pid}".lower(), verify_ssl)
-            except Exception as e:
-                print(f"[seed] WARN: lookup failed for {slug}: {e}", file=sys.stderr)
-
-        photographer = p.get("photographer") or "Unknown"
-        pexels_page = p.get("url") or f"https://www.pexels.com/photo/{pid}/"
-        title = f"Pexels {pid} — {photographer}"
-        alt_text = f"Photo by {photographer} (Pexels)"
-        caption = f'Photo by {photographer} on Pexels — <a href="{pexels_page}">{pexels_page}</a>'
-
-        if existing and not args.force_new:
-            mid = existing.get("id")
-            print(f"[seed] exists media #{mid} (slug {slug}); skipping upload", file=sys.stderr)
-
-            # Optionally update text fields to keep them tidy
-            if args.update_existing:
-                try:
-                    wp_update_media_fields(
-                        s, base_url, auth, mid,
-                        {"title": title, "alt_text": alt_text, "caption": caption},
-                        verify_ssl
-                    )
-                    updated += 1
-                    print(f"[seed] updated media #{mid} meta/text", file=sys.stderr)
-                except Exception as e:
-                    print(f"[seed] WARN: update failed for #{mid}: {e}", file=sys.stderr)
-
-            skipped += 1
-            continue
-
-        # Download & upload
         try:
-            blob, ctype, ext = download_image(s, url)
+            # O(1) after the sweep; legacy = uploads from before stable slugs
+            existing = media.get(job.slug) or legacy.get(str(job.pid))
         except Exception as e:
-            print(f"[seed] WARN: download failed for {pid}: {e}", file=sys.stderr)
-            continue
-
-        filename = f"{slug}{ext}"
+            log(f"[seed] WARN: lookup failed for {job.slug}: {e}")
+        if not existing:
+            return job
+        mid = existing.get("id")
+        log(f"[seed] exists media #{mid} (slug {job.slug}); skipping upload")
+        # Optionally update text fields to keep them tidy (only what differs)
+        if args.update_existing:
+            data = changed_fields(existing, job.fields)
+            if data:
+                wp_update_media_fields(writer, mid, data, on_done=update_done)
+            else:
+                tally("unchanged")
+        tally("skipped")
+        return None
+
+    def download(job: MediaJob) -> MediaJob:
+        job.body, job.ctype, job.ext = fetch_image(
+            None if args.offline else s, job.url, cache, f"{job.slug}-{args.src_key}", job.photo
+        )
+        if not args.dedup:
+            return job
+        job.sha256 = content_hash(job.body)
+        with hash_lock:
+            dup = by_hash.get(job.sha256)
+            if not dup:
+                by_hash[job.sha256] = {"slug": job.slug}  # claimed; released if the upload fails
+        if not dup:
+            return job
+        job.body.close()
+        job.body = None
+        ref = f"#{dup['id']}" if dup.get("id") else f"slug {dup.get('slug')}"
+        log(f"[seed] same bytes as media {ref}; skipping upload of {job.slug}")
+        tally("duplicate")
+        return None
+
+    def derive(job: MediaJob) -> MediaJob:
+        # the worker gets a path, never the bytes: cached assets are real files, and a
+        # spool (in RAM, or rolled over to an unnamed temp file) is copied to one in chunks
+        path = getattr(job.body, "name", None)
+        spilled = None
+        if not (isinstance(path, str) and os.path.isfile(path)):
+            with tempfile.NamedTemporaryFile(suffix=job.ext, delete=False) as tmp:
+                shutil.copyfileobj(job.body, tmp, CHUNK)
+            path = spilled = tmp.name
         try:
-            res = wp_upload_media(
-                s, base_url, auth, filename, blob, ctype, slug, title, alt_text, caption, verify_ssl
-            )
-            mid = res.get("id")
-            src_url = res.get("source_url")
-            print(f"[seed] uploaded media #{mid}: {src_url}", file=sys.stderr)
-            uploaded += 1
+            job.previews = pool.submit(derivatives.derive, "image", path).result()
         except Exception as e:
-            print(f"[seed] ERROR: upload failed for {pid}: {e}", file=sys.stderr)
-            continue
-
-    print(f"[seed] Done. Uploaded {uploaded}, updated {updated}, skipped {skipped}.", file=sys.stderr)
-    return 0 if (uploaded or skipped) else 4
+            log(f"[seed] WARN: could not render sizes for {job.slug}, WordPress will: {e}")
+        finally:
+            if spilled:
+                os.remove(spilled)
+        job.body.seek(0)
+        return job
+
+    def upload(job: MediaJob) -> MediaJob:
+        # multipart: file + slug/title/alt/caption in one request (two-step fallback);
+        # with previews, the bundle route takes the sizes and the fields in that one request
+        try:
+            fields = {"slug": job.slug, **job.fields}
+            if job.sha256:
+                fields["meta"] = {CONTENT_HASH_META: job.sha256}
+            job.created, job.pending = uploader.create_bundle(
+                f"{job.slug}{job.ext}", job.body, job.ctype, job.previews or {}, fields
+            )
+        finally:
+            job.body.close()  # frees the spool (memory or temp file) as soon as it is sent
+        return job
+
+    def meta(job: MediaJob) -> None:
+        if job.pending:
+            wp_update_media_fields(writer, job.created["id"], job.pending, on_done=upload_done)
+        else:
+            record_upload(job.created)
+
+    def stage_failed(stage: str, job: MediaJob, e: BaseException) -> None:
+        if job.body:
+            job.body.close()
+        if job.sha256 and not job.created:
+            with hash_lock:
+                if by_hash.get(job.sha256) == {"slug": job.slug}:
+                    del by_hash[job.sha256]
+        level = "WARN" if stage == "download" else "ERROR"
+        log(f"[seed] {level}: {stage} failed for {job.pid}: {e}")
+
+    jobs = (j for j in (media_job(p, args.src_key) for p in photos) if j)
+    stages = [
+        Stage("lookup", lookup, args.lookup_workers),
+        Stage("download", download, args.download_workers),
+        Stage("upload", upload, args.upload_workers),
+        Stage("meta", meta, 1),
+    ]
+    pool = None
+    if args.derivatives:
+        # spawn, not fork: the pipeline threads (and their locks) are already running
+        pool = ProcessPoolExecutor(max(1, args.derive_workers), mp_context=multiprocessing.get_context("spawn"))
+        stages.insert(2, Stage("derive", derive, max(1, args.derive_workers)))
+    try:
+        run_pipeline(jobs, stages, on_error=stage_failed)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    writer.flush()
+    uploaded, updated, skipped = counts["uploaded"], counts["updated"], counts["skipped"]
+    mode = {True: "multipart", False: "two-step"}.get(uploader.multipart, "none")
+    if uploader.bundle:
+        mode = "bundle + client-rendered sizes"
+    log(f"[seed] Done. Uploaded {uploaded}, updated {updated}, skipped {skipped} "
+          f"({uploader.requests_sent} upload requests, {mode}; "
+          f"{counts['unchanged']} no-op update(s) avoided, {counts['duplicate']} duplicate upload(s) avoided).")
+    if api_cache:
+        log(f"[seed] Pexels API cache: {api_cache.hits} hit(s), {api_cache.revalidated} revalidated, "
+              f"{api_cache.fetched} fetched")
+    if cache:
+        log(f"[seed] Asset cache: {cache.hits} hit(s), {cache.misses} miss(es) in {cache.root}")
+    return 0 if (uploaded or skipped or counts["duplicate"]) else 4
 
 
 if __name__ == "__main__":
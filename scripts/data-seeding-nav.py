@@ -26,9 +26,10 @@ import json
 import os
 import re
 import sys
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 import requests
-from requests.auth import HTTPBasicAuth
+
+from wpclient import SlugIndex, WPClient, fields_for, iter_items, uses_fields
 
 LOG = "[branches-adopt]"
 SENTINEL_START = "<!-- branches-index:auto:start -->"
@@ -42,17 +43,15 @@ def err(m: str): print(f"{LOG} ERROR: {m}", flush=True)
 # -----------------------------
 class WP:
     def __init__(self, base_url: str, user: str, app_pass: str, verify_ssl: bool = True):
-        self.base = base_url.rstrip("/")
-        self.api = f"{self.base}/wp-json/wp/v2"
-        self.s = requests.Session()
-        self.s.auth = HTTPBasicAuth(user, app_pass)
-        self.s.verify = verify_ssl
-        self.s.headers.update({"Content-Type": "application/json"})
-
-    def _req(self, method: str, path: str, *, params=None, data=None):
-        url = f"{self.api}/{path.lstrip('/')}"
+        self.client = WPClient(base_url, user, app_pass, verify=verify_ssl)
+        self.base = self.client.base
+        self.pages = SlugIndex(self.client, "pages", fields=("id", "slug", "status", "link"),
+                               params={"status": "any", "context": "edit"})
+
+    def _req(self, method: str, path: str, *, params=None, data=None, fields=None):
+        url = self.client.url(path)
         try:
-            r = self.s.request(method, url, params=params, data=json.dumps(data) if data is not None else None, timeout=30)
+            r = self.client.request(method, path, params=params, fields=fields, json=data, timeout=30)
         except requests.exceptions.SSLError:
             raise RuntimeError("SSL error. Use --insecure or set WP_VERIFY_SSL=false for self-signed certs.")
         except requests.RequestException as e:
@@ -74,37 +73,36 @@ class WP:
 
     # ---- Pages ----
     def find_page_by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
-        res = self.get("pages", params={"slug": slug, "per_page": 100, "status": "any", "context": "edit"})
-        return res[0] if isinstance(res, list) and res else None
+        return self.pages.get(slug)
 
     def ensure_page(self, title: str, slug: str) -> Tuple[int, str]:
         p = self.find_page_by_slug(slug)
         if p:
             if p.get("status") != "publish":
                 p = self.post(f"pages/{p['id']}", data={"status": "publish"})
+                self.pages.put(p)
             return int(p["id"]), p.get("link") or f"{self.base}/{slug}/"
         log(f"Creating page '{title}' (slug={slug})…")
         created = self.post("pages", data={"title": title, "slug": slug, "status": "publish"})
+        self.pages.put(created)
         return int(created["id"]), created.get("link") or f"{self.base}/{slug}/"
 
-    def list_all_pages(self) -> List[Dict[str, Any]]:
-        out: List[Dict[str, Any]] = []
-        page = 1
-        while True:
-            batch = self.get("pages", params={"page": page, "per_page": 100, "status": "any", "context": "edit"})
-            if not isinstance(batch, list) or not batch:
-                break
-            out.extend(batch)
-            if len(batch) < 100:
-                break
-            page += 1
-        return out
+    def list_all_pages(self, fields: Sequence[str]) -> List[Dict[str, Any]]:
+        """Every page (any status), projected to `fields` so no content is downloaded."""
+        # pages 2..N are fetched concurrently once page 1 reports X-WP-TotalPages
+        try:
+            return list(iter_items(self.client, "pages", {"status": "any", "context": "edit"},
+                                   fields=fields, timeout=30))
+        except requests.exceptions.SSLError:
+            raise RuntimeError("SSL error. Use --insecure or set WP_VERIFY_SSL=false for self-signed certs.")
+        except requests.RequestException as e:
+            raise RuntimeError(f"GET {self.client.url('pages')} failed: {e}")
 
     def update_page_fields(self, page_id: int, **fields) -> Dict[str, Any]:
         return self.post(f"pages/{page_id}", data=fields)
 
     def read_page_raw(self, page_id: int) -> str:
-        p = self.get(f"pages/{page_id}", params={"context": "edit"})
+        p = self.get(f"pages/{page_id}", params={"context": "edit"}, fields=("content",))
         c = p.get("content") or {}
         return c.get("raw") or c.get("rendered") or ""
 
@@ -144,12 +142,13 @@ def upsert_auto_section(existing: str, new_section: str) -> str:
     return (f"{SENTINEL_START}\n{new_section}\n{SENTINEL_END}" if not existing.strip()
             else existing.rstrip() + "\n\n" + f"{SENTINEL_START}\n{new_section}\n{SENTINEL_END}")
 
+@uses_fields("id", "slug", "status", "parent")
 def adopt_branch_pages(wp: WP, branches_id: int, pattern: re.Pattern) -> Tuple[int, int]:
     """
     Set parent=/branches for all pages whose slug matches the pattern.
     Returns (checked_count, adopted_count).
     """
-    pages = wp.list_all_pages()
+    pages = wp.list_all_pages(fields_for(adopt_branch_pages))
     checked = 0
     adopted = 0
     for p in pages:
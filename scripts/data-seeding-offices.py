@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Sync offices.csv in one pass: an Address post and a Branch subcategory
+(child of 'Branch', meta.address_post_id -> the post) per office.
+
+Does the work of data-seeding-addresses.py followed by data-seeding-branches.py,
+but reads the CSV once and loads each remote inventory once into a single
+id index. Writes are pipelined through one BatchWriter: a branch whose
+address post already exists is queued right away, and one for a new
+address is queued from that create's callback, so categories ride along
+in the same /batch/v1 calls as the remaining address writes.
+
+A code repeated in the CSV is written once, from its last row (the net
+effect of the separate scripts, which updated the same post/term again).
+
+Incremental: Address posts keep the fingerprint of their row (meta
+seed_fingerprint, seed-fingerprint.php) and only added or changed rows are
+pushed. A branch is written with its address, or when its term is missing
+or renamed.
+
+Env (required):
+  WP_BASE_URL, WP_USERNAME, WP_APP_PASSWORD
+Optional:
+  OFFICES_CSV    (default: offices.csv next to this script; argv[1] wins)
+  DRAFT_REMOVED  "1" to move Address posts whose code left the CSV to draft
+                 (their branch categories are left alone)
+  SYNC_ALL       "1" to push every row, e.g. to undo edits made in wp-admin
+
+Usage:
+  python3 data-seeding-offices.py [/path/to/offices.csv]
+"""
+import csv, os, re, sys
+from typing import Dict, Optional
+
+import requests
+
+from wpclient import (
+    FINGERPRINT_META, BatchWriter, StateStore, SyncedCollection, WPClient, WriteOp, diff_rows, row_fingerprint,
+)
+
+CSV_REQUIRED = ["ID","ID2","Office","Address","TEL","FAX","Email","URL","Work"]
+
+BASE = (os.environ.get("WP_BASE_URL") or "").rstrip("/")
+USER = os.environ.get("WP_USERNAME") or ""
+PASS = (os.environ.get("WP_APP_PASSWORD") or "").replace(" ","")
+if not (BASE and USER and PASS):
+    print("Set WP_BASE_URL, WP_USERNAME, WP_APP_PASSWORD", file=sys.stderr); sys.exit(1)
+
+DRAFT_REMOVED = str(os.environ.get("DRAFT_REMOVED","0")).lower() in ("1","true","yes","on")
+SYNC_ALL = str(os.environ.get("SYNC_ALL","0")).lower() in ("1","true","yes","on")
+
+CLIENT = WPClient(BASE, USER, PASS)
+S = CLIENT.session  # pooled keep-alive session shared by every call below
+WRITER = BatchWriter(CLIENT)  # address and category upserts share the 25-per-/batch/v1 queue
+# Same collections and field sets as the two single-purpose seeders, so all three share the sync state.
+STATE = StateStore.for_client(CLIENT)
+ADDRESSES = SyncedCollection(CLIENT, STATE, "address", fields=("id","slug","status","meta"),
+                             params={"context":"edit","status":"publish,draft"})
+CATEGORIES = SyncedCollection(CLIENT, STATE, "categories", fields=("id","slug","parent","meta","name"),
+                              params={"context":"edit"}, deltas=False)  # terms have no modified_after: swept every run
+
+def slugify(s:str)->str:
+    s = re.sub(r"[^a-zA-Z0-9_-]+","-", (s or "").strip())
+    s = re.sub(r"-+","-", s).strip("-").lower()
+    return s
+
+def addr_slug(csv_id:str)->str:   return f"address-{slugify(csv_id)}" if slugify(csv_id) else "address-unnamed"
+def branch_slug(csv_id:str)->str: return f"branch-{slugify(csv_id)}"
+
+def get_csv_path()->str:
+    if len(sys.argv)>1 and sys.argv[1]: return sys.argv[1]
+    if os.environ.get("OFFICES_CSV"):   return os.environ["OFFICES_CSV"]
+    here = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(here,"offices.csv")
+
+def read_rows(csv_path:str)->Dict[str,Dict[str,str]]:
+    """code -> row for the valid rows in CSV order (the last row for a repeated code)."""
+    rows: Dict[str,Dict[str,str]] = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rdr = csv.DictReader(f)
+        missing = [h for h in CSV_REQUIRED if h not in (rdr.fieldnames or [])]
+        if missing:
+            print(f"CSV missing headers: {missing}", file=sys.stderr); sys.exit(1)
+        for i, raw in enumerate(rdr, 1):
+            row = {k:(raw.get(k,"") or "").strip() for k in CSV_REQUIRED}
+            if not row["ID"] or not row["Office"]:
+                print(f"[WARN] Row {i}: missing ID or Office — skipping"); continue
+            if row["ID"] in rows:
+                print(f"[WARN] Row {i}: {row['ID']} repeated — this row replaces the earlier one")
+            rows[row["ID"]] = row
+    return rows
+
+def load_all(coll:SyncedCollection)->Dict[int,dict]:
+    """coll.load(), exiting with a hint when the route is missing (CPT/plugin not active)."""
+    try:
+        return coll.load()
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            print(f"404 at {e.response.url} (is endpoint/meta registered?)", file=sys.stderr); sys.exit(1)
+        raise
+
+class OfficeIndex:
+    """csv_id -> Address post and Branch term, from one load of each inventory.
+
+    Lookups go by meta.csv_id first, then by the expected slug; results of
+    this run's writes are recorded back so nothing is fetched twice.
+    """
+
+    def __init__(self, parent_id:int):
+        self.parent_id = parent_id
+        self.addr_by_csv: Dict[str,dict] = {}
+        self.addr_by_slug: Dict[str,dict] = {}
+        self.term_by_csv: Dict[str,dict] = {}
+        self.term_by_slug: Dict[str,dict] = {}
+
+    def load(self)->None:
+        for a in load_all(ADDRESSES).values():
+            self._index(self.addr_by_csv, self.addr_by_slug, a)
+        for c in load_all(CATEGORIES).values():
+            if int(c.get("parent") or 0) == self.parent_id:  # only children of 'Branch'
+                self._index(self.term_by_csv, self.term_by_slug, c)
+        print(f"[INFO] Index: {len(self.addr_by_slug)} address posts "
+              f"({'sync state' if ADDRESSES.synced_from_cache else 'site'}), "
+              f"{len(self.term_by_slug)} branch categories "
+              f"({'sync state' if CATEGORIES.synced_from_cache else 'site'})")
+
+    @staticmethod
+    def _index(by_csv:Dict[str,dict], by_slug:Dict[str,dict], item:dict)->None:
+        slug = (item.get("slug") or "").strip()
+        if slug: by_slug[slug] = item
+        cid  = ((item.get("meta") or {}).get("csv_id") or "").strip()
+        if cid: by_csv[cid] = item
+
+    def address(self, code:str)->Optional[dict]:
+        return self.addr_by_csv.get(code) or self.addr_by_slug.get(addr_slug(code))
+
+    def branch(self, code:str)->Optional[dict]:
+        return self.term_by_csv.get(code) or self.term_by_slug.get(branch_slug(code))
+
+    def addresses(self, codes)->Dict[str,Optional[dict]]:
+        """code -> Address post for `codes`, plus every other post that carries a csv_id."""
+        out: Dict[str,Optional[dict]] = dict(self.addr_by_csv)
+        out.update((code, self.address(code)) for code in codes)
+        return out
+
+    def put_address(self, item:dict)->None:
+        ADDRESSES.put(item)
+        self._index(self.addr_by_csv, self.addr_by_slug, item)
+
+    def put_branch(self, item:dict)->None:
+        CATEGORIES.put(item)
+        self._index(self.term_by_csv, self.term_by_slug, item)
+
+def ensure_parent_branch()->int:
+    r = CLIENT.get("categories", params={"slug":"branch","_fields":"id,slug"}, timeout=10); r.raise_for_status()
+    items = r.json()
+    if items: return int(items[0]["id"])
+    r = CLIENT.post("categories", json={"name":"Branch","slug":"branch","parent":0}, timeout=15); r.raise_for_status()
+    return int(r.json()["id"])
+
+def upsert_address(row:dict, existing_id:Optional[int], on_done=None)->WriteOp:
+    payload = {
+        "status":"publish",
+        "title": row["Office"],
+        # make slug stable so future runs can find it even if meta lookup fails
+        "slug":  addr_slug(row["ID"]),
+        "meta": {
+            "csv_id":  row["ID"], "csv_id2": row["ID2"], "address": row["Address"],
+            "tel":     row["TEL"], "fax":    row["FAX"], "email":   row["Email"],
+            "url":     row["URL"], "work":   row["Work"],
+            FINGERPRINT_META: row_fingerprint(row),
+        }
+    }
+    return WRITER.add("POST", f"address/{existing_id}" if existing_id else "address", payload, on_done=on_done)
+
+def upsert_branch_category(code:str, name:str, parent_id:int, address_id:int, existing_id:Optional[int],
+                           on_done=None)->WriteOp:
+    payload = {
+        "name":  name or f"Branch {code}",
+        "slug":  branch_slug(code),
+        "parent": parent_id,
+        "meta": {"csv_id": code, "address_post_id": address_id}
+    }
+    return WRITER.add("POST", f"categories/{existing_id}" if existing_id else "categories", payload, on_done=on_done)
+
+def main():
+    csv_path = get_csv_path()
+    if not os.path.exists(csv_path):
+        print(f"CSV not found: {csv_path}\n"
+              "Tip: place 'offices.csv' next to this script or pass an explicit path.", file=sys.stderr)
+        sys.exit(1)
+    rows = read_rows(csv_path)
+
+    # quick probes (also check auth and that the Address CPT is registered)
+    try:
+        CLIENT.get("address", params={"per_page":1,"context":"edit","_fields":"id"}, timeout=10).raise_for_status()
+        CLIENT.get("categories", params={"per_page":1,"_fields":"id"}, timeout=10).raise_for_status()
+    except requests.HTTPError as e:
+        if e.response.status_code == 401:
+            print("401 Unauthorized: check creds/capabilities", file=sys.stderr); sys.exit(1)
+        if e.response.status_code == 404:
+            print("CPT /address not found (is plugin active?)", file=sys.stderr); sys.exit(1)
+        raise
+
+    index = OfficeIndex(ensure_parent_branch())
+    index.load()
+
+    existing = index.addresses(rows)
+    diff = diff_rows(rows, existing)
+    push = set(diff.added + diff.changed + (diff.unchanged if SYNC_ALL else []))
+    print(f"[INFO] Rows: {len(diff.added)} added, {len(diff.changed)} changed, "
+          f"{len(diff.unchanged)} unchanged{' (pushed anyway: SYNC_ALL)' if SYNC_ALL else ''}, "
+          f"{len(diff.removed)} no longer in the CSV")
+
+    counts = {"addr_created":0, "addr_updated":0, "addr_drafted":0, "branch_created":0, "branch_updated":0,
+              "unchanged":0, "failed":0}
+
+    def branch_done(code:str, aid:int, tid:Optional[int]):
+        def done(op:WriteOp):
+            if not op.ok:
+                counts["failed"] += 1
+                print(f"[FAIL] Branch {code}: HTTP {op.status} -> {op.data}", file=sys.stderr)
+                return
+            index.put_branch(op.data)
+            counts["branch_updated" if tid else "branch_created"] += 1
+            print(f"[OK] {'Updated' if tid else 'Created'} Branch category {code} "
+                  f"(term_id={op.data['id']}, addr_id={aid})")
+        return done
+
+    def queue_branch(row:dict, aid:int)->None:
+        code = row["ID"]
+        term = index.branch(code)
+        tid = int(term["id"]) if term else None
+        upsert_branch_category(code, row["Office"], index.parent_id, aid, tid, on_done=branch_done(code, aid, tid))
+
+    def address_done(row:dict, pid:Optional[int]):
+        def done(op:WriteOp):
+            code = row["ID"]
+            if not op.ok:
+                counts["failed"] += 1
+                print(f"[FAIL] Address {code}: HTTP {op.status} -> {op.data}", file=sys.stderr)
+                return
+            index.put_address(op.data)
+            counts["addr_updated" if pid else "addr_created"] += 1
+            print(f"[OK] {'Updated' if pid else 'Created'} Address {code} (post_id={op.data['id']})")
+            if not pid:
+                queue_branch(row, int(op.data["id"]))  # needed the new post id; goes out with the next batch
+        return done
+
+    for code, row in rows.items():
+        post = existing.get(code)
+        pid = int(post["id"]) if post else None
+        term = index.branch(code)
+        if code in push:
+            upsert_address(row, pid, on_done=address_done(row, pid))
+            if pid:
+                queue_branch(row, pid)
+        elif not term or (term.get("name") or "") != row["Office"]:
+            queue_branch(row, pid)
+        else:
+            counts["unchanged"] += 1
+
+    if DRAFT_REMOVED:
+        def drafted(code:str):
+            def done(op:WriteOp):
+                if not op.ok:
+                    counts["failed"] += 1
+                    print(f"[FAIL] Draft Address {code}: HTTP {op.status} -> {op.data}", file=sys.stderr)
+                    return
+                index.put_address(op.data)
+                counts["addr_drafted"] += 1
+                print(f"[OK] Drafted Address {code} (post_id={op.data['id']}): no longer in the CSV")
+            return done
+        for code in diff.removed:
+            post = existing[code]
+            if post.get("status", "publish") == "publish":
+                # clearing the fingerprint makes the row count as changed (and republish) if it comes back
+                WRITER.add("POST", f"address/{post['id']}", {"status":"draft", "meta":{FINGERPRINT_META:""}},
+                           on_done=drafted(code))
+    elif diff.removed:
+        print(f"[INFO] Left {len(diff.removed)} Address posts not in the CSV as they are (DRAFT_REMOVED=1 drafts them)")
+
+    while WRITER.flush():  # create callbacks may queue more categories; drain until nothing is left
+        pass
+
+    print(f"\nDone. Addresses created:{counts['addr_created']}, updated:{counts['addr_updated']}, "
+          f"drafted:{counts['addr_drafted']}; Branch cats created:{counts['branch_created']}, "
+          f"updated:{counts['branch_updated']}; Unchanged offices:{counts['unchanged']}; "
+          f"Failed:{counts['failed']} ({WRITER.requests_sent} write requests)")
+
+if __name__ == "__main__":
+    main()
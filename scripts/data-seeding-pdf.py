@@ -9,7 +9,31 @@ Env / Args:
   PDF_PAGES_MIN        - min pages per PDF (default: 1)
   PDF_PAGES_MAX        - max pages per PDF (default: 3)
   PDF_FORCE_NEW        - "1" to always upload even if slug exists (default: 0)
-  PDF_UPDATE_EXISTING  - "1" to refresh title/caption when found (default: 1)
+  PDF_DEDUP            - "0" to upload even when an attachment with the same bytes
+                         exists (default: 1; matched on the `seed_sha256` meta each
+                         upload stores, see seed-fingerprint.php)
+  PDF_UPDATE_EXISTING  - "1" to refresh title/caption when found (default: 1);
+                         only fields that differ from the stored ones are written
+  PDF_MULTIPART        - "0" to create + update in two requests instead of one
+                         multipart upload (default: 1; falls back automatically)
+  PDF_PREVIEWS         - "0" to let WordPress render the page-1 previews itself
+                         (default: 1 when Pillow and pypdfium2 or pdftoppm are
+                         available). Previews are rendered with the PDF and uploaded
+                         with it via myplugin/v1/media/bundle.
+  PDF_WORKERS          - generator processes (default: CPU count). PDFs (and their
+                         previews) are built in a process pool a few ahead of the
+                         uploader, so generation overlaps the network and uses all cores.
+                         Each worker parses the fonts once (cut down to the characters
+                         the seed text uses, cached in $TMPDIR/seed-pdf-fonts) and clones
+                         a prebuilt template per PDF; upload lines show the timing split.
+  PDF_REPRODUCIBLE     - "0" to stamp PDFs with the current time (default: 1). By
+                         default a PDF's bytes depend only on title, author, pages,
+                         seed and GENERATOR_VERSION: the timestamp is fixed
+                         (SOURCE_DATE_EPOCH if set) and the /ID derives from the
+                         inputs. Such PDFs are kept in the content-addressed asset
+                         cache (ASSET_CACHE_DIR, ASSET_CACHE_MAX_MB; ASSET_CACHE=0
+                         disables), so reseeding reuses them instead of re-rendering,
+                         and byte dedup (PDF_DEDUP) matches them across runs.
 
 WordPress connection:
   WP_BASE_URL or WP_URL      - base URL (e.g., https://wp.lan)
@@ -17,22 +41,49 @@ WordPress connection:
   WP_APP_PASSWORD            - app password for that user (required)
   WP_VERIFY_SSL              - "0" to skip SSL verification (default: verify)
 
+Stress mode (load-tests uploads and WordPress' PDF preview pipeline):
+  PDF_STRESS           - "1" (or --stress) to upload large generated PDFs instead of seeding
+  PDF_STRESS_PAGES     - comma-separated page counts, one size bucket each (default: 100,1000)
+  PDF_STRESS_COUNT     - PDFs per bucket (default: 1)
+  PDF_STRESS_IMAGE_KB  - noise image per page in KiB, 0 for text only (default: 64)
+  PDF_STRESS_KEEP      - "1" to keep the uploads (default: deleted after measuring)
+  Files are written page by page to a temp file (bounded memory, one on disk
+  at a time) and streamed from it; each bucket reports upload MB/s and the
+  server's processing time after the last byte was sent.
+
 Usage:
-  ./scripts/data-seeding-pdf.py --count 6
+  ./scripts/data-seeding-pdf.py --count 6 [--workers 8]
+  ./scripts/data-seeding-pdf.py --stress --stress-pages 100,1000,5000
 """
 from __future__ import annotations
 import argparse
+import copy
+import hashlib
 import io
+import json
+import math
+import multiprocessing
 import os
 import random
 import sys
-from datetime import datetime
-from typing import Any, Dict, Tuple
-from urllib.parse import urljoin
-
-import requests
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, BinaryIO, Dict, List, NamedTuple, Optional, Tuple
+
+from fontTools import subset as ftsubset, ttLib  # fpdf2 dependencies
+import fpdf
 from fpdf import FPDF  # pip install fpdf2
 
+from wpclient import (
+    CONTENT_HASH_META, AssetCache, BatchWriter, MediaUploader, SlugIndex, StateStore, WPClient, WriteOp, changed_fields,
+    content_hash, map_ordered, stored_fingerprint,
+)
+from wpclient import derivatives
+
 # Newer fpdf2 exports enums; older versions don’t. Support both.
 try:
     from fpdf.enums import XPos, YPos
@@ -67,73 +118,29 @@ def bool_env(name: str, default: bool = True) -> bool:
         return default
     return v not in ("0", "false", "False", "no", "NO")
 
-def http() -> requests.Session:
-    s = requests.Session()
-    s.headers["User-Agent"] = "pdf-seeder/1.1 (+python-requests)"
-    return s
+def wp_client(verify_ssl: bool) -> WPClient:
+    user, app_pw = wp_auth()
+    return WPClient(wp_base_url(), user, app_pw, verify=verify_ssl, user_agent="pdf-seeder/1.1 (+python-requests)")
 
 
 # ---------- WordPress helpers ----------
-def wp_check_me(s: requests.Session, base_url: str, auth: Tuple[str, str], verify_ssl: bool) -> None:
-    endpoint = urljoin(base_url + "/", "wp-json/wp/v2/users/me")
-    r = s.get(endpoint, auth=auth, timeout=20, verify=verify_ssl)
+def wp_check_me(wp: WPClient) -> None:
+    r = wp.get("users/me", timeout=20)
     r.raise_for_status()
 
-def wp_find_media_by_slug(s: requests.Session, base_url: str, auth: Tuple[str, str], slug: str, verify_ssl: bool):
-    endpoint = urljoin(base_url + "/", "wp-json/wp/v2/media")
-    r = s.get(endpoint, auth=auth, params={"slug": slug, "per_page": 1}, timeout=20, verify=verify_ssl)
-    r.raise_for_status()
-    js = r.json()
-    return js[0] if isinstance(js, list) and js else None
-
-def wp_update_media_fields(
-    s: requests.Session, base_url: str, auth: Tuple[str, str], media_id: int, data: Dict[str, Any], verify_ssl: bool
-):
-    endpoint = urljoin(base_url + "/", f"wp-json/wp/v2/media/{media_id}")
-    r = s.post(endpoint, auth=auth, data=data, timeout=30, verify=verify_ssl)
-    r.raise_for_status()
-    return r.json()
-
-def wp_upload_media_binary(
-    s: requests.Session,
-    base_url: str,
-    auth: Tuple[str, str],
-    filename: str,
-    blob: bytes,
-    content_type: str,
-    meta: Dict[str, Any],
-    verify_ssl: bool,
-):
-    """
-    Create media by sending raw binary + headers, then update fields.
-    More compatible than multipart on some WP stacks.
-    """
-    create_url = urljoin(base_url + "/", "wp-json/wp/v2/media")
-    headers = {
-        "Content-Disposition": f'attachment; filename="{filename}"',
-        "Content-Type": content_type,
-    }
-    r = s.post(create_url, auth=auth, data=blob, headers=headers, timeout=90, verify=verify_ssl)
-    try:
-        r.raise_for_status()
-    except requests.HTTPError as e:
-        raise RuntimeError(f"media create failed: {e} — body: {r.text[:500]!r}") from e
-
-    media = r.json()
-    mid = media.get("id")
-    if not mid:
-        raise RuntimeError(f"media create returned no id: {media}")
-
-    if meta:
-        r2 = s.post(urljoin(base_url + "/", f"wp-json/wp/v2/media/{mid}"), auth=auth, data=meta, timeout=30, verify=verify_ssl)
-        try:
-            r2.raise_for_status()
-        except requests.HTTPError as e:
-            raise RuntimeError(f"media update failed for #{mid}: {e} — body: {r2.text[:500]!r}") from e
-        media = r2.json()
+def wp_media_index(wp: WPClient) -> SlugIndex:
+    """slug -> media item; preload() the run's slugs to check existence in bulk.
 
-    return media
+    Items carry raw title/caption (context=edit) so updates can be diffed,
+    and meta for the content hash.
+    Served from the local sync state when available (SEED_STATE=0 disables).
+    """
+    return SlugIndex(wp, "media", fields=("id", "slug", "title", "caption", "meta"), params={"context": "edit"},
+                     store=StateStore.for_client(wp))
 
+def wp_update_media_fields(writer: BatchWriter, media_id: int, data: Dict[str, Any], on_done=None) -> WriteOp:
+    """Queue a text-field update; sent with others via /batch/v1 on flush."""
+    return writer.add("POST", f"media/{media_id}", data, on_done=on_done)
 
 # ---------- PDF generation ----------
 _LOREM = (
@@ -145,29 +152,148 @@ _LOREM = (
     "sed cursus dui mauris nec leo."
 )
 
-def make_pdf_bytes(title: str, author: str, pages: int, seed: int) -> bytes:
-    rng = random.Random(seed)
-    pdf = FPDF(orientation="P", unit="pt", format="A4")  # 595x842 pt
+# Bump when the layout changes: it keys the artifact cache and the reproducible /ID.
+GENERATOR_VERSION = f"data-seeding-pdf/2 fpdf2/{getattr(fpdf, '__version__', '?')}"
+REPRODUCIBLE_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
 
-    # Try Unicode fonts (bullets, em-dashes, etc). Fallback to core fonts.
-    REG = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
-    BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-    use_unicode = False
-    if os.path.exists(REG):
-        try:
-            pdf.add_font("DejaVu", "", REG, uni=True)
-            if os.path.exists(BOLD):
-                pdf.add_font("DejaVu", "B", BOLD, uni=True)
-            use_unicode = True
-        except Exception:
-            use_unicode = False  # fallback below
+FONT_REGULAR = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+FONT_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+# Latin + general punctuation (bullets, dashes): everything the seed text uses
+FONT_UNICODES = frozenset([*range(0x20, 0x250), *range(0x2000, 0x2070)])
+
+
+class PdfTemplate(NamedTuple):
+    pdf: FPDF                 # fonts added, fixed metadata set; cloned per PDF
+    use_unicode: bool         # DejaVu available (else core fonts)
+    font_data: Dict[str, bytes]  # subset TTF bytes by the path fpdf knows them under
+
+
+_TEMPLATES: Dict[str, PdfTemplate] = {}  # per process, keyed by extra characters
+
+
+def _subset_font(path: str, extra: str) -> str:
+    """Path of the TTF cut down to FONT_UNICODES + `extra` (a few hundred glyphs instead of
+    ~6000), so fpdf's per-document subsetting no longer re-reads the full cmap/post tables.
+
+    Kept in the temp dir keyed by source file and character set, so only
+    the first process of the first run pays for the cut.
+    """
+    st = os.stat(path)
+    key = hashlib.sha256(f"{path}|{st.st_size}|{st.st_mtime_ns}|{extra}".encode("utf-8")).hexdigest()[:16]
+    out = os.path.join(tempfile.gettempdir(), "seed-pdf-fonts", f"{os.path.basename(path)[:-4]}-{key}.ttf")
+    if os.path.exists(out):
+        return out
+    tt = ttLib.TTFont(path, recalcTimestamp=False)
+    options = ftsubset.Options(notdef_outline=True, recommended_glyphs=True)
+    options.drop_tables += ["FFTM"]
+    subsetter = ftsubset.Subsetter(options)
+    subsetter.populate(unicodes=sorted(FONT_UNICODES | {ord(c) for c in extra}))
+    subsetter.subset(tt)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(out), suffix=".ttf")
+    with os.fdopen(fd, "wb") as f:
+        tt.save(f)
+    os.replace(tmp, out)  # workers racing on the first run write identical files
+    return out
+
+
+def pdf_template(extra: str = "") -> PdfTemplate:
+    """The document every PDF is cloned from; built once per process (and character set).
+
+    Parsing the DejaVu TTFs and subsetting them on output cost more than
+    laying out a small PDF. The template parses reduced fonts once, and a
+    clone of it is far cheaper than a fresh FPDF + add_font.
+    """
+    tpl = _TEMPLATES.get(extra)
+    if tpl is None:
+        pdf = FPDF(orientation="P", unit="pt", format="A4")  # 595x842 pt
+        font_data: Dict[str, bytes] = {}
+
+        # Try Unicode fonts (bullets, em-dashes, etc). Fallback to core fonts.
+        use_unicode = False
+        if os.path.exists(FONT_REGULAR):
+            try:
+                for style, path in (("", FONT_REGULAR), ("B", FONT_BOLD)):
+                    if not os.path.exists(path):
+                        continue
+                    cut = _subset_font(path, extra)
+                    pdf.add_font("DejaVu", style, cut)
+                    with open(cut, "rb") as f:
+                        font_data[cut] = f.read()  # clones reopen the font from memory
+                use_unicode = True
+            except Exception:
+                pdf = FPDF(orientation="P", unit="pt", format="A4")
+                font_data = {}
+                use_unicode = False  # fallback below
+
+        # Metadata shared by every seed PDF
+        pdf.set_creator("data-seeding-pdf.py")
+        pdf.set_subject("Seed PDF for testing uploads/preview")
+        pdf.set_keywords("test, seed, pdf")
+        tpl = _TEMPLATES[extra] = PdfTemplate(pdf, use_unicode, font_data)
+    return tpl
+
+
+def _clone(tpl: PdfTemplate) -> FPDF:
+    """deepcopy of the template with a private fontTools handle per TTF.
+
+    fpdf2 shares `ttfont` between copies, and output() subsets it in place,
+    so reusing it would break the next document. Reopening the small subset
+    font from memory is cheap; parsed widths and cmap stay shared.
+    """
+    pdf = copy.deepcopy(tpl.pdf)
+    for font in pdf.fonts.values():
+        data = tpl.font_data.get(str(getattr(font, "ttffile", "")))
+        if data is not None:
+            font.ttfont = ttLib.TTFont(io.BytesIO(data), recalcTimestamp=False, lazy=True)
+    return pdf
+
+
+def reproducible_epoch() -> datetime:
+    """Timestamp of reproducible PDFs: SOURCE_DATE_EPOCH if set, else a fixed date."""
+    try:
+        return datetime.fromtimestamp(int(os.environ["SOURCE_DATE_EPOCH"]), tz=timezone.utc)
+    except (KeyError, ValueError):
+        return REPRODUCIBLE_EPOCH
+
+
+def pdf_identity(title: str, author: str, pages: int, seed: int) -> str:
+    """Hex digest of everything a reproducible PDF depends on: its /ID and its cache key."""
+    raw = json.dumps([GENERATOR_VERSION, title, author, pages, seed, reproducible_epoch().isoformat()],
+                     ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def make_pdf_bytes(title: str, author: str, pages: int, seed: int,
+                   timings: Optional[Dict[str, float]] = None, reproducible: bool = False) -> bytes:
+    """Render one seed PDF; `timings` (if given) gets seconds per phase:
+    fonts (template build, first PDF per process only), clone, layout, output.
+
+    reproducible=True gives byte-identical output for identical inputs: the
+    timestamp is reproducible_epoch() and the /ID derives from the inputs.
+    """
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    extra = "".join(sorted({c for c in title + author if ord(c) not in FONT_UNICODES}))
+    fresh = extra not in _TEMPLATES
+    template = pdf_template(extra)
+    use_unicode = template.use_unicode
+    t1 = time.perf_counter()
+    pdf = _clone(template)
+    t2 = time.perf_counter()
 
     # Metadata
     pdf.set_title(title)
     pdf.set_author(author)
-    pdf.set_creator("data-seeding-pdf.py")
-    pdf.set_subject("Seed PDF for testing uploads/preview")
-    pdf.set_keywords("test, seed, pdf")
+    if reproducible:
+        stamp = reproducible_epoch()
+        pdf.set_creation_date(stamp)
+        file_id = pdf_identity(title, author, pages, seed)[:32].upper()
+        pdf.file_id = lambda: f"<{file_id}><{file_id}>"  # instead of a hash including the clock
+    else:
+        stamp = datetime.now(timezone.utc)
+    generated = stamp.replace(tzinfo=None).isoformat()
 
     for page in range(pages):
         pdf.add_page()
@@ -198,11 +324,11 @@ def make_pdf_bytes(title: str, author: str, pages: int, seed: int) -> bytes:
 
         if HAVE_ENUMS:
             pdf.cell(0, 16, meta, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-            pdf.cell(0, 16, f"Generated: {datetime.utcnow().isoformat()}Z",
+            pdf.cell(0, 16, f"Generated: {generated}Z",
                      new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         else:
             pdf.cell(0, 16, meta, ln=1)
-            pdf.cell(0, 16, f"Generated: {datetime.utcnow().isoformat()}Z", ln=1)
+            pdf.cell(0, 16, f"Generated: {generated}Z", ln=1)
         pdf.ln(8)
 
         # Body text
@@ -216,9 +342,209 @@ def make_pdf_bytes(title: str, author: str, pages: int, seed: int) -> bytes:
             pdf.multi_cell(0, 16, f"{_LOREM} #{i+1}")
             pdf.ln(4)
 
+    t3 = time.perf_counter()
     out = pdf.output(dest="S")
     # fpdf2 returns bytes; older may return str
-    return out if isinstance(out, (bytes, bytearray)) else str(out).encode("latin1", "ignore")
+    out = out if isinstance(out, (bytes, bytearray)) else str(out).encode("latin1", "ignore")
+    if timings is not None:
+        timings.update(fonts=(t1 - t0) if fresh else 0.0, clone=t2 - t1, layout=t3 - t2,
+                       output=time.perf_counter() - t3)
+    return bytes(out)
+
+
+class PdfJob(NamedTuple):
+    slug: str
+    title: str
+    caption: str
+    filename: str
+    pages: int
+    seed: int
+
+
+class BuiltPdf(NamedTuple):
+    blob: bytes
+    previews: Optional[Dict[str, Any]]  # derivatives for the bundle route, if rendered
+    preview_error: str
+    timings: Dict[str, float]
+    cached: bool  # taken from the artifact cache instead of rendered
+
+
+def build_pdf(job: PdfJob, author: str, previews: bool, reproducible: bool,
+              cache_root: Optional[str]) -> BuiltPdf:
+    """Process-pool entry point. Reproducible PDFs go through the artifact cache at
+    `cache_root` (an AssetCache, which is safe across processes)."""
+    timings: Dict[str, float] = {}
+    cache = AssetCache(cache_root) if cache_root and reproducible else None
+    key = f"pdf-{pdf_identity(job.title, author, job.pages, job.seed)}"
+    t = time.perf_counter()
+    hit = cache.get(key) if cache else None
+    if hit:
+        with hit.open() as f:
+            blob = f.read()
+        timings["cache"] = time.perf_counter() - t
+    else:
+        blob = make_pdf_bytes(title=job.title, author=author, pages=job.pages, seed=job.seed,
+                              timings=timings, reproducible=reproducible)
+        if cache:
+            cache.put(key, [blob], {"content_type": "application/pdf", "ext": ".pdf", "title": job.title,
+                                    "generator": GENERATOR_VERSION})
+    if not previews:
+        return BuiltPdf(blob, None, "", timings, bool(hit))
+    t = time.perf_counter()
+    try:
+        return BuiltPdf(blob, derivatives.derive("pdf", blob), "", timings, bool(hit))
+    except Exception as e:
+        return BuiltPdf(blob, None, str(e) or type(e).__name__, timings, bool(hit))
+    finally:
+        timings["previews"] = time.perf_counter() - t
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{k} {v * 1000:.0f}ms" for k, v in timings.items())
+
+
+# ---------- stress mode ----------
+# fpdf2 holds the whole document in memory, so the load-test PDFs are written
+# by hand: one page at a time straight to disk, keeping only xref offsets.
+
+def write_stress_pdf(path: str, title: str, pages: int, seed: int, image_kb: int = 64) -> int:
+    """Write a `pages`-page PDF to `path` in bounded memory; returns its size in bytes.
+
+    Each page carries a few lines of Helvetica text and, if image_kb > 0, an
+    uncompressible RGB noise image of about that size (think scanned pages),
+    so file size grows linearly with the page count.
+    """
+    rng = random.Random(seed)
+    side = int(math.sqrt(image_kb * 1024 / 3)) if image_kb > 0 else 0
+    offsets: Dict[int, int] = {}
+    kids: List[int] = []
+    with open(path, "wb") as f:
+        def obj(num: int, body: bytes, stream: Optional[bytes] = None) -> None:
+            offsets[num] = f.tell()
+            f.write(b"%d 0 obj\n" % num + body)
+            if stream is not None:
+                f.write(b"\nstream\n" + stream + b"\nendstream")
+            f.write(b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        safe = title.encode("latin-1", "replace").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+        for page in range(pages):
+            content_id, page_id, image_id = 4 + 3 * page, 5 + 3 * page, 6 + 3 * page
+            lines = [b"BT /F1 18 Tf 50 790 Td (%s) Tj ET" % safe,
+                     b"BT /F1 10 Tf 50 770 Td (Page %d/%d) Tj ET" % (page + 1, pages)]
+            for i in range(rng.randint(4, 8)):
+                lines.append(b"BT /F1 9 Tf 50 %d Td (%s #%d) Tj ET" % (740 - 14 * i, _LOREM[:110].encode(), i + 1))
+            resources = b"/Font << /F1 3 0 R >>"
+            if side:
+                lines.append(b"q 495 0 0 495 50 50 cm /Im1 Do Q")
+                resources += b" /XObject << /Im1 %d 0 R >>" % image_id
+            content = b"\n".join(lines)
+            obj(content_id, b"<< /Length %d >>" % len(content), content)
+            obj(page_id, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << %s >> "
+                         b"/Contents %d 0 R >>" % (resources, content_id))
+            if side:
+                pixels = rng.randbytes(side * side * 3)
+                obj(image_id, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+                              b"/BitsPerComponent 8 /Length %d >>" % (side, side, len(pixels)), pixels)
+            kids.append(page_id)
+        obj(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), pages))
+        xref = f.tell()
+        size = max(offsets) + 1
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for num in range(1, size):
+            f.write(b"%010d 00000 n \n" % offsets[num] if num in offsets else b"0000000000 65535 f \n")
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref))
+        return f.tell()
+
+
+class TimedReader:
+    """File wrapper for upload bodies: notes when the request started and
+    finished reading it. After that the body is on the wire, and the rest of
+    the request time is the server's (PHP upload handling, metadata and
+    preview generation). A rewind for a retry or fallback starts over.
+    """
+
+    def __init__(self, f: BinaryIO, size: int):
+        self._f = f
+        self.size = size
+        self.started = self.finished = 0.0
+
+    def tell(self) -> int:
+        return self._f.tell()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._f.seek(offset, whence)
+
+    def read(self, n: int = -1) -> bytes:
+        if self._f.tell() == 0:
+            self.started, self.finished = time.perf_counter(), 0.0
+        data = self._f.read(n)
+        if not self.finished and self._f.tell() >= self.size:
+            self.finished = time.perf_counter()
+        return data
+
+
+def run_stress(wp: WPClient, uploader: MediaUploader, prefix: str, buckets: List[int], count: int,
+               image_kb: int, keep: bool) -> int:
+    """Upload `count` generated PDFs per page-count bucket and report MB/s and server time."""
+    rows = []
+    failed = 0
+    with tempfile.TemporaryDirectory(prefix="pdf-stress-") as tmp:
+        for pages in buckets:
+            sizes: List[int] = []
+            write_s: List[float] = []
+            send_s: List[float] = []
+            server_s: List[float] = []
+            for n in range(1, count + 1):
+                slug = f"{prefix}-stress-{pages}p-{n:02d}"
+                path = os.path.join(tmp, f"{slug}.pdf")
+                t = time.perf_counter()
+                size = write_stress_pdf(path, f"{prefix} stress {pages}p #{n}", pages, seed=pages * 1000 + n,
+                                        image_kb=image_kb)
+                write_s.append(time.perf_counter() - t)
+                try:
+                    with open(path, "rb") as f:
+                        body = TimedReader(f, size)
+                        created, left = uploader.create(f"{slug}.pdf", body, "application/pdf",
+                                                        {"slug": slug, "title": slug})
+                        done = time.perf_counter()
+                    if left:  # raw-binary fallback; set slug/title outside the measured request
+                        r = wp.post(f"media/{created['id']}", json=left, timeout=30)
+                        if not r.ok:
+                            # the upload itself was measured, so keep its numbers (and delete it below)
+                            print(f"[pdf-seed] ERROR: setting fields on stress media #{created['id']} failed: "
+                                  f"HTTP {r.status_code} {r.text[:200]}", file=sys.stderr)
+                            failed += 1
+                except Exception as e:
+                    print(f"[pdf-seed] ERROR: stress upload {slug} ({size / 1e6:.1f} MB) failed: {e}", file=sys.stderr)
+                    failed += 1
+                    continue
+                finally:
+                    os.remove(path)  # at most one stress file on disk at a time
+                sizes.append(size)
+                send_s.append(max(body.finished - body.started, 1e-9))
+                server_s.append(done - body.finished)
+                print(f"[pdf-seed] stress {slug}: {size / 1e6:.1f} MB, write {write_s[-1]:.1f}s, "
+                      f"upload {size / 1e6 / send_s[-1]:.1f} MB/s, server {server_s[-1]:.2f}s "
+                      f"(media #{created.get('id')})", file=sys.stderr)
+                if not keep:
+                    r = wp.request("DELETE", f"media/{created['id']}", params={"force": "true"}, timeout=60)
+                    if not r.ok:
+                        print(f"[pdf-seed] WARN: could not delete stress media #{created['id']}: "
+                              f"HTTP {r.status_code}", file=sys.stderr)
+            if sizes:
+                rows.append((pages, len(sizes), sum(sizes) / len(sizes) / 1e6,
+                             sum(sizes) / 1e6 / sum(send_s), sum(server_s) / len(server_s),
+                             sum(write_s) / len(write_s)))
+
+    print("[pdf-seed] stress summary (per size bucket):", file=sys.stderr)
+    print(f"  {'pages':>7} {'files':>5} {'MB/file':>8} {'upload MB/s':>11} {'server s':>8} {'write s':>7}",
+          file=sys.stderr)
+    for pages, files, mb, mbps, server, write in rows:
+        print(f"  {pages:>7} {files:>5} {mb:>8.1f} {mbps:>11.1f} {server:>8.2f} {write:>7.1f}", file=sys.stderr)
+    return 0 if rows and not failed else 4
 
 
 # ---------- main ----------
@@ -230,27 +556,90 @@ def main() -> int:
     parser.add_argument("--pages-max", type=int, default=int(evar("PDF_PAGES_MAX", "3")))
     parser.add_argument("--force-new", action="store_true", default=bool_env("PDF_FORCE_NEW", False))
     parser.add_argument("--update-existing", action="store_true", default=bool_env("PDF_UPDATE_EXISTING", True))
+    parser.add_argument("--no-dedup", dest="dedup", action="store_false", default=bool_env("PDF_DEDUP", True),
+                        help="upload even when an attachment with the same bytes exists")
+    parser.add_argument("--no-multipart", dest="multipart", action="store_false",
+                        default=bool_env("PDF_MULTIPART", True),
+                        help="create + update in two requests instead of one multipart upload")
+    parser.add_argument("--no-previews", dest="previews", action="store_false",
+                        default=bool_env("PDF_PREVIEWS", True),
+                        help="let WordPress render the PDF previews instead of uploading them")
+    parser.add_argument("--no-reproducible", dest="reproducible", action="store_false",
+                        default=bool_env("PDF_REPRODUCIBLE", True),
+                        help="stamp PDFs with the current time (no artifact cache)")
+    parser.add_argument("--workers", type=int, default=int(evar("PDF_WORKERS", str(os.cpu_count() or 2))),
+                        help="PDF generator processes")
+    parser.add_argument("--stress", action="store_true", default=bool_env("PDF_STRESS", False),
+                        help="upload large generated PDFs and report throughput instead of seeding")
+    parser.add_argument("--stress-pages", default=evar("PDF_STRESS_PAGES", "100,1000"),
+                        help="comma-separated page counts, one size bucket each")
+    parser.add_argument("--stress-count", type=int, default=int(evar("PDF_STRESS_COUNT", "1")),
+                        help="PDFs per bucket")
+    parser.add_argument("--stress-image-kb", type=int, default=int(evar("PDF_STRESS_IMAGE_KB", "64")),
+                        help="noise image per page, in KiB (0 for text only)")
+    parser.add_argument("--stress-keep", action="store_true", default=bool_env("PDF_STRESS_KEEP", False),
+                        help="keep the stress uploads instead of deleting them afterwards")
     args = parser.parse_args()
+    if args.previews and not derivatives.available("pdf"):
+        print("[pdf-seed] no PDF rasteriser (Pillow + pypdfium2 or pdftoppm); "
+              "WordPress will render the previews", file=sys.stderr)
+        args.previews = False
 
     if args.pages_min < 1 or args.pages_max < args.pages_min:
         sys.exit("ERROR: invalid pages range")
 
-    base_url = wp_base_url()
-    auth = wp_auth()
     verify_ssl = bool_env("WP_VERIFY_SSL", True)
 
-    s = http()
+    wp = wp_client(verify_ssl)
 
     # Verify WordPress access
     try:
-        wp_check_me(s, base_url, auth, verify_ssl)
-        print(f"[pdf-seed] Authenticated to {base_url} as {auth[0]}", file=sys.stderr)
+        wp_check_me(wp)
+        print(f"[pdf-seed] Authenticated to {wp.base} as {wp.username}", file=sys.stderr)
     except Exception as e:
         print(f"[pdf-seed] ERROR: WordPress auth failed: {e}", file=sys.stderr)
         return 2
 
-    uploaded = skipped = updated = 0
+    if args.stress:
+        try:
+            buckets = [int(p) for p in args.stress_pages.split(",") if p.strip()]
+        except ValueError:
+            sys.exit("ERROR: --stress-pages must be comma-separated page counts")
+        # plain create, not the bundle route: WordPress' own preview pipeline is part of what is measured
+        return run_stress(wp, MediaUploader(wp, multipart=args.multipart, timeout=600), args.prefix, buckets,
+                          max(1, args.stress_count), args.stress_image_kb, args.stress_keep)
+
+    uploaded = skipped = updated = unchanged = duplicates = generated = from_cache = 0
+    cache = AssetCache.from_env() if args.reproducible else None
+    writer = BatchWriter(wp)
+    uploader = MediaUploader(wp, multipart=args.multipart)
+    media = wp_media_index(wp)
+    by_hash: Dict[str, Dict[str, Any]] = {}
+    if not args.force_new or args.dedup:
+        try:
+            if args.dedup and not media.synced:
+                media.sweep()  # the hash index needs the whole library
+            else:
+                # one GET per 100 PDFs instead of one per PDF
+                media.preload(f"{args.prefix}-{i:03d}" for i in range(1, args.count + 1))
+            for it in media.items():
+                sha = stored_fingerprint(it, CONTENT_HASH_META)
+                if sha:
+                    by_hash.setdefault(sha, it)
+        except Exception as e:
+            print(f"[pdf-seed] WARN: bulk lookup failed, checking one by one: {e}", file=sys.stderr)
+
+    def update_done(op: WriteOp) -> None:
+        nonlocal updated
+        mid = op.route.rsplit("/", 1)[-1]
+        if op.ok:
+            media.put(op.data)
+            updated += 1
+            print(f"[pdf-seed] updated media #{mid} text fields", file=sys.stderr)
+        else:
+            print(f"[pdf-seed] WARN: update failed for #{mid}: {op.error()}", file=sys.stderr)
 
+    todo: List[PdfJob] = []
     for i in range(1, args.count + 1):
         slug = f"{args.prefix}-{i:03d}"
         title = f"{args.prefix} #{i:03d}"
@@ -260,7 +649,7 @@ def main() -> int:
         existing = None
         if not args.force_new:
             try:
-                existing = wp_find_media_by_slug(s, base_url, auth, slug, verify_ssl)
+                existing = media.get(slug)
             except Exception as e:
                 print(f"[pdf-seed] WARN: lookup failed for {slug}: {e}", file=sys.stderr)
 
@@ -268,40 +657,78 @@ def main() -> int:
             mid = existing.get("id")
             print(f"[pdf-seed] exists media #{mid} (slug {slug}); skipping upload", file=sys.stderr)
             if args.update_existing:
-                try:
-                    wp_update_media_fields(s, base_url, auth, mid, {"title": title, "caption": caption}, verify_ssl)
-                    updated += 1
-                    print(f"[pdf-seed] updated media #{mid} text fields", file=sys.stderr)
-                except Exception as e:
-                    print(f"[pdf-seed] WARN: update failed for #{mid}: {e}", file=sys.stderr)
+                data = changed_fields(existing, {"title": title, "caption": caption})
+                if data:
+                    wp_update_media_fields(writer, mid, data, on_done=update_done)
+                else:
+                    unchanged += 1
             skipped += 1
             continue
 
-        # Create PDF bytes
-        pages = random.randint(args.pages_min, args.pages_max)
-        blob = make_pdf_bytes(title=title, author=auth[0], pages=pages, seed=i)
-
-        try:
-            res = wp_upload_media_binary(
-                s,
-                base_url,
-                auth,
-                filename=filename,
-                blob=blob,
-                content_type="application/pdf",
-                meta={"slug": slug, "title": title, "caption": caption},
-                verify_ssl=verify_ssl,
-            )
-            mid = res.get("id")
-            url = res.get("source_url")
-            print(f"[pdf-seed] uploaded media #{mid}: {url}", file=sys.stderr)
-            uploaded += 1
-        except Exception as e:
-            print(f"[pdf-seed] ERROR: upload failed for {slug}: {e}", file=sys.stderr)
-            continue
-
-    print(f"[pdf-seed] Done. Uploaded {uploaded}, updated {updated}, skipped {skipped}.", file=sys.stderr)
-    return 0 if (uploaded or skipped) else 4
+        # reproducible runs draw the page count from the seed too, so reruns hit the artifact cache
+        rng = random.Random(i) if args.reproducible else random
+        pages = rng.randint(args.pages_min, args.pages_max)
+        todo.append(PdfJob(slug, title, caption, filename, pages, seed=i))
+
+    gen_time: Counter = Counter()  # summed per-PDF timings, by phase
+    # spawn, not fork: the HTTP pool and the batch writer's state stay in this process
+    workers = max(1, args.workers)
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        build = partial(build_pdf, author=wp.username, previews=args.previews, reproducible=args.reproducible,
+                        cache_root=cache.root if cache else None)
+        for job, built, err in map_ordered(build, todo, workers, executor=pool):
+            if err:
+                print(f"[pdf-seed] ERROR: generating {job.slug} failed: {err}", file=sys.stderr)
+                continue
+            blob, previews, preview_err, timings, cached = built
+            generated += 1
+            from_cache += cached
+            for k, v in timings.items():
+                gen_time[k] += v
+            if preview_err:
+                print(f"[pdf-seed] WARN: preview render failed for {job.slug}, WordPress will: {preview_err}",
+                      file=sys.stderr)
+            fields: Dict[str, Any] = {"slug": job.slug, "title": job.title, "caption": job.caption}
+            if args.dedup:
+                sha = content_hash(blob)
+                dup = by_hash.get(sha)
+                if dup:
+                    ref = f"#{dup['id']}" if dup.get("id") else f"slug {dup.get('slug')}"
+                    print(f"[pdf-seed] same bytes as media {ref}; skipping upload of {job.slug}", file=sys.stderr)
+                    duplicates += 1
+                    continue
+                by_hash[sha] = {"slug": job.slug}  # claimed; released below if the upload fails
+                fields["meta"] = {CONTENT_HASH_META: sha}
+            try:
+                # one multipart request (bundle route when previews were rendered);
+                # create + update only if the server rejects multipart
+                res = uploader.upload(job.filename, blob, "application/pdf", fields, previews=previews)
+                mid = res.get("id")
+                url = res.get("source_url")
+                media.put(res)
+                print(f"[pdf-seed] uploaded media #{mid}: {url} ({format_timings(timings)})", file=sys.stderr)
+                uploaded += 1
+            except Exception as e:
+                print(f"[pdf-seed] ERROR: upload failed for {job.slug}: {e}", file=sys.stderr)
+                if args.dedup and by_hash.get(sha) == {"slug": job.slug}:
+                    del by_hash[sha]  # release the claim so a later job with these bytes still uploads
+                continue
+
+    writer.flush()
+    mode = {True: "multipart", False: "two-step"}.get(uploader.multipart, "none")
+    if uploader.bundle:
+        mode = "bundle + client-rendered previews"
+    print(f"[pdf-seed] Done. Uploaded {uploaded}, updated {updated}, skipped {skipped} "
+          f"({uploader.requests_sent} upload requests, {mode}; {unchanged} no-op update(s) avoided, "
+          f"{duplicates} duplicate upload(s) avoided).",
+          file=sys.stderr)
+    if cache:
+        print(f"[pdf-seed] PDF artifact cache: {from_cache} of {generated} reused from {cache.root}",
+              file=sys.stderr)
+    if generated:
+        print(f"[pdf-seed] generation per PDF (mean of {generated}): "
+              f"{format_timings({k: v / generated for k, v in gen_time.items()})}", file=sys.stderr)
+    return 0 if (uploaded or skipped or duplicates) else 4
 
 
 if __name__ == "__main__":
@@ -22,12 +22,17 @@ INPUT DATA (CSV):
 
 USAGE:
   python3 scripts/data-seeding-posts-pages.py --update
+  # more parallel upserts (default 4; output order stays deterministic):
+  python3 scripts/data-seeding-posts-pages.py --posts-per-branch 50 --concurrency 16
   # or tweak templates:
   python3 scripts/data-seeding-posts-pages.py \
       --page-title "{office} | アクセス" \
       --page-content "<h2>{office}</h2><p>{address}</p>\n{map_embed}\n{contact_html}"
 
 Notes:
+- **--update** skips pages/posts whose payload fingerprint matches the `seed_fingerprint`
+  meta stored on the last write (needs the seed-fingerprint.php mu-plugin; without it
+  every existing item is rewritten as before).
 - **Pages:** If your page template omits {map_embed}, the script appends the iframe automatically when an address exists.
 - **Posts:** Maps are NOT added (no auto-append, default template has no {map_embed}).
 - No Google API key is used. The embed URL is: https://www.google.com/maps?q=...&output=embed
@@ -36,18 +41,21 @@ Notes:
 from __future__ import annotations
 
 import argparse
-import base64
 import csv
-import json
 import os
 import re
 import sys
 import typing as t
 import urllib.parse
+from collections import deque
 from dataclasses import dataclass
 
-import urllib.request
-import urllib.error
+import requests
+
+from wpclient import (
+    DEFAULT_POOL_SIZE, FINGERPRINT_META, BatchWriter, SlugIndex, StateStore, SyncedCollection,
+    WPClient, WriteOp, fingerprint, map_ordered, stored_fingerprint,
+)
 
 # ---------------------------------------------------------------------------
 # Models
@@ -124,66 +132,32 @@ def load_address_book(csv_path: str | None) -> dict[str, Branch]:
     return book
 
 # ---------------------------------------------------------------------------
-# WP REST client (urllib)
+# WP REST client (pooled, see wpclient/)
 # ---------------------------------------------------------------------------
 
 class WP:
-    def __init__(self, base_url: str, username: str, app_password: str):
-        base = base_url.rstrip("/")
-        self.base = base
-        token = base64.b64encode(f"{username}:{app_password}".encode()).decode()
-        self.headers = {
-            "Authorization": f"Basic {token}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        }
-
-    def _url(self, route: str) -> str:
-        route = route.lstrip("/")
-        return f"{self.base}/wp-json/wp/v2/{route}"
+    def __init__(self, base_url: str, username: str, app_password: str, pool_size: int | None = None,
+                 batch: bool = True, workers: int = 1):
+        self.client = WPClient(base_url, username, app_password, pool_size=pool_size)
+        self.base = self.client.base
+        # create/update are queued here and sent 25 per /batch/v1 call, `workers` calls at a time
+        self.writer = BatchWriter(self.client, enabled=batch, workers=workers)
+        self.indexes: dict[str, SlugIndex] = {}
+        # remote inventories cached between runs (SEED_STATE=0 disables, see wpclient/state.py)
+        self.state = StateStore.for_client(self.client)
+        self.categories = SyncedCollection(self.client, self.state, "categories",
+                                           fields=("id", "slug", "name"), deltas=False)
 
     def _req(self, method: str, route: str, params: dict | None = None, body: dict | None = None) -> dict | list:
-        url = self._url(route)
-        if params:
-            url += ("?" + urllib.parse.urlencode(params))
-        data: bytes | None = None
-        if body is not None:
-            data = json.dumps(body).encode("utf-8")
-        req = urllib.request.Request(url, data=data, method=method.upper(), headers=self.headers)
         try:
-            with urllib.request.urlopen(req) as resp:
-                raw = resp.read()
-                if not raw:
-                    return {}
-                return json.loads(raw.decode("utf-8"))
-        except urllib.error.HTTPError as e:
-            try:
-                err = e.read().decode("utf-8")
-            except Exception:
-                err = str(e)
-            raise RuntimeError(f"WP {method} {route} -> {e.code} {e.reason}: {err}")
-
-    # ---- pagination ----
-    def _paged(self, route: str, **params) -> list[dict]:
-        out: list[dict] = []
-        page = 1
-        while True:
-            p = dict(params)
-            p.setdefault("per_page", 100)
-            p["page"] = page
-            try:
-                data = self._req("GET", route, p)
-            except RuntimeError as e:
-                if "rest_post_invalid_page_number" in str(e):
-                    break
-                raise
-            if not isinstance(data, list) or not data:
-                break
-            out.extend(t.cast(list[dict], data))
-            if len(data) < p["per_page"]:
-                break
-            page += 1
-        return out
+            r = self.client.request(method, route, params=params, json=body)
+        except requests.RequestException as e:
+            raise RuntimeError(f"WP {method} {route} -> {e}")
+        if r.status_code >= 400:
+            raise RuntimeError(f"WP {method} {route} -> {r.status_code} {r.reason}: {r.text}")
+        if not r.content:
+            return {}
+        return r.json()
 
     # ---- taxonomy ----
     def get_category_by_slug(self, slug: str) -> dict | None:
@@ -198,19 +172,50 @@ class WP:
         return t.cast(dict, self._req("POST", "categories", body=body))
 
     def list_branch_categories(self) -> list[dict]:
-        cats = self._paged("categories")
+        try:
+            cats = self.categories.load().values()
+        except requests.HTTPError as e:  # same report as _req, not a traceback from inside wpclient
+            r = e.response
+            raise RuntimeError(f"WP GET categories -> {r.status_code} {r.reason}: {r.text}") from None
         return [c for c in cats if isinstance(c.get("slug"), str) and c["slug"].startswith("branch-")]
 
     # ---- content ----
-    def get_by_slug(self, kind: str, slug: str) -> dict | None:
-        arr = self._req("GET", kind, {"slug": slug})
-        return arr[0] if isinstance(arr, list) and arr else None
-
-    def create(self, kind: str, body: dict) -> dict:
-        return t.cast(dict, self._req("POST", kind, body=body))
+    def index(self, kind: str) -> SlugIndex:
+        """slug -> {id, slug, modified_gmt, meta} for pages/posts; preload() it before upserting."""
+        if kind not in self.indexes:
+            self.indexes[kind] = SlugIndex(self.client, kind, fields=("id", "slug", "modified_gmt", "meta"),
+                                           store=self.state)
+        return self.indexes[kind]
+
+    def _record(self, kind: str, op: WriteOp) -> None:
+        if not op.ok:
+            return
+        if kind in self.indexes:
+            self.indexes[kind].put(op.data)
+        elif kind == "categories":
+            self.categories.put(op.data)
 
-    def update(self, kind: str, post_id: int, body: dict) -> dict:
-        return t.cast(dict, self._req("POST", f"{kind}/{post_id}", body=body))
+    def get_by_slug(self, kind: str, slug: str) -> dict | None:
+        return self.index(kind).get(slug)
+
+    # ---- writes (queued; resolved on flush or when a batch fills) ----
+    def create(self, kind: str, body: dict, on_done: t.Callable[[WriteOp], None] | None = None) -> WriteOp:
+        def done(op: WriteOp) -> None:
+            self._record(kind, op)
+            if on_done:
+                on_done(op)
+        return self.writer.add("POST", kind, body, on_done=done)
+
+    def update(self, kind: str, post_id: int, body: dict,
+               on_done: t.Callable[[WriteOp], None] | None = None) -> WriteOp:
+        def done(op: WriteOp) -> None:
+            self._record(kind, op)
+            if on_done:
+                on_done(op)
+        return self.writer.add("POST", f"{kind}/{post_id}", body, on_done=done)
+
+    def flush(self) -> list[WriteOp]:
+        return self.writer.flush()
 
 # ---------------------------------------------------------------------------
 # Google Maps (no API) + contact HTML
@@ -340,51 +345,49 @@ def build_post_payload(b: Branch, index: int, title_tpl: str, content_tpl: str)
 # Upsert logic
 # ---------------------------------------------------------------------------
 
-def upsert_page(wp: WP, payload: dict, update: bool, dry_run: bool = False) -> int | None:
-    slug = payload.get("slug")
-    assert slug, "page payload requires slug"
-    existing = wp.get_by_slug("pages", slug)
-    if existing:
-        if update:
-            if dry_run:
-                print(f"DRY-RUN: would UPDATE page {slug} (id={existing['id']})")
-                return existing["id"]
-            r = wp.update("pages", existing["id"], payload)
-            print(f"Updated page {slug} (id={r['id']})")
-            return r["id"]
-        else:
-            print(f"Skip existing page {slug} (id={existing['id']})")
-            return existing["id"]
-    else:
-        if dry_run:
-            print(f"DRY-RUN: would CREATE page {slug}")
-            return None
-        r = wp.create("pages", payload)
-        print(f"Created page {slug} (id={r['id']})")
-        return r["id"]
+def _log_write(log: t.Callable[[str], None], what: str, slug: str) -> t.Callable[[WriteOp], None]:
+    def done(op: WriteOp) -> None:
+        if op.ok:
+            log(f"{what} {slug} (id={op.data['id']})")
+    return done
 
-def upsert_post(wp: WP, payload: dict, update: bool, dry_run: bool = False) -> int | None:
+def _upsert(wp: WP, kind: str, label: str, payload: dict, update: bool, dry_run: bool,
+            log: t.Callable[[str], None]) -> WriteOp | None:
     slug = payload.get("slug")
-    assert slug, "post payload requires slug"
-    existing = wp.get_by_slug("posts", slug)
+    assert slug, f"{label} payload requires slug"
+    # The fingerprint of what we send is stored in post meta (seed-fingerprint.php),
+    # so --update can skip items whose title/content/etc. are byte-identical and
+    # avoid a new revision row + cache invalidation for every rerun.
+    fp = fingerprint(payload)
+    body = {**payload, "meta": {FINGERPRINT_META: fp}}
+    existing = wp.get_by_slug(kind, slug)
     if existing:
+        if update and stored_fingerprint(existing) == fp:
+            log(f"Unchanged {label} {slug} (id={existing['id']})")
+            return None
         if update:
             if dry_run:
-                print(f"DRY-RUN: would UPDATE post {slug} (id={existing['id']})")
-                return existing["id"]
-            r = wp.update("posts", existing["id"], payload)
-            print(f"Updated post {slug} (id={r['id']})")
-            return r["id"]
+                log(f"DRY-RUN: would UPDATE {label} {slug} (id={existing['id']})")
+                return None
+            return wp.update(kind, existing["id"], body, on_done=_log_write(log, f"Updated {label}", slug))
         else:
-            print(f"Skip existing post {slug} (id={existing['id']})")
-            return existing["id"]
+            log(f"Skip existing {label} {slug} (id={existing['id']})")
+            return None
     else:
         if dry_run:
-            print(f"DRY-RUN: would CREATE post {slug}")
+            log(f"DRY-RUN: would CREATE {label} {slug}")
             return None
-        r = wp.create("posts", payload)
-        print(f"Created post {slug} (id={r['id']})")
-        return r["id"]
+        return wp.create(kind, body, on_done=_log_write(log, f"Created {label}", slug))
+
+def upsert_page(wp: WP, payload: dict, update: bool, dry_run: bool = False,
+                log: t.Callable[[str], None] = print) -> WriteOp | None:
+    """Look the page up and queue its create/update; returns the queued write, if any."""
+    return _upsert(wp, "pages", "page", payload, update, dry_run, log)
+
+def upsert_post(wp: WP, payload: dict, update: bool, dry_run: bool = False,
+                log: t.Callable[[str], None] = print) -> WriteOp | None:
+    """Look the post up and queue its create/update; returns the queued write, if any."""
+    return _upsert(wp, "posts", "post", payload, update, dry_run, log)
 
 # ---------------------------------------------------------------------------
 # Discover branches (from CSV + existing categories)
@@ -397,19 +400,24 @@ def discover_branches(wp: WP, csv_path: str | None) -> list[Branch]:
 
     branches: list[Branch] = []
 
-    # Ensure categories for branches from CSV
+    # Ensure categories for branches from CSV (missing ones are created in one batch)
+    def assign_category(b: Branch) -> t.Callable[[WriteOp], None]:
+        def done(op: WriteOp) -> None:
+            if op.ok:
+                b.category_id = op.data["id"]
+                print(f"Created category {b.slug} (id={b.category_id})")
+            else:
+                print(f"WARNING: could not create category {b.slug}: {op.error()}")
+        return done
+
     for slug, b in book.items():
         cat = existing.get(slug)
-        if not cat:
-            try:
-                cat = wp.ensure_category(slug, b.office)
-                print(f"Created category {slug} (id={cat['id']})")
-            except RuntimeError as e:
-                print(f"WARNING: could not create category {slug}: {e}")
-                cat = None
-        cid = cat["id"] if cat else None
-        b.category_id = cid
+        if cat:
+            b.category_id = cat["id"]
+        else:
+            wp.create("categories", {"slug": slug, "name": b.office}, on_done=assign_category(b))
         branches.append(b)
+    wp.flush()
 
     # Also include any branch categories present in WP that aren't in CSV
     for slug, cat in existing.items():
@@ -434,6 +442,11 @@ def run(argv: list[str]) -> int:
     ap.add_argument("--posts-per-branch", type=int, default=1, help="How many posts to create per branch")
     ap.add_argument("--update", action="store_true", help="Update existing pages/posts if present")
     ap.add_argument("--dry-run", action="store_true", help="Print actions without modifying WP")
+    ap.add_argument("--concurrency", type=int, default=int(os.environ.get("SEED_CONCURRENCY", "4")),
+                    help="Write requests in flight, i.e. batch envelopes (or single writes with --no-batch) "
+                         "sent in parallel (env: SEED_CONCURRENCY, default 4; 1 = serial)")
+    ap.add_argument("--no-batch", action="store_true", help="Send one request per write instead of /batch/v1 envelopes")
+    ap.add_argument("--pool-size", type=int, default=None, help="Keep-alive connections to WP (env: WP_POOL_SIZE, default 10)")
 
     ap.add_argument("--page-title", default="{office}", help="Page title template")
     ap.add_argument("--page-content", default=(
@@ -457,17 +470,68 @@ def run(argv: list[str]) -> int:
     if not csv_path:
         print("WARNING: offices.csv not found; proceeding without addresses.")
 
-    wp = WP(args.base, args.user, args.password)
+    # Every worker needs its own keep-alive connection, or threads just queue on the pool.
+    pool_size = args.pool_size or (args.concurrency if args.concurrency > DEFAULT_POOL_SIZE else None)
+    wp = WP(args.base, args.user, args.password, pool_size=pool_size, batch=not args.no_batch,
+            workers=args.concurrency)
     branches = discover_branches(wp, csv_path)
 
     print(f"Found {len(branches)} branches")
+    # Payloads are built up front (template errors abort before any write);
+    # each page/post upsert is independent, so they run in parallel and their
+    # log lines are replayed in this order regardless of completion order.
+    jobs: list[tuple[str, dict]] = []
     for br in branches:
-        page_payload = build_page_payload(br, args.page_title, args.page_content)
-        upsert_page(wp, page_payload, update=args.update, dry_run=args.dry_run)
+        jobs.append(("page", build_page_payload(br, args.page_title, args.page_content)))
         for i in range(1, args.posts_per_branch + 1):
-            post_payload = build_post_payload(br, i, args.post_title, args.post_content)
-            upsert_post(wp, post_payload, update=args.update, dry_run=args.dry_run)
-
+            jobs.append(("post", build_post_payload(br, i, args.post_title, args.post_content)))
+
+    # Existing pages/posts come from the sync state (a count + modified_after check)
+    # or, without it, one multi-slug GET per 100 items, never one GET per upsert.
+    for kind, route in (("page", "pages"), ("post", "posts")):
+        wp.index(route).preload(payload["slug"] for k, payload in jobs if k == kind)
+
+    def seed_one(job: tuple[str, dict]) -> tuple[list[str], WriteOp | None]:
+        kind, payload = job
+        lines: list[str] = []
+        upsert = upsert_page if kind == "page" else upsert_post
+        op = upsert(wp, payload, update=args.update, dry_run=args.dry_run, log=lines.append)
+        return lines, op
+
+    failed = 0
+    # Writes resolve when their batch is sent, so a job is printed only once
+    # its op is done; anything still queued is flushed and printed at the end.
+    backlog: deque = deque()
+
+    def drain(final: bool = False) -> None:
+        nonlocal failed
+        while backlog:
+            (kind, payload), res, exc = backlog[0]
+            op = res[1] if res else None
+            if not final and op is not None and not op.done:
+                break
+            backlog.popleft()
+            if exc is not None:
+                failed += 1
+                print(f"ERROR: {kind} {payload.get('slug')}: {exc}")
+                continue
+            for line in res[0]:
+                print(line)
+            if op is not None and not op.ok:
+                failed += 1
+                print(f"ERROR: {kind} {payload.get('slug')}: {op.error()}")
+
+    for outcome in map_ordered(seed_one, jobs, args.concurrency):
+        backlog.append(outcome)
+        drain()
+    wp.flush()
+    drain(final=True)
+    mode = {True: " via batch/v1", False: " as single requests"}.get(wp.writer.supported, "")
+    print(f"Write requests sent: {wp.writer.requests_sent}{mode}")
+
+    if failed:
+        print(f"⚠️ Done with {failed} failed item(s) out of {len(jobs)}.")
+        return 1
     print("✅ Done.")
     return 0
 
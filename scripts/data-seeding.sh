@@ -67,8 +67,11 @@ echo "✅ Preflight OK. Running seeders…"
 echo
 
 # ========= Run all data seeding scripts =========
+# data-seeding-offices.py does the work of the addresses + branches seeders in one
+# pass, so those two are only for running by hand.
 for f in ./data-seeding*.py; do
   [ -f "$f" ] || continue
+  case "$f" in ./data-seeding-addresses.py|./data-seeding-branches.py) continue ;; esac
   echo "→ python3 $f"
   python3 "$f"
 done
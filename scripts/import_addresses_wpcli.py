@@ -1,26 +1,32 @@
 #!/usr/bin/env python3
-# import_addresses_rest.py
+# import_addresses_wpcli.py
+# Bulk-import offices.csv on the WordPress host itself, without the REST API.
+#
+# The whole CSV is compiled into one PHP payload and run by a single
+# `wp eval-file -` (read from stdin, so it also works through docker exec).
+# Inside that one PHP process the rows become wp_insert_post/update_post_meta
+# calls in one transaction, with term counting deferred and object-cache
+# additions suspended, so a full import takes seconds instead of one HTTP
+# request per row.
+#
+# Same result as data-seeding-addresses.py: slug address-<id>, the CSV columns
+# in post meta, and the row fingerprint in seed_fingerprint, so both importers
+# (and data-seeding-offices.py) skip the rows the other one already wrote.
+#
 # Usage:
-#   export WP_BASE_URL=https://wp.lan
-#   export WP_USERNAME=admin
-#   export WP_APP_PASSWORD=MivGtw7W7S6z7RTWqJmkbGCu
-#   python import_addresses_rest.py /path/to/offices.csv
+#   export WP_PATH=/var/www/html          # passed as --path (optional)
+#   export WP_CLI="wp --allow-root"       # or "docker compose exec -T wordpress wp" (default: wp)
+#   python import_addresses_wpcli.py                      # uses offices.csv next to this script
+#   python import_addresses_wpcli.py /path/to/offices.csv [--branches] [--draft-removed] [--sync-all]
+#   python import_addresses_wpcli.py --emit payload.php   # write the PHP instead of running it
 
-import csv, os, sys, re, requests
-from typing import Dict, Optional
+import argparse, base64, csv, json, os, re, shlex, subprocess, sys
+from typing import Dict, List
 
-CSV_REQUIRED = ["ID","ID2","Office","Address","TEL","FAX","Email","URL","Work"]
-
-WP_BASE_URL = os.environ.get("WP_BASE_URL","").rstrip("/")
-WP_USERNAME = os.environ.get("WP_USERNAME","")
-WP_APP_PASSWORD = (os.environ.get("WP_APP_PASSWORD","") or "").replace(" ","")
-if not (WP_BASE_URL and WP_USERNAME and WP_APP_PASSWORD):
-    print("Set WP_BASE_URL, WP_USERNAME, WP_APP_PASSWORD", file=sys.stderr); sys.exit(1)
+from wpclient import FINGERPRINT_META, row_fingerprint
 
-API = f"{WP_BASE_URL}/wp-json/wp/v2/address"
-S = requests.Session()
-S.auth = (WP_USERNAME, WP_APP_PASSWORD)
-S.headers.update({"Accept":"application/json","Content-Type":"application/json; charset=utf-8"})
+CSV_REQUIRED = ["ID","ID2","Office","Address","TEL","FAX","Email","URL","Work"]
+RESULT_MARK = "@@import-result@@"
 
 def slugify_id(csv_id: str) -> str:
     # stable, deterministic slug tied to CSV ID
@@ -28,107 +34,237 @@ def slugify_id(csv_id: str) -> str:
     s = re.sub(r"-+","-", s).strip("-").lower()
     return f"address-{s}" if s else "address-unnamed"
 
-def fetch_existing_maps() -> tuple[Dict[str,int], Dict[str,int]]:
-    """Return (by_csv_id, by_slug) maps for existing posts."""
-    by_csv_id: Dict[str,int] = {}
-    by_slug: Dict[str,int] = {}
-    page = 1
-    total = 0
-    while True:
-        r = S.get(API, params={
-            "per_page": 100, "page": page,
-            "context": "edit",                # ensure meta is included with permissions
-            "_fields": "id,slug,meta"         # keep payload small, include meta
-        })
-        if r.status_code == 401:
-            print("401 Unauthorized: check creds/capabilities", file=sys.stderr); sys.exit(1)
-        if r.status_code == 404:
-            print("CPT /address not found (is plugin active?)", file=sys.stderr); sys.exit(1)
-        r.raise_for_status()
-        items = r.json()
-        if not items: break
-        for p in items:
-            pid = int(p["id"])
-            total += 1
-            slug = (p.get("slug") or "").strip()
-            if slug: by_slug[slug] = pid
-            meta = p.get("meta") or {}
-            cid = (meta.get("csv_id") or "").strip()
-            if cid: by_csv_id[cid] = pid
-        if len(items) < 100: break
-        page += 1
-    print(f"[INFO] Preloaded {total} address posts (csv_id:{len(by_csv_id)}, slug:{len(by_slug)})")
-    return by_csv_id, by_slug
-
-def upsert(row: Dict[str,str], pid: Optional[int]) -> int:
-    payload = {
-        "status": "publish",
-        "title": row["Office"],
-        "meta": {
-            "csv_id":  row["ID"],
-            "csv_id2": row["ID2"],
-            "address": row["Address"],
-            "tel":     row["TEL"],
-            "fax":     row["FAX"],
-            "email":   row["Email"],
-            "url":     row["URL"],
-            "work":    row["Work"],
-        },
-        # make slug stable so future runs can find it even if meta lookup fails
-        "slug": slugify_id(row["ID"]),
-    }
-    if pid:
-        r = S.post(f"{API}/{pid}", json=payload)
-    else:
-        r = S.post(API, json=payload)
-    r.raise_for_status()
-    return int(r.json()["id"])
-
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: import_addresses_rest.py /path/to/offices.csv", file=sys.stderr); sys.exit(1)
-    csv_path = sys.argv[1]
-    if not os.path.exists(csv_path):
-        print(f"CSV not found: {csv_path}", file=sys.stderr); sys.exit(1)
-
-    # quick probe (also checks auth)
-    probe = S.get(API, params={"per_page":1, "context":"edit", "_fields":"id"})
-    probe.raise_for_status()
-
-    by_csv_id, by_slug = fetch_existing_maps()
+def branch_slug(csv_id: str) -> str:
+    s = re.sub(r"[^a-zA-Z0-9_-]+","-", csv_id.strip())
+    return "branch-" + re.sub(r"-+","-", s).strip("-").lower()
 
-    created = updated = skipped = 0
+def read_rows(csv_path: str) -> List[Dict[str,str]]:
+    """Valid rows, one per ID (the last row for a repeated ID), in CSV order."""
+    rows: Dict[str,Dict[str,str]] = {}
     with open(csv_path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
-        missing = [h for h in CSV_REQUIRED if h not in reader.fieldnames]
+        missing = [h for h in CSV_REQUIRED if h not in (reader.fieldnames or [])]
         if missing:
             print(f"CSV missing headers: {missing}", file=sys.stderr); sys.exit(1)
-
         for i, raw in enumerate(reader, 1):
             row = {k:(raw.get(k,"") or "").strip() for k in CSV_REQUIRED}
             if not row["ID"] or not row["Office"]:
-                print(f"[WARN] Row {i}: missing ID or Office — skipping"); skipped += 1; continue
-
-            # primary: by csv_id; fallback: by expected slug
-            pid = by_csv_id.get(row["ID"])
-            if not pid:
-                pid = by_slug.get(slugify_id(row["ID"]))
-
-            try:
-                nid = upsert(row, pid)
-                if pid:
-                    updated += 1
-                    print(f"[OK] Updated {row['ID']} (post_id={nid})")
-                else:
-                    created += 1
-                    print(f"[OK] Created {row['ID']} (post_id={nid})")
-                # keep maps up-to-date for subsequent duplicates in same run
-                by_csv_id[row["ID"]] = nid
-                by_slug[slugify_id(row["ID"])] = nid
-            except requests.HTTPError as e:
-                print(f"[FAIL] Row {i} {row['ID']}: HTTP {e.response.status_code} -> {e.response.text}", file=sys.stderr)
-
-    print(f"\nDone. Created: {created}, Updated: {updated}, Skipped: {skipped}")
+                print(f"[WARN] Row {i}: missing ID or Office — skipping"); continue
+            rows[row["ID"]] = row
+    return list(rows.values())
+
+# Runs inside `wp eval-file`, so WordPress is loaded and WP_CLI is available.
+# Data comes in as base64 JSON: nothing from the CSV is ever spliced into PHP source.
+PHP_TEMPLATE = r"""<?php
+// Generated by import_addresses_wpcli.py: do not edit, regenerate from offices.csv.
+$job = json_decode(base64_decode('__PAYLOAD__'), true);
+if (!is_array($job)) { WP_CLI::error('payload did not decode'); }
+if (!post_type_exists('address')) { WP_CLI::error('post type "address" is not registered (is address-manager.php loaded?)'); }
+
+global $wpdb;
+$fp_key = $job['fingerprint_meta'];
+$out = ['created' => 0, 'updated' => 0, 'unchanged' => 0, 'drafted' => 0,
+        'branches_created' => 0, 'branches_updated' => 0, 'failed' => 0];
+
+// Index existing posts with two queries instead of a get_post_meta() per row.
+$by_slug = $by_csv = $status = $stored_fp = [];
+foreach ($wpdb->get_results($wpdb->prepare(
+    "SELECT ID, post_name, post_status FROM {$wpdb->posts} WHERE post_type = %s AND post_status IN ('publish', 'draft')",
+    'address')) as $p) {
+    $by_slug[$p->post_name] = (int) $p->ID;
+    $status[(int) $p->ID] = $p->post_status;
+}
+if ($status) {
+    $ids = implode(',', array_keys($status));
+    foreach ($wpdb->get_results($wpdb->prepare(
+        "SELECT post_id, meta_key, meta_value FROM {$wpdb->postmeta} WHERE post_id IN ($ids) AND meta_key IN ('csv_id', %s)",
+        $fp_key)) as $m) {
+        if ($m->meta_key === 'csv_id') { $by_csv[$m->meta_value] = (int) $m->post_id; }
+        else { $stored_fp[(int) $m->post_id] = $m->meta_value; }
+    }
+}
+
+$parent_id = 0;
+$terms = [];
+if ($job['branches']) {
+    $parent = get_term_by('slug', 'branch', 'category');
+    if ($parent) {
+        $parent_id = (int) $parent->term_id;
+    } else {
+        $made = wp_insert_term('Branch', 'category', ['slug' => 'branch']);
+        if (is_wp_error($made)) { WP_CLI::error('cannot create the Branch category: ' . $made->get_error_message()); }
+        $parent_id = (int) $made['term_id'];
+    }
+    foreach (get_terms(['taxonomy' => 'category', 'parent' => $parent_id, 'hide_empty' => false]) as $t) {
+        $terms[$t->slug] = $t;
+    }
+}
+
+// Bulk mode: term counts are recomputed once at the end, and the thousands of
+// meta/post lookups below are not copied into the object cache.
+wp_defer_term_counting(true);
+wp_suspend_cache_addition(true);
+$wpdb->query('START TRANSACTION');
+
+$seen = [];
+foreach ($job['rows'] as $r) {
+    $code = $r['row']['ID'];
+    $seen[$code] = true;
+    $pid = $by_csv[$code] ?? ($by_slug[$r['slug']] ?? 0);
+    $same = $pid && ($status[$pid] ?? '') === 'publish' && ($stored_fp[$pid] ?? '') === $r['fingerprint'];
+    if ($same && !$job['sync_all']) {
+        $out['unchanged']++;
+    } else {
+        $post = ['post_type' => 'address', 'post_status' => 'publish',
+                 'post_title' => $r['row']['Office'], 'post_name' => $r['slug']];
+        if ($pid) { $post['ID'] = $pid; }
+        $res = $pid ? wp_update_post(wp_slash($post), true) : wp_insert_post(wp_slash($post), true);
+        if (is_wp_error($res)) {
+            $out['failed']++;
+            WP_CLI::warning("[FAIL] $code: " . $res->get_error_message());
+            continue;
+        }
+        foreach ($r['meta'] as $key => $value) {
+            update_post_meta($res, $key, wp_slash($value));
+        }
+        $out[$pid ? 'updated' : 'created']++;
+        WP_CLI::log(sprintf('[OK] %s %s (post_id=%d)', $pid ? 'Updated' : 'Created', $code, $res));
+        $pid = (int) $res;
+    }
+
+    if ($job['branches']) {
+        $slug = $r['branch_slug'];
+        $term = $terms[$slug] ?? null;
+        if ($term && $same && !$job['sync_all'] && $term->name === $r['row']['Office']) {
+            continue;
+        }
+        $args = ['name' => $r['row']['Office'], 'slug' => $slug, 'parent' => $parent_id];
+        $res = $term ? wp_update_term($term->term_id, 'category', $args)
+                     : wp_insert_term($r['row']['Office'], 'category', $args);
+        if (is_wp_error($res)) {
+            $out['failed']++;
+            WP_CLI::warning("[FAIL] Branch $code: " . $res->get_error_message());
+            continue;
+        }
+        update_term_meta($res['term_id'], 'csv_id', $code);
+        update_term_meta($res['term_id'], 'address_post_id', $pid);
+        $out[$term ? 'branches_updated' : 'branches_created']++;
+    }
+}
+
+if ($job['draft_removed']) {
+    foreach ($by_csv as $code => $pid) {
+        if (isset($seen[$code]) || ($status[$pid] ?? '') !== 'publish') { continue; }
+        $res = wp_update_post(['ID' => $pid, 'post_status' => 'draft'], true);
+        if (is_wp_error($res)) {
+            $out['failed']++;
+            WP_CLI::warning("[FAIL] Draft $code: " . $res->get_error_message());
+            continue;
+        }
+        // a returning row then counts as changed and is republished
+        delete_post_meta($pid, $fp_key);
+        $out['drafted']++;
+        WP_CLI::log(sprintf('[OK] Drafted %s (post_id=%d): no longer in the CSV', $code, $pid));
+    }
+}
+
+$wpdb->query('COMMIT');
+wp_suspend_cache_addition(false);
+wp_defer_term_counting(false);  // recounts the terms touched above, once
+if ($job['branches']) { clean_term_cache($parent_id, 'category'); }
+
+echo '__MARK__' . wp_json_encode($out) . "\n";
+"""
+
+def build_payload(rows: List[Dict[str,str]], *, branches: bool, draft_removed: bool, sync_all: bool) -> str:
+    """The PHP program for `wp eval-file`, with the rows embedded as base64 JSON."""
+    job = {
+        "fingerprint_meta": FINGERPRINT_META,
+        "branches": branches,
+        "draft_removed": draft_removed,
+        "sync_all": sync_all,
+        "rows": [{
+            "row": row,
+            "slug": slugify_id(row["ID"]),
+            "branch_slug": branch_slug(row["ID"]),
+            "fingerprint": row_fingerprint(row),
+            "meta": {
+                "csv_id":  row["ID"],
+                "csv_id2": row["ID2"],
+                "address": row["Address"],
+                "tel":     row["TEL"],
+                "fax":     row["FAX"],
+                "email":   row["Email"],
+                "url":     row["URL"],
+                "work":    row["Work"],
+                FINGERPRINT_META: row_fingerprint(row),
+            },
+        } for row in rows],
+    }
+    blob = base64.b64encode(json.dumps(job, ensure_ascii=False).encode("utf-8")).decode("ascii")
+    return PHP_TEMPLATE.replace("__PAYLOAD__", blob).replace("__MARK__", RESULT_MARK)
+
+def wp_command() -> List[str]:
+    """WP_CLI (default: wp), split like a shell would, plus --path=$WP_PATH when set."""
+    cmd = shlex.split(os.environ.get("WP_CLI") or "wp")
+    if os.environ.get("WP_PATH"):
+        cmd.append(f"--path={os.environ['WP_PATH']}")
+    return cmd
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Import offices.csv as Address posts with one `wp eval-file`.")
+    parser.add_argument("csv_path", nargs="?", default=os.path.join(script_dir, "offices.csv"))
+    parser.add_argument("--branches", action="store_true",
+                        help="also upsert the Branch subcategories, as data-seeding-offices.py does")
+    parser.add_argument("--draft-removed", action="store_true",
+                        default=os.environ.get("DRAFT_REMOVED","0").lower() in ("1","true","yes","on"),
+                        help="move Address posts whose ID is no longer in the CSV to draft")
+    parser.add_argument("--sync-all", action="store_true",
+                        default=os.environ.get("SYNC_ALL","0").lower() in ("1","true","yes","on"),
+                        help="write every row, even when its fingerprint is unchanged")
+    parser.add_argument("--emit", metavar="PATH", help="write the PHP payload to PATH ('-' for stdout) and exit")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv_path):
+        print(f"CSV not found: {args.csv_path}", file=sys.stderr); sys.exit(1)
+    rows = read_rows(args.csv_path)
+    php = build_payload(rows, branches=args.branches, draft_removed=args.draft_removed, sync_all=args.sync_all)
+
+    if args.emit:
+        if args.emit == "-":
+            sys.stdout.write(php)
+        else:
+            with open(args.emit, "w", encoding="utf-8") as f:
+                f.write(php)
+            print(f"[INFO] Wrote {len(rows)} rows to {args.emit} ({len(php)} bytes); "
+                  f"run it with: {shlex.join(wp_command())} eval-file {shlex.quote(args.emit)}")
+        return
+
+    cmd = wp_command() + ["eval-file", "-"]
+    print(f"[INFO] {len(rows)} rows -> {shlex.join(cmd)}")
+    try:
+        proc = subprocess.run(cmd, input=php, capture_output=True, text=True)
+    except FileNotFoundError:
+        print(f"WP-CLI not found: {cmd[0]} (set WP_CLI)", file=sys.stderr); sys.exit(1)
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_MARK):
+            result = json.loads(line[len(RESULT_MARK):])
+        else:
+            print(line)
+    if proc.stderr:
+        print(proc.stderr.rstrip(), file=sys.stderr)
+    if proc.returncode != 0 or result is None:
+        print(f"wp eval-file failed (exit {proc.returncode})", file=sys.stderr); sys.exit(proc.returncode or 1)
+
+    summary = (f"Created: {result['created']}, Updated: {result['updated']}, Unchanged: {result['unchanged']}, "
+               f"Drafted: {result['drafted']}, Failed: {result['failed']}")
+    if args.branches:
+        summary += f", Branch cats created: {result['branches_created']}, updated: {result['branches_updated']}"
+    print(f"\nDone. {summary}")
+    if result["failed"]:
+        sys.exit(3)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,68 @@
+"""
+Shared helpers for the data-seeding scripts.
+
+The seeders are run as plain scripts from scripts/, so this package is
+importable as `wpclient` without installation:
+
+  from wpclient import WPClient
+  wp = WPClient(base_url, user, app_password)
+  wp.get("pages", params={"slug": "home"})
+"""
+from .assetcache import AssetCache, CachedAsset
+from .batch import BATCH_MAX, BatchWriter, WPError, WriteOp
+from .client import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, WPClient, make_session
+from .concurrency import Stage, map_ordered, run_pipeline
+from .fields import changed_fields, fields_for, uses_fields
+from .fingerprint import (
+    CONTENT_HASH_META, FINGERPRINT_META, RowDiff, content_hash, diff_rows, fingerprint, row_fingerprint,
+    stored_fingerprint,
+)
+from .governor import Governor, RetryPolicy, TokenBucket, governor
+from .httpcache import ResponseCache, get_json
+from .media import MediaUploader
+from .paging import PER_PAGE_MAX, iter_items
+from .slugindex import SlugIndex
+from .state import StateStore, SyncedCollection
+from .streams import BodyStream, multipart_body, spool
+
+__all__ = [
+    "AssetCache",
+    "BATCH_MAX",
+    "BatchWriter",
+    "BodyStream",
+    "CONTENT_HASH_META",
+    "CachedAsset",
+    "DEFAULT_POOL_SIZE",
+    "DEFAULT_TIMEOUT",
+    "FINGERPRINT_META",
+    "Governor",
+    "MediaUploader",
+    "PER_PAGE_MAX",
+    "ResponseCache",
+    "RetryPolicy",
+    "RowDiff",
+    "SlugIndex",
+    "Stage",
+    "StateStore",
+    "SyncedCollection",
+    "TokenBucket",
+    "WPClient",
+    "WPError",
+    "WriteOp",
+    "changed_fields",
+    "content_hash",
+    "diff_rows",
+    "fields_for",
+    "fingerprint",
+    "get_json",
+    "governor",
+    "iter_items",
+    "make_session",
+    "map_ordered",
+    "multipart_body",
+    "row_fingerprint",
+    "run_pipeline",
+    "spool",
+    "stored_fingerprint",
+    "uses_fields",
+]
@@ -0,0 +1,192 @@
+"""
+Content-addressed on-disk cache for downloaded assets (Pexels images).
+
+Layout under the cache root:
+
+  objects/<sha256[:2]>/<sha256>   file contents, stored once per distinct content
+  keys/<key>.json                 {"sha256", "size", "meta": {...}} for a lookup key
+
+A key names what was asked for (e.g. "pexels-123-original"). Its object
+is re-hashed on every hit, so a truncated or corrupted file is dropped
+and fetched again, never uploaded. Hits touch the object's mtime.
+Once the total size goes over `max_bytes`, the least recently used
+objects are evicted.
+
+The key files carry whatever `meta` the caller stored: content type,
+extension and the Pexels photo record. That makes the cache usable as an
+offline fixture source as well (see entries()).
+
+Env (optional):
+  ASSET_CACHE_DIR     - cache root (default: ~/.cache/wp-seeder/assets)
+  ASSET_CACHE_MAX_MB  - size bound in MiB (default: 2048)
+  ASSET_CACHE         - "0" to disable
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+
+CHUNK = 64 * 1024
+DEFAULT_MAX_MB = 2048
+
+
+def _safe_key(key: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", key)
+
+
+@dataclass
+class CachedAsset:
+    key: str
+    path: str
+    sha256: str
+    size: int
+    meta: Dict[str, Any]
+
+    def open(self) -> BinaryIO:
+        return open(self.path, "rb")
+
+
+class AssetCache:
+    """Safe to share between threads (and between processes on one host)."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or os.environ.get("ASSET_CACHE_DIR") or os.path.join(
+            os.path.expanduser("~"), ".cache", "wp-seeder", "assets"
+        )
+        if max_bytes is None:
+            try:
+                max_bytes = int(float(os.environ.get("ASSET_CACHE_MAX_MB") or DEFAULT_MAX_MB) * 1024 * 1024)
+            except ValueError:
+                max_bytes = DEFAULT_MAX_MB * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._objects = os.path.join(self.root, "objects")
+        self._keys = os.path.join(self.root, "keys")
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._keys, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["AssetCache"]:
+        """The default cache, or None when ASSET_CACHE=0."""
+        if os.environ.get("ASSET_CACHE", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        return cls()
+
+    def _key_path(self, key: str) -> str:
+        return os.path.join(self._keys, _safe_key(key) + ".json")
+
+    def _object_path(self, sha: str) -> str:
+        return os.path.join(self._objects, sha[:2], sha)
+
+    def _drop_key(self, key: str) -> None:
+        try:
+            os.remove(self._key_path(key))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(CHUNK), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[CachedAsset]:
+        """The verified asset for `key`, or None (missing, evicted or corrupt)."""
+        try:
+            with open(self._key_path(key), encoding="utf-8") as f:
+                rec = json.load(f)
+            path = self._object_path(rec["sha256"])
+            ok = os.path.getsize(path) == rec["size"] and self._hash_file(path) == rec["sha256"]
+        except (OSError, ValueError, KeyError):
+            ok = False
+        if not ok:
+            self._drop_key(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # LRU: mark as recently used
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return CachedAsset(key, path, rec["sha256"], rec["size"], rec.get("meta") or {})
+
+    def put(self, key: str, chunks: Iterable[bytes], meta: Optional[Dict[str, Any]] = None) -> CachedAsset:
+        """Store streamed content under `key` (hashing as it is written) and evict if over budget."""
+        h = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for block in chunks:
+                    f.write(block)
+                    h.update(block)
+                    size += len(block)
+            sha = h.hexdigest()
+            path = self._object_path(sha)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)  # same content -> same name; atomic either way
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        rec = {"sha256": sha, "size": size, "meta": meta or {}}
+        kfd, ktmp = tempfile.mkstemp(dir=self._keys, prefix=".incoming-")
+        with os.fdopen(kfd, "w", encoding="utf-8") as f:
+            json.dump(rec, f, ensure_ascii=False)
+        os.replace(ktmp, self._key_path(key))
+        self.evict(keep=path)
+        return CachedAsset(key, path, sha, size, rec["meta"])
+
+    def put_file(self, key: str, f: BinaryIO, meta: Optional[Dict[str, Any]] = None) -> CachedAsset:
+        return self.put(key, iter(lambda: f.read(CHUNK), b""), meta)
+
+    def _scan(self) -> Iterator[os.DirEntry]:
+        for sub in os.scandir(self._objects):
+            if sub.is_dir():
+                yield from (e for e in os.scandir(sub.path) if e.is_file())
+
+    def evict(self, keep: str = "") -> int:
+        """Delete least recently used objects (except `keep`) until under max_bytes; returns bytes freed."""
+        with self._lock:
+            objs = sorted(self._scan(), key=lambda e: e.stat().st_mtime)
+            total = sum(e.stat().st_size for e in objs)
+            freed = 0
+            for e in objs:
+                if total - freed <= self.max_bytes:
+                    break
+                if e.path == keep:
+                    continue
+                try:
+                    size = e.stat().st_size
+                    os.remove(e.path)
+                    freed += size
+                except OSError:
+                    continue
+            return freed  # dangling keys are dropped lazily by get()
+
+    def entries(self, prefix: str = "") -> Iterator[CachedAsset]:
+        """Key records whose object is still present (not re-verified; get() does that)."""
+        for e in sorted(os.scandir(self._keys), key=lambda e: e.name):
+            if not e.name.endswith(".json") or not e.name.startswith(_safe_key(prefix)):
+                continue
+            try:
+                with open(e.path, encoding="utf-8") as f:
+                    rec = json.load(f)
+                path = self._object_path(rec["sha256"])
+                if os.path.exists(path):
+                    yield CachedAsset(e.name[:-5], path, rec["sha256"], rec["size"], rec.get("meta") or {})
+            except (OSError, ValueError, KeyError):
+                continue
@@ -0,0 +1,194 @@
+"""
+Batched writes through the core /wp-json/batch/v1 endpoint (WP 5.6+).
+
+Up to 25 POST/PUT/PATCH/DELETE sub-requests travel in one HTTP call and
+come back as one response per sub-request, in order. Writes are queued on a
+BatchWriter and sent when the queue fills or on flush(); each WriteOp gets
+its own status/data, and its on_done callback runs once it is resolved.
+
+Sites without batch support (404 on the route), and routes that do not
+allow batching (rest_batch_not_allowed, e.g. core's media controller), fall
+back to one request per op. A route base that refused once is sent singly
+for the rest of the run instead of riding along in every envelope.
+
+An envelope is only replayed as single requests when the server clearly
+rejected it before running anything. A 5xx or a malformed batch response may
+come after some sub-requests ran, and replaying those creates would duplicate
+them, so their ops fail instead.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Set
+
+import requests
+
+from .client import WPClient
+from .concurrency import map_ordered
+
+BATCH_MAX = 25  # core default for the batch endpoint's maxItems
+
+
+class WPError(RuntimeError):
+    """A non-2xx WordPress response for one request or batch sub-request."""
+
+    def __init__(self, method: str, route: str, status: int, body: Any):
+        self.method = method
+        self.route = route
+        self.status = status
+        self.body = body
+        msg = body.get("message") if isinstance(body, dict) else None
+        super().__init__(f"{method} {route} -> {status} {msg or body}")
+
+    @property
+    def code(self) -> str:
+        return (self.body or {}).get("code", "") if isinstance(self.body, dict) else ""
+
+
+@dataclass
+class WriteOp:
+    method: str
+    route: str
+    body: Optional[dict] = None
+    namespace: str = "wp/v2"
+    on_done: Optional[Callable[["WriteOp"], None]] = field(default=None, repr=False)
+    status: int = 0
+    data: Any = None
+    done: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def path(self) -> str:
+        return f"/{self.namespace}/{self.route.lstrip('/')}"
+
+    @property
+    def base(self) -> str:
+        """Namespace plus first route segment ("wp/v2/media"): batching is allowed or not per controller."""
+        return f"{self.namespace}/{self.route.lstrip('/').split('/', 1)[0]}"
+
+    def error(self) -> WPError:
+        return WPError(self.method, self.route, self.status, self.data)
+
+    def result(self) -> Any:
+        """Response body of a successful op; raises WPError otherwise."""
+        if not self.ok:
+            raise self.error()
+        return self.data
+
+
+class BatchWriter:
+    """Queue of pending writes, sent BATCH_MAX at a time. Safe to share between threads."""
+
+    def __init__(self, client: WPClient, *, size: int = BATCH_MAX, workers: int = 1, enabled: bool = True):
+        self.client = client
+        self.size = max(1, min(size, BATCH_MAX))
+        self.workers = max(1, workers)
+        # None = not probed yet; the first envelope tells us.
+        self.supported: Optional[bool] = None if enabled else False
+        self.requests_sent = 0
+        self._pending: List[WriteOp] = []
+        self._unbatchable: Set[str] = set()  # route bases that answered rest_batch_not_allowed
+        self._lock = threading.Lock()
+
+    def add(self, method: str, route: str, body: Optional[dict] = None, *,
+            namespace: str = "wp/v2", on_done: Optional[Callable[[WriteOp], None]] = None) -> WriteOp:
+        op = WriteOp(method.upper(), route, body, namespace, on_done)
+        with self._lock:
+            self._pending.append(op)
+            full = len(self._pending) >= self.size * self.workers
+        if full:
+            self.flush()
+        return op
+
+    def flush(self) -> List[WriteOp]:
+        """Send everything queued so far; returns the resolved ops in queue order."""
+        with self._lock:
+            ops, self._pending = self._pending, []
+        chunks = [ops[i:i + self.size] for i in range(0, len(ops), self.size)]
+        for chunk, _, exc in map_ordered(self._send_chunk, chunks, self.workers):
+            if exc is not None:
+                for op in chunk:
+                    if not op.status:
+                        op.status, op.data = 0, {"code": "transport_error", "message": str(exc)}
+        for op in ops:
+            if op.on_done:
+                op.on_done(op)
+            op.done = True
+        return ops
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.flush()
+
+    # ---- transport ----
+    def _count(self) -> None:
+        with self._lock:
+            self.requests_sent += 1
+
+    def _send_chunk(self, ops: List[WriteOp]) -> None:
+        with self._lock:
+            singles = [op for op in ops if op.base in self._unbatchable]
+            batchable = [op for op in ops if op.base not in self._unbatchable]
+        if self.supported is not False and len(batchable) > 1:
+            singles += self._send_batch(batchable)
+        else:
+            singles += batchable
+        for op in singles:
+            self._send_single(op)
+
+    def _send_batch(self, ops: List[WriteOp]) -> List[WriteOp]:
+        """Send one envelope; returns the ops that still need a single request."""
+        envelope = {
+            "validation": "normal",
+            "requests": [{"method": op.method, "path": op.path, "body": op.body or {}} for op in ops],
+        }
+        r = self.client.post("", namespace="batch/v1", json=envelope)
+        self._count()
+        if r.status_code in (404, 405, 501):
+            self.supported = False
+            return ops
+        try:
+            js = r.json()
+        except ValueError:
+            js = None
+        responses = js.get("responses") if isinstance(js, dict) else None
+        if 400 <= r.status_code < 500 and responses is None:
+            # refused as a whole before dispatch, e.g. a lowered batch limit (rest_invalid_param)
+            return ops
+        if not r.ok or not isinstance(responses, list) or len(responses) != len(ops):
+            # may have run partly (5xx, proxy timeout, truncated body): replaying creates would duplicate them
+            err = js if isinstance(js, dict) and js.get("code") else {
+                "code": "batch_failed", "message": f"batch envelope -> HTTP {r.status_code}, outcome unknown"}
+            for op in ops:
+                op.status, op.data = r.status_code if not r.ok else 0, err
+            return []
+        self.supported = True
+        retry: List[WriteOp] = []
+        for op, res in zip(ops, responses):
+            body = res.get("body")
+            if isinstance(body, dict) and body.get("code") == "rest_batch_not_allowed":
+                with self._lock:
+                    self._unbatchable.add(op.base)
+                retry.append(op)
+                continue
+            op.status, op.data = int(res.get("status") or 0), body
+        return retry
+
+    def _send_single(self, op: WriteOp) -> None:
+        try:
+            r = self.client.request(op.method, op.route, namespace=op.namespace, json=op.body)
+        except requests.RequestException as e:
+            op.status, op.data = 0, {"code": "transport_error", "message": str(e)}
+            return
+        self._count()
+        op.status = r.status_code
+        try:
+            op.data = r.json() if r.content else {}
+        except ValueError:
+            op.data = {"message": r.text[:500]}
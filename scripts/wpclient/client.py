@@ -0,0 +1,160 @@
+"""
+Pooled WordPress REST client shared by the data-seeding scripts.
+
+One requests.Session per client: keep-alive connections, gzip responses,
+Application Password auth and a default timeout are configured once and
+reused by every call, instead of each seeder paying a TCP+TLS handshake
+per request. Every session also goes through the per-host rate limiter
+and retry policy in governor.py.
+
+Env (optional):
+  WP_POOL_SIZE     - max keep-alive connections per host (default: 10)
+  WP_TIMEOUT_SEC   - default per-request timeout in seconds (default: 30)
+"""
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import rewind_body
+
+from .fields import with_fields
+from .governor import RetryPolicy, governor, log
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 30.0
+USER_AGENT = "wp-seeder/1.0 (+python-requests)"
+
+
+def _env_number(name: str, default: float) -> float:
+    v = os.environ.get(name)
+    try:
+        return float(v) if v not in (None, "") else default
+    except ValueError:
+        return default
+
+
+def _rewindable(request: requests.PreparedRequest) -> bool:
+    body = request.body
+    if body is None or isinstance(body, (bytes, str)):
+        return True
+    if getattr(request, "_body_position", None) is None:
+        return False  # generator / unseekable stream: can't be sent twice
+    rewind_body(request)
+    return True
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with a default timeout, per-host rate limit and retries."""
+
+    def __init__(self, pool_size: int, timeout: float, retry: RetryPolicy | None = None):
+        self.default_timeout = timeout
+        self.retry = retry or RetryPolicy()
+        # pool_block: extra threads wait for a free connection instead of
+        # opening throwaway sockets that are discarded after one request.
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+
+    def send(self, request, timeout=None, **kw):
+        timeout = timeout if timeout is not None else self.default_timeout
+        bucket = governor().bucket(urlsplit(request.url).hostname or "")
+        method = (request.method or "GET").upper()
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                r = super().send(request, timeout=timeout, **kw)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not (self.retry.retry_error(method, e, attempt) and _rewindable(request)):
+                    raise
+                delay, why = self.retry.backoff(attempt), type(e).__name__
+            else:
+                if not (self.retry.retry_response(method, r, attempt) and _rewindable(request)):
+                    return r
+                delay, why = self.retry.delay(r, attempt), str(r.status_code)
+                if r.status_code in (429, 503):
+                    bucket.pause(delay)
+                r.close()
+            attempt += 1
+            log.warning("%s %s -> %s; retry %d/%d in %.1fs",
+                        method, request.url, why, attempt, self.retry.retries, delay)
+            time.sleep(delay)
+
+
+def make_session(
+    auth: Tuple[str, str] | None = None,
+    *,
+    pool_size: int | None = None,
+    timeout: float | None = None,
+    verify: bool = True,
+    user_agent: str = USER_AGENT,
+) -> requests.Session:
+    """Return a keep-alive requests.Session with a sized connection pool.
+
+    Also used for non-WordPress hosts (Pexels); pass no auth there.
+    """
+    size = int(pool_size or _env_number("WP_POOL_SIZE", DEFAULT_POOL_SIZE))
+    adapter = _PooledAdapter(max(1, size), timeout or _env_number("WP_TIMEOUT_SEC", DEFAULT_TIMEOUT))
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update({"User-Agent": user_agent, "Accept-Encoding": "gzip, deflate"})
+    s.verify = verify
+    if auth:
+        s.auth = auth
+    return s
+
+
+class WPClient:
+    """Thin wrapper around a pooled session that knows the site's REST root."""
+
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        app_password: str,
+        *,
+        verify: bool = True,
+        pool_size: int | None = None,
+        timeout: float | None = None,
+        user_agent: str = USER_AGENT,
+    ):
+        self.base = base_url.rstrip("/")
+        self.username = username
+        # App passwords are often displayed with spaces; WP accepts either form.
+        self.auth = (username, (app_password or "").replace(" ", ""))
+        self.session = make_session(
+            self.auth, pool_size=pool_size, timeout=timeout, verify=verify, user_agent=user_agent
+        )
+        self.session.headers["Accept"] = "application/json"
+
+    def url(self, route: str, namespace: str = "wp/v2") -> str:
+        if route.startswith(("http://", "https://")):
+            return route
+        route = route.lstrip("/")
+        return f"{self.base}/wp-json/{namespace}/{route}" if route else f"{self.base}/wp-json/{namespace}"
+
+    def request(self, method: str, route: str, *, namespace: str = "wp/v2",
+                fields: Sequence[str] | None = None, **kw: Any) -> requests.Response:
+        """Send a request; `fields` projects the response via `_fields` (see fields.py)."""
+        if fields:
+            kw["params"] = with_fields(kw.get("params"), fields)
+        return self.session.request(method.upper(), self.url(route, namespace), **kw)
+
+    def get(self, route: str, **kw: Any) -> requests.Response:
+        return self.request("GET", route, **kw)
+
+    def post(self, route: str, **kw: Any) -> requests.Response:
+        return self.request("POST", route, **kw)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "WPClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
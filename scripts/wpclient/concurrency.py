@@ -0,0 +1,152 @@
+"""
+Bounded thread-pool helpers for running independent REST calls in parallel.
+
+requests is synchronous, so parallelism comes from threads sharing the
+pooled session in WPClient (size the pool >= the worker count).
+
+map_ordered fans one call out over many items; run_pipeline chains
+several stages (e.g. download -> upload) so each has its own workers.
+"""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from queue import Queue
+from typing import Any, Callable, Deque, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+Outcome = Tuple[T, "R | None", "BaseException | None"]
+
+
+def _settle(item: T, fut: Future) -> Outcome:
+    try:
+        return item, fut.result(), None
+    except Exception as e:
+        return item, None, e
+
+
+def _windowed(ex: Executor, fn: Callable[[T], R], items: Iterable[T], size: int) -> Iterator[Outcome]:
+    window: Deque[Tuple[T, Future]] = deque()
+    for item in items:
+        window.append((item, ex.submit(fn, item)))
+        if len(window) >= size:
+            yield _settle(*window.popleft())
+    while window:
+        yield _settle(*window.popleft())
+
+
+def map_ordered(fn: Callable[[T], R], items: Iterable[T], workers: int, *,
+                executor: Optional[Executor] = None) -> Iterator[Outcome]:
+    """Yield (item, result, error) for each item, in input order.
+
+    Up to `workers` calls run at once and at most 2*workers are queued, so
+    long inputs are not materialised as futures up front. An exception in
+    one call is returned as `error` for that item instead of aborting the
+    rest. workers <= 1 runs inline with no threads.
+
+    Pass an `executor` (e.g. a ProcessPoolExecutor for CPU-bound work) to
+    submit to it instead; the caller owns it and `workers` only sizes the
+    window. Results are then produced ahead of the consumer while it works.
+    """
+    if executor is not None:
+        yield from _windowed(executor, fn, items, max(1, workers) * 2)
+        return
+
+    if workers <= 1:
+        for item in items:
+            try:
+                yield item, fn(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        yield from _windowed(ex, fn, items, workers * 2)
+
+
+class Stage(NamedTuple):
+    """One pipeline step: `fn(item)` returns the item for the next stage, or None to drop it."""
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+
+
+_DONE = object()
+
+
+def run_pipeline(items: Iterable[Any], stages: Sequence[Stage], *, queue_size: int = 0,
+                 on_error: Optional[Callable[[str, Any, BaseException], None]] = None) -> List[Any]:
+    """Push items through `stages`, each on its own worker threads, joined by bounded queues.
+
+    Every stage runs concurrently with the others, so total time tracks the
+    slowest stage rather than the sum. A queue holds at most `queue_size`
+    items (default: twice the consuming stage's workers), which also bounds
+    how much downloaded data is in flight. A stage exception drops that
+    item and is passed to on_error(stage_name, item, exc). Anything worse (a
+    BaseException, or on_error raising) stops the run: the remaining items
+    are drained unprocessed and the exception is re-raised here. Returns
+    what the last stage produced, in completion order.
+    """
+    queues: List["Queue[Any]"] = [Queue(maxsize=queue_size or 2 * max(1, st.workers)) for st in stages]
+    results: List[Any] = []
+    res_lock = threading.Lock()
+    fatal: List[BaseException] = []  # first entry aborts the run; re-raised after the joins
+
+    def worker(i: int, st: Stage, left: List[int], lock: threading.Lock) -> None:
+        q_in = queues[i]
+        try:
+            while True:
+                item = q_in.get()
+                if item is _DONE:
+                    break
+                if fatal:
+                    continue  # aborting: keep draining so the stage before never blocks on a full queue
+                try:
+                    try:
+                        out = st.fn(item)
+                    except Exception as e:
+                        if on_error:
+                            on_error(st.name, item, e)
+                        continue
+                    if out is None:
+                        continue
+                    if i + 1 < len(stages):
+                        queues[i + 1].put(out)
+                    else:
+                        with res_lock:
+                            results.append(out)
+                except BaseException as e:  # e.g. SystemExit, or on_error itself raising
+                    with res_lock:
+                        fatal.append(e)
+        finally:
+            with lock:
+                left[0] -= 1
+                last = left[0] == 0
+            if last and i + 1 < len(stages):
+                for _ in range(max(1, stages[i + 1].workers)):
+                    queues[i + 1].put(_DONE)
+
+    threads: List[threading.Thread] = []
+    for i, st in enumerate(stages):
+        left, lock = [max(1, st.workers)], threading.Lock()
+        for n in range(left[0]):
+            t = threading.Thread(target=worker, args=(i, st, left, lock), name=f"{st.name}-{n}", daemon=True)
+            t.start()
+            threads.append(t)
+
+    try:
+        for item in items:
+            if fatal:
+                break
+            queues[0].put(item)
+    finally:
+        for _ in range(max(1, stages[0].workers)):
+            queues[0].put(_DONE)
+    for t in threads:
+        t.join()
+    if fatal:
+        raise fatal[0]
+    return results
@@ -0,0 +1,139 @@
+"""
+Client-side image derivatives for the myplugin/v1/media/bundle route.
+
+WordPress normally renders the thumbnail/medium/large sizes itself with
+GD/Imagick on every upload; for bulk seeding that is the CPU hotspot on
+the PHP workers. These helpers render the same sizes locally (Pillow),
+meant to run in a process pool, so the bundle route only has to store
+them.
+
+Images are resized from the original. A PDF's first page is rasterised
+(pypdfium2, or poppler's `pdftoppm` when on PATH) into the `full`
+preview, which the smaller sizes are then derived from.
+
+Pillow is optional: available() is False without it (or without a PDF
+rasteriser for PDFs) and the seeders upload the plain file instead.
+"""
+from __future__ import annotations
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, Optional, Tuple, Union
+
+try:
+    from PIL import Image
+except ImportError:  # optional: seeders fall back to plain uploads
+    Image = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+# WordPress core defaults: (max width, max height, hard crop)
+SIZES: Dict[str, Tuple[int, int, bool]] = {
+    "thumbnail": (150, 150, True),
+    "medium": (300, 300, False),
+    "large": (1024, 1024, False),
+}
+JPEG_QUALITY = 82  # WordPress' default for generated sizes
+PDF_DPI = 100
+
+Source = Union[str, bytes]  # a file path (preferred across processes) or the bytes
+Derivative = Tuple[bytes, int, int, str]  # (data, width, height, mime type)
+
+
+def available(kind: str = "image") -> bool:
+    if Image is None:
+        return False
+    if kind == "pdf":
+        return pypdfium2 is not None or shutil.which("pdftoppm") is not None
+    return True
+
+
+def _open(src: Source) -> "Image.Image":
+    return Image.open(src if isinstance(src, str) else io.BytesIO(src))
+
+
+def _encode(im: "Image.Image", fmt: str) -> Tuple[bytes, str]:
+    buf = io.BytesIO()
+    if fmt == "PNG":
+        im.save(buf, "PNG", optimize=True)
+        return buf.getvalue(), "image/png"
+    if im.mode not in ("RGB", "L"):
+        im = im.convert("RGB")
+    im.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buf.getvalue(), "image/jpeg"
+
+
+def _resize(im: "Image.Image", w: int, h: int, crop: bool) -> Optional["Image.Image"]:
+    """Like WP's image_resize_dimensions: never upscale; crop fills the box from the centre."""
+    if im.width <= w and im.height <= h:
+        return None
+    if crop:
+        scale = max(w / im.width, h / im.height)
+        rw, rh = max(w, round(im.width * scale)), max(h, round(im.height * scale))
+        im = im.resize((rw, rh), Image.LANCZOS)
+        left, top = (rw - w) // 2, (rh - h) // 2
+        return im.crop((left, top, left + w, top + h))
+    out = im.copy()
+    out.thumbnail((w, h), Image.LANCZOS)
+    return out
+
+
+def image_derivatives(src: Source) -> Dict[str, Derivative]:
+    """thumbnail/medium/large for an image (sizes larger than the original are skipped)."""
+    with _open(src) as im:
+        im.load()
+        fmt = "PNG" if im.format == "PNG" else "JPEG"
+        out: Dict[str, Derivative] = {}
+        for name, (w, h, crop) in SIZES.items():
+            r = _resize(im, w, h, crop)
+            if r is not None:
+                data, mime = _encode(r, fmt)
+                out[name] = (data, r.width, r.height, mime)
+        return out
+
+
+def rasterize_pdf(src: Source, dpi: int = PDF_DPI) -> "Image.Image":
+    """First page of a PDF as a Pillow image."""
+    if pypdfium2 is not None:
+        doc = pypdfium2.PdfDocument(src)
+        try:
+            return doc[0].render(scale=dpi / 72).to_pil()
+        finally:
+            doc.close()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = src if isinstance(src, str) else os.path.join(tmp, "in.pdf")
+        if not isinstance(src, str):
+            with open(path, "wb") as f:
+                f.write(src)
+        subprocess.run(
+            ["pdftoppm", "-f", "1", "-l", "1", "-r", str(dpi), "-png", "-singlefile", path,
+             os.path.join(tmp, "page")],
+            check=True, capture_output=True,
+        )
+        with Image.open(os.path.join(tmp, "page.png")) as im:
+            im.load()
+            return im.copy()
+
+
+def pdf_derivatives(src: Source) -> Dict[str, Derivative]:
+    """full (rasterised page 1) plus thumbnail/medium/large, as WP's PDF previews."""
+    page = rasterize_pdf(src).convert("RGB")
+    data, mime = _encode(page, "JPEG")
+    out: Dict[str, Derivative] = {"full": (data, page.width, page.height, mime)}
+    for name, (w, h, crop) in SIZES.items():
+        r = _resize(page, w, h, crop)
+        if r is not None:
+            data, mime = _encode(r, "JPEG")
+            out[name] = (data, r.width, r.height, mime)
+    return out
+
+
+def derive(kind: str, src: Source) -> Dict[str, Derivative]:
+    """Process-pool entry point: kind is "image" or "pdf"."""
+    return pdf_derivatives(src) if kind == "pdf" else image_derivatives(src)
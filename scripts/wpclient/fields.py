@@ -0,0 +1,78 @@
+"""
+Field projection for REST reads.
+
+List responses with `context=edit` carry every item's raw and rendered
+content, which dwarfs the handful of fields the seeders look at. Reads
+declare what they need instead: pass `fields=` to WPClient.get/request or
+iter_items and it goes out as `_fields`.
+
+Helpers that consume listings declare their fields with @uses_fields.
+The listing asks fields_for(helper, ...) for the union, so the projection
+follows the code that reads the items and does not drift from it.
+
+changed_fields() diffs an update body against such a read, so an item
+that already holds the values is not written again.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+ALWAYS = ("id",)
+
+
+def uses_fields(*fields: str) -> Callable[[F], F]:
+    """Declare which item fields a helper reads from the listings it gets."""
+    def deco(fn: F) -> F:
+        fn.wp_fields = tuple(fields)  # type: ignore[attr-defined]
+        return fn
+    return deco
+
+
+def fields_for(*consumers: Any) -> Tuple[str, ...]:
+    """Union of the declared fields of helpers (or plain field names), "id" first."""
+    out: Dict[str, None] = dict.fromkeys(ALWAYS)
+    for c in consumers:
+        if isinstance(c, str):
+            out[c] = None
+        else:
+            out.update(dict.fromkeys(getattr(c, "wp_fields")))
+    return tuple(out)
+
+
+def with_fields(params: Optional[Dict[str, Any]], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """Params with `_fields` set from `fields` (top-level names; "id" is always kept)."""
+    p = dict(params or {})
+    if fields:
+        p["_fields"] = ",".join(fields_for(*fields))
+    return p
+
+
+def project(item: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    return {k: item[k] for k in fields if k in item}
+
+
+def changed_fields(item: Optional[Dict[str, Any]], data: Dict[str, Any]) -> Dict[str, Any]:
+    """The entries of `data` (an update body) that differ from `item` (a read).
+
+    Read the item with `context=edit`: rendered fields ({"raw", "rendered"})
+    compare on raw, and one without raw counts as changed because rendered
+    text says nothing about what was stored. meta compares key by key.
+    """
+    if not item:
+        return dict(data)
+    out: Dict[str, Any] = {}
+    for k, v in data.items():
+        have = item.get(k)
+        if isinstance(v, dict) and k == "meta":
+            have = have if isinstance(have, dict) else {}
+            diff = {mk: mv for mk, mv in v.items() if have.get(mk) != mv}
+            if diff:
+                out[k] = diff
+            continue
+        if isinstance(have, dict) and not isinstance(v, dict):
+            have = have.get("raw", have)
+        if have != v:
+            out[k] = v
+    return out
@@ -0,0 +1,176 @@
+"""
+Rate limiting and retries for every session made by make_session().
+
+One Governor per process holds a token bucket per host. The WordPress
+client and the Pexels session share it, so concurrent workers keep to a
+single request budget per host however many threads or sessions there
+are. A 429/503 with Retry-After pauses the whole host, not just the
+thread that saw it.
+
+RetryPolicy retries transient failures with jittered exponential backoff:
+- connection errors and timeouts;
+- 429, 502, 503 and 504.
+
+Retry-After is honoured when present. A POST is only retried when the
+server cannot have acted on it: a connect timeout, a 429, or a 503. That
+way a create is never sent twice.
+
+Env (optional):
+  WP_RATE_LIMIT    - requests/second per host (default: 20; 0 = unlimited)
+  WP_RATE_LIMITS   - per-host overrides, e.g. "api.pexels.com=2,wp.lan=40"
+  WP_RETRIES       - retries per request after the first attempt (default: 4)
+  WP_BACKOFF_MAX   - cap in seconds for a single backoff/Retry-After wait (default: 60)
+"""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+
+log = logging.getLogger("wpclient")
+
+DEFAULT_RATE = 20.0
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF_MAX = 60.0
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# the server refused these before doing any work, so even a POST is safe to resend
+REFUSED_STATUSES = frozenset({429, 503})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name) or default)
+    except ValueError:
+        return default
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` saved up. rate <= 0 never blocks."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for `seconds` (server asked us to back off)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self.rate <= 0:
+                        return
+                    self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                    self._stamp = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Governor:
+    """Per-host token buckets, created on first use from the env defaults."""
+
+    def __init__(self, rate: Optional[float] = None, overrides: Optional[Dict[str, float]] = None):
+        self.rate = _env_float("WP_RATE_LIMIT", DEFAULT_RATE) if rate is None else rate
+        self.overrides = dict(overrides) if overrides is not None else self._env_overrides()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _env_overrides() -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for part in (os.environ.get("WP_RATE_LIMITS") or "").split(","):
+            host, _, rate = part.partition("=")
+            try:
+                out[host.strip().lower()] = float(rate)
+            except ValueError:
+                continue
+        return out
+
+    def bucket(self, host: str) -> TokenBucket:
+        host = (host or "").lower()
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.overrides.get(host, self.rate))
+            return self._buckets[host]
+
+    def set_rate(self, host: str, rate: float, burst: Optional[float] = None) -> None:
+        """Budget a host explicitly (replaces its bucket)."""
+        host = host.lower()
+        with self._lock:
+            self.overrides[host] = rate
+            self._buckets[host] = TokenBucket(rate, burst)
+
+
+_GOVERNOR: Optional[Governor] = None
+_GOVERNOR_LOCK = threading.Lock()
+
+
+def governor() -> Governor:
+    """The process-wide Governor shared by all sessions."""
+    global _GOVERNOR
+    with _GOVERNOR_LOCK:
+        if _GOVERNOR is None:
+            _GOVERNOR = Governor()
+        return _GOVERNOR
+
+
+def retry_after(r: requests.Response) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), if any."""
+    v = r.headers.get("Retry-After")
+    if not v:
+        return None
+    try:
+        return max(0.0, float(v))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(v).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    def __init__(self, retries: Optional[int] = None, base: float = 0.5, cap: Optional[float] = None):
+        self.retries = int(_env_float("WP_RETRIES", DEFAULT_RETRIES)) if retries is None else retries
+        self.base = base
+        self.cap = _env_float("WP_BACKOFF_MAX", DEFAULT_BACKOFF_MAX) if cap is None else cap
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given 0-based attempt."""
+        return random.uniform(0, min(self.cap, self.base * (2 ** attempt)))
+
+    def delay(self, r: requests.Response, attempt: int) -> float:
+        ra = retry_after(r)
+        return min(self.cap, ra) if ra is not None else self.backoff(attempt)
+
+    def retry_response(self, method: str, r: requests.Response, attempt: int) -> bool:
+        if attempt >= self.retries or r.status_code not in RETRY_STATUSES:
+            return False
+        return method in IDEMPOTENT_METHODS or r.status_code in REFUSED_STATUSES
+
+    def retry_error(self, method: str, e: Exception, attempt: int) -> bool:
+        if attempt >= self.retries or isinstance(e, requests.exceptions.SSLError):
+            return False
+        if isinstance(e, requests.exceptions.ConnectTimeout):
+            return True
+        return method in IDEMPOTENT_METHODS and isinstance(
+            e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+        )
@@ -0,0 +1,133 @@
+"""
+Persistent cache of JSON GET responses for third-party APIs (Pexels).
+
+Responses are kept in a small SQLite file, keyed by URL and sorted
+query params; auth headers are not part of the key. A response younger
+than the TTL is served without any request. An older one is revalidated
+with If-None-Match/If-Modified-Since when the API sent validators, and a
+304 only refreshes its timestamp. Otherwise it is refetched.
+
+Env (optional):
+  API_CACHE_DB   - path of the SQLite file (default: ~/.cache/wp-seeder/api-cache.sqlite3)
+  API_CACHE_TTL  - seconds a response is served without asking (default: 21600 = 6h)
+  API_CACHE      - "0" to disable
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+import requests
+
+DEFAULT_TTL = 6 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key           TEXT PRIMARY KEY,
+    body          TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    fetched_at    REAL NOT NULL
+);
+"""
+
+
+def cache_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if v is not None)
+    return url + ("?" + urlencode(items) if items else "")
+
+
+class ResponseCache:
+    """SQLite-backed JSON response cache. Safe to share between threads."""
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None):
+        self.path = path or os.environ.get("API_CACHE_DB") or os.path.join(
+            os.path.expanduser("~"), ".cache", "wp-seeder", "api-cache.sqlite3"
+        )
+        if ttl is None:
+            try:
+                ttl = float(os.environ.get("API_CACHE_TTL") or DEFAULT_TTL)
+            except ValueError:
+                ttl = DEFAULT_TTL
+        self.ttl = ttl
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = self.revalidated = self.fetched = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """The default cache, or None when API_CACHE=0."""
+        if os.environ.get("API_CACHE", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        return cls()
+
+    def _row(self, key: str) -> Optional[Tuple[str, Optional[str], Optional[str], float]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE key=?", (key,)
+            ).fetchone()
+
+    def _store(self, key: str, body: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, body, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (key, body, etag, last_modified, time.time()),
+            )
+
+    def _touch(self, key: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("UPDATE responses SET fetched_at=? WHERE key=?", (time.time(), key))
+
+    def is_fresh(self, url: str, params: Optional[Dict[str, Any]] = None) -> bool:
+        row = self._row(cache_key(url, params))
+        return bool(row) and time.time() - row[3] < self.ttl
+
+    def get_json(self, s: requests.Session, url: str, params: Optional[Dict[str, Any]] = None,
+                 **kw: Any) -> Any:
+        """GET url as JSON through the cache; raises requests.HTTPError like raise_for_status()."""
+        key = cache_key(url, params)
+        row = self._row(key)
+        if row and time.time() - row[3] < self.ttl:
+            with self._lock:
+                self.hits += 1
+            return json.loads(row[0])
+
+        headers = dict(kw.pop("headers", None) or {})
+        if row and row[1]:
+            headers["If-None-Match"] = row[1]
+        if row and row[2]:
+            headers["If-Modified-Since"] = row[2]
+        r = s.get(url, params=params, headers=headers, **kw)
+        if r.status_code == 304 and row:
+            self._touch(key)
+            with self._lock:
+                self.revalidated += 1
+            return json.loads(row[0])
+        r.raise_for_status()
+        data = r.json()
+        self._store(key, json.dumps(data, ensure_ascii=False), r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        with self._lock:
+            self.fetched += 1
+        return data
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def get_json(s: requests.Session, cache: Optional[ResponseCache], url: str,
+             params: Optional[Dict[str, Any]] = None, **kw: Any) -> Any:
+    """cache.get_json when there is a cache, else a plain GET + raise_for_status + json."""
+    if cache:
+        return cache.get_json(s, url, params, **kw)
+    r = s.get(url, params=params, **kw)
+    r.raise_for_status()
+    return r.json()
@@ -0,0 +1,188 @@
+"""
+Attachment creation for the media seeders.
+
+A core /wp/v2/media POST accepts multipart/form-data. It takes the file in
+`file` and the attachment fields (slug, title, alt_text, caption, meta,
+...) as ordinary form fields. That way the attachment is created fully
+initialised in one request.
+
+Some stacks reject multipart bodies, e.g. WAF rules or PHP upload limits
+that only apply to form uploads. For those, MediaUploader falls back to
+the raw-binary create (Content-Disposition: attachment) and leaves the
+fields for a second write. The first rejection switches the uploader to
+that path for the rest of the run.
+
+File bodies are streamed either way (streams.py): pass an open binary
+file, e.g. from streams.spool(), and it is read in chunks while sending.
+
+create_bundle() instead posts the original together with pre-rendered
+sizes (derivatives.py) and the attachment fields to myplugin/v1/media/bundle
+(the pdf-preview-stub mu-plugin), so WordPress skips its own GD/Imagick
+resizing. Sites without that route fall back to create().
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, BinaryIO, Dict, List, Mapping, Optional, Tuple, Union
+
+import requests
+
+from .batch import WPError
+from .client import WPClient
+from .derivatives import Derivative
+from .streams import BodyStream, multipart_body
+
+Body = Union[bytes, BinaryIO]
+
+# statuses/codes that mean "this server won't take a multipart upload",
+# as opposed to an auth or validation error that would fail either way
+_MULTIPART_REJECTED = frozenset({406, 411, 415, 501})
+
+
+def _rejects_multipart(r: requests.Response) -> bool:
+    if r.status_code in _MULTIPART_REJECTED:
+        return True
+    try:
+        body = r.json()
+    except ValueError:
+        body = None
+    code = body.get("code", "") if isinstance(body, dict) else ""
+    if r.status_code == 400:
+        return code.startswith("rest_upload")  # e.g. rest_upload_no_data: the file part was dropped
+    # a 403 that is not a WordPress error came from something in front of it
+    return r.status_code == 403 and not code
+
+
+def form_fields(fields: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Flatten REST fields into form pairs (meta={"k": v} -> meta[k]=v)."""
+    out: List[Tuple[str, str]] = []
+    for k, v in fields.items():
+        if isinstance(v, dict):
+            out.extend((f"{k}[{sk}]", "" if sv is None else str(sv)) for sk, sv in v.items())
+        elif v is not None:
+            out.append((k, str(v)))
+    return out
+
+
+class MediaUploader:
+    """Creates attachments, multipart first. Safe to share between threads.
+
+    `multipart` is None until the first upload tells us, then True/False;
+    pass multipart=False to go straight to the two-step path.
+    """
+
+    def __init__(self, client: WPClient, *, multipart: bool = True, timeout: float = 90):
+        self.client = client
+        self.timeout = timeout
+        self.multipart: Optional[bool] = None if multipart else False
+        self.bundle: Optional[bool] = None  # myplugin/v1/media/bundle: None = not tried yet
+        self.requests_sent = 0
+        self._lock = threading.Lock()
+
+    def _count(self) -> None:
+        with self._lock:
+            self.requests_sent += 1
+
+    def create(self, filename: str, body: Body, content_type: str,
+               fields: Optional[Dict[str, Any]] = None) -> Tuple[dict, Dict[str, Any]]:
+        """Create the attachment; returns (attachment, fields still to set).
+
+        The second item is empty when the fields went in with the file, and
+        is `fields` itself after the raw-binary fallback. The caller sets them
+        (directly or through a BatchWriter).
+        """
+        fields = dict(fields or {})
+        probing = self.multipart is None  # concurrent first uploads may all be probing
+        if self.multipart is not False:
+            pos = body.tell() if hasattr(body, "tell") else None
+            stream, form_type = multipart_body(form_fields(fields), [("file", filename, body, content_type)])
+            r = self.client.post("media", data=stream, headers={"Content-Type": form_type}, timeout=self.timeout)
+            self._count()
+            if not (probing and _rejects_multipart(r)):
+                if r.ok:
+                    self.multipart = True
+                return self._result(r, "POST", "media"), {}
+            self.multipart = False
+            if pos is not None:
+                body.seek(pos)
+        r = self.client.post(
+            "media",
+            data=BodyStream([body]),
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "Content-Type": content_type,
+            },
+            timeout=self.timeout,
+        )
+        self._count()
+        return self._result(r, "POST", "media"), fields
+
+    def create_bundle(self, filename: str, body: Body, content_type: str, previews: Mapping[str, Derivative],
+                      fields: Optional[Dict[str, Any]] = None) -> Tuple[dict, Dict[str, Any]]:
+        """Upload the original, pre-rendered sizes and fields in one request; returns (attachment, fields to set).
+
+        The route reports which fields it applied; the rest (all of them, from
+        an older copy of the mu-plugin) come back to be set. Without previews,
+        or when the route is missing, this is create().
+        """
+        fields = dict(fields or {})
+        if previews and self.bundle is not False:
+            stem = os.path.splitext(filename)[0]
+            files = [("pdf", filename, body, content_type)]  # the route's name for the original, any type
+            for name, (data, w, h, mime) in previews.items():
+                suffix = "-pdf" if name == "full" else f"-{w}x{h}"
+                files.append((f"previews[{name}]", f"{stem}{suffix}{'.png' if mime == 'image/png' else '.jpg'}",
+                              data, mime))
+            dims = {name: {"width": w, "height": h} for name, (_, w, h, _) in previews.items()}
+            pos = body.tell() if hasattr(body, "tell") else None
+            stream, form_type = multipart_body([*form_fields(fields), ("dimensions", json.dumps(dims))], files)
+            r = self.client.post("media/bundle", namespace="myplugin/v1", data=stream,
+                                 headers={"Content-Type": form_type}, timeout=self.timeout)
+            self._count()
+            if r.status_code != 404:
+                try:
+                    res = r.json()
+                except ValueError:
+                    res = r.text[:500]
+                if not r.ok or not isinstance(res, dict) or not res.get("attachment_id"):
+                    raise WPError("POST", "myplugin/v1/media/bundle", r.status_code, res)
+                self.bundle = True
+                applied = set(res.get("fields") or ())
+                # the sent values stand in for the REST read of the applied fields (raw, as in context=edit)
+                created = {k: v for k, v in fields.items() if k in applied}
+                created.update(id=int(res["attachment_id"]), media_details=res.get("metadata"))
+                if res.get("slug"):
+                    created["slug"] = res["slug"]
+                return created, {k: v for k, v in fields.items() if k not in applied}
+            self.bundle = False
+            if pos is not None:
+                body.seek(pos)
+        return self.create(filename, body, content_type, fields)
+
+    def upload(self, filename: str, body: Body, content_type: str,
+               fields: Optional[Dict[str, Any]] = None,
+               previews: Optional[Mapping[str, Derivative]] = None) -> dict:
+        """create() (create_bundle() with previews) and set any remaining fields right away."""
+        if previews:
+            created, left = self.create_bundle(filename, body, content_type, previews, fields)
+        else:
+            created, left = self.create(filename, body, content_type, fields)
+        if not left:
+            return created
+        r = self.client.post(f"media/{created['id']}", json=left, timeout=30)
+        self._count()
+        return self._result(r, "POST", f"media/{created['id']}")
+
+    @staticmethod
+    def _result(r: requests.Response, method: str, route: str) -> dict:
+        try:
+            body = r.json()
+        except ValueError:
+            body = r.text[:500]
+        if not r.ok:
+            raise WPError(method, route, r.status_code, body)
+        if not isinstance(body, dict) or not body.get("id"):
+            raise WPError(method, route, r.status_code, f"no attachment id in response: {body!r}"[:500])
+        return body
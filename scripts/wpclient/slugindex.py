@@ -0,0 +1,116 @@
+"""
+slug -> item index for one REST collection, so upserts don't spend a
+`?slug=` GET per object.
+
+Fill it either with one paged sweep of the whole collection (sweep) or
+with comma-separated multi-slug queries for the slugs you are about to
+write (prefetch, 100 per request). Lookups of slugs that neither covered
+fall back to a single query. Record creates with put() so later lookups
+in the same run see them.
+
+Given a StateStore, preload() takes the collection from the local sync
+state instead (see state.py) and put() keeps that state current.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .client import WPClient
+from .fields import project
+from .paging import PER_PAGE_MAX, iter_items
+from .state import StateStore, SyncedCollection
+
+DEFAULT_FIELDS = ("id", "slug", "modified_gmt")
+
+
+class SlugIndex:
+    def __init__(self, client: WPClient, route: str, *, fields: Sequence[str] = DEFAULT_FIELDS,
+                 params: Optional[Dict[str, Any]] = None, store: Optional[StateStore] = None):
+        self.client = client
+        self.route = route
+        self.fields = list(dict.fromkeys(["id", "slug", *fields]))
+        self.params = dict(params or {})
+        self.synced = SyncedCollection(client, store, route, fields=self.fields, params=self.params) if store else None
+        self.complete = False  # True after sweep(): unknown slug == does not exist
+        self._items: Dict[str, dict] = {}
+        self._missing: set = set()
+        self._lock = threading.Lock()
+
+    def sweep(self) -> "SlugIndex":
+        """Load every item of the collection (one paged pass)."""
+        items = list(iter_items(self.client, self.route, self.params, fields=self.fields))
+        with self._lock:
+            for it in items:
+                self._items.setdefault(it.get("slug") or "", it)
+            self.complete = True
+        return self
+
+    def preload(self, slugs: Iterable[str]) -> "SlugIndex":
+        """Load from the sync state if there is one, else prefetch just these slugs."""
+        if self.synced:
+            return self.load(self.synced.load().values())
+        return self.prefetch(slugs)
+
+    def load(self, items: Iterable[dict]) -> "SlugIndex":
+        """Adopt a complete listing obtained elsewhere (e.g. a SyncedCollection)."""
+        with self._lock:
+            for it in items:
+                self._items.setdefault(it.get("slug") or "", it)
+            self.complete = True
+        return self
+
+    def prefetch(self, slugs: Iterable[str]) -> "SlugIndex":
+        """Look up many slugs at once; slugs not returned are remembered as missing."""
+        if self.complete:
+            return self
+        with self._lock:
+            todo = [s for s in dict.fromkeys(slugs)
+                    if s and s not in self._items and s not in self._missing]
+        for i in range(0, len(todo), PER_PAGE_MAX):
+            chunk = todo[i:i + PER_PAGE_MAX]
+            found = self._fetch(chunk)
+            with self._lock:
+                for it in found:
+                    self._items.setdefault(it.get("slug") or "", it)
+                self._missing.update(s for s in chunk if s not in self._items)
+        return self
+
+    def _fetch(self, slugs: List[str]) -> List[dict]:
+        r = self.client.get(self.route, params={**self.params, "slug": ",".join(slugs), "per_page": PER_PAGE_MAX},
+                            fields=self.fields)
+        r.raise_for_status()
+        js = r.json()
+        return js if isinstance(js, list) else []
+
+    def get(self, slug: str) -> Optional[dict]:
+        with self._lock:
+            if slug in self._items:
+                return self._items[slug]
+            if self.complete or slug in self._missing:
+                return None
+        self.prefetch([slug])
+        with self._lock:
+            return self._items.get(slug)
+
+    def put(self, item: dict) -> None:
+        """Record a created/updated item (e.g. from a write response)."""
+        slug = item.get("slug")
+        if not slug:
+            return
+        with self._lock:
+            self._items[slug] = project(item, self.fields)
+            self._missing.discard(slug)
+        if self.synced:
+            self.synced.put(item)
+
+    def items(self) -> List[dict]:
+        with self._lock:
+            return list(self._items.values())
+
+    def __contains__(self, slug: str) -> bool:
+        return self.get(slug) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
@@ -0,0 +1,195 @@
+"""
+Local sync state so seeders don't re-download the whole remote inventory
+on every run.
+
+A SQLite file (one per user, rows keyed by site URL) keeps the projected
+items of each collection the seeders read: address csv_id -> post id,
+branch term ids, media slugs, page/post fingerprints. On the next run a
+SyncedCollection revalidates instead of rebuilding:
+
+  1. one `per_page=1` GET for X-WP-Total,
+  2. for post types, one `modified_after=<last seen modified>` GET for
+     whatever changed since,
+  3. if the merged count matches X-WP-Total the cache is used, otherwise
+     (deletions, other writers, field set changed) it falls back to a
+     full paged sweep and rewrites the cache.
+
+Collections without `modified` (terms) cannot be revalidated that way: a
+rename, re-parent or meta change keeps the count. They are swept on every
+run; the store only keeps them in step for this run's writes.
+
+Env (optional):
+  SEED_STATE_DB   - path of the SQLite file (default: ~/.cache/wp-seeder/state.sqlite3)
+  SEED_STATE      - "0" to disable the cache and always sweep
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from .client import WPClient
+from .fields import project
+from .paging import iter_items
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    site      TEXT NOT NULL,
+    kind      TEXT NOT NULL,
+    fields    TEXT NOT NULL,
+    watermark TEXT,
+    synced_at REAL,
+    PRIMARY KEY (site, kind)
+);
+CREATE TABLE IF NOT EXISTS items (
+    site TEXT    NOT NULL,
+    kind TEXT    NOT NULL,
+    id   INTEGER NOT NULL,
+    data TEXT    NOT NULL,
+    PRIMARY KEY (site, kind, id)
+);
+"""
+
+
+def default_state_path() -> str:
+    return os.environ.get("SEED_STATE_DB") or os.path.join(
+        os.path.expanduser("~"), ".cache", "wp-seeder", "state.sqlite3"
+    )
+
+
+class StateStore:
+    """SQLite-backed item cache for one site. Safe to share between threads."""
+
+    def __init__(self, site: str, path: Optional[str] = None):
+        self.site = site.rstrip("/")
+        self.path = path or default_state_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_client(cls, client: WPClient) -> Optional["StateStore"]:
+        """Store for the client's site, or None when SEED_STATE=0."""
+        if os.environ.get("SEED_STATE", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        return cls(client.base)
+
+    def load(self, kind: str, fields: str) -> Tuple[Dict[int, dict], Optional[str]]:
+        """Cached items and watermark; empty if never synced or synced with other fields."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fields, watermark FROM collections WHERE site=? AND kind=?", (self.site, kind)
+            ).fetchone()
+            if not row or row[0] != fields:
+                return {}, None
+            items = {
+                int(i): json.loads(d)
+                for i, d in self._db.execute(
+                    "SELECT id, data FROM items WHERE site=? AND kind=?", (self.site, kind)
+                )
+            }
+        return items, row[1]
+
+    def save(self, kind: str, fields: str, items: Dict[int, dict], watermark: Optional[str]) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM items WHERE site=? AND kind=?", (self.site, kind))
+            self._db.executemany(
+                "INSERT INTO items (site, kind, id, data) VALUES (?, ?, ?, ?)",
+                [(self.site, kind, i, json.dumps(it, ensure_ascii=False)) for i, it in items.items()],
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO collections (site, kind, fields, watermark, synced_at) VALUES (?, ?, ?, ?, ?)",
+                (self.site, kind, fields, watermark, time.time()),
+            )
+
+    def put(self, kind: str, item_id: int, item: dict) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO items (site, kind, id, data) VALUES (?, ?, ?, ?)",
+                (self.site, kind, item_id, json.dumps(item, ensure_ascii=False)),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _rewind(watermark: str) -> str:
+    """One second before the watermark: modified_after is exclusive and second-granular."""
+    try:
+        return (datetime.fromisoformat(watermark) - timedelta(seconds=1)).isoformat()
+    except ValueError:
+        return watermark
+
+
+class SyncedCollection:
+    """Projected items of one REST collection, cached in a StateStore between runs.
+
+    `deltas` uses `modified_after`, which only post-type routes support;
+    without it (terms) every load() is a full sweep, since a count check
+    cannot see edits. With store=None it is just a projected paged sweep.
+    """
+
+    def __init__(self, client: WPClient, store: Optional[StateStore], route: str, *,
+                 fields: Sequence[str], params: Optional[Dict[str, Any]] = None, deltas: bool = True):
+        self.client = client
+        self.store = store
+        self.route = route
+        self.params = dict(params or {})
+        self.deltas = deltas
+        self.fields = list(dict.fromkeys(["id", *fields, *(["modified"] if deltas else [])]))
+        self.kind = route + ("?" + urlencode(sorted(self.params.items())) if self.params else "")
+        self.synced_from_cache = False
+        self._items: Dict[int, dict] = {}
+
+    def _remote_total(self) -> int:
+        r = self.client.get(self.route, params={**self.params, "per_page": 1}, fields=("id",))
+        r.raise_for_status()
+        try:
+            return int(r.headers.get("X-WP-Total", "-1"))
+        except ValueError:
+            return -1
+
+    def _watermark(self) -> Optional[str]:
+        stamps = [it.get("modified") for it in self._items.values() if it.get("modified")]
+        return max(stamps) if stamps else None
+
+    def load(self) -> Dict[int, dict]:
+        """id -> projected item, revalidated against the site."""
+        sig = ",".join(self.fields)
+        cached, watermark = self.store.load(self.kind, sig) if self.store and self.deltas else ({}, None)
+        if cached:
+            total = self._remote_total()
+            if watermark:
+                delta = {**self.params, "modified_after": _rewind(watermark)}
+                for it in iter_items(self.client, self.route, delta, fields=self.fields):
+                    cached[int(it["id"])] = it
+            if len(cached) == total:
+                self._items = cached
+                self.synced_from_cache = True
+                self.store.save(self.kind, sig, self._items, self._watermark())
+                return self._items
+        self._items = {int(it["id"]): it for it in iter_items(self.client, self.route, self.params, fields=self.fields)}
+        self.synced_from_cache = False
+        if self.store:
+            self.store.save(self.kind, sig, self._items, self._watermark())
+        return self._items
+
+    def values(self) -> Iterable[dict]:
+        return list(self._items.values())
+
+    def put(self, item: dict) -> None:
+        """Record a write response so the cache stays in step with the site."""
+        if not item or "id" not in item:
+            return
+        proj = project(item, self.fields)
+        self._items[int(item["id"])] = proj
+        if self.store:
+            self.store.put(self.kind, int(item["id"]), proj)
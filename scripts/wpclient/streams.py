@@ -0,0 +1,140 @@
+"""
+Bounded-memory request and response bodies for large media.
+
+spool() copies a streamed response into a SpooledTemporaryFile in fixed
+chunks. A small file stays in memory. A large one (Pexels originals run
+to tens of MB) goes to disk, so a download costs at most `max_memory`
+bytes of RAM whatever its size.
+
+BodyStream joins byte strings and file objects into one seekable, sized
+request body that is read lazily. multipart_body() uses it to build a
+multipart/form-data upload without loading the file. requests'
+files= encoder would do exactly that. Because the body is seekable, the
+retry policy can rewind it and resend.
+"""
+from __future__ import annotations
+
+import io
+import os
+import tempfile
+import uuid
+from typing import BinaryIO, Iterable, List, Sequence, Tuple, Union
+
+import requests
+
+CHUNK = 64 * 1024
+SPOOL_MAX_MEMORY = 1024 * 1024  # bytes kept in RAM before spilling to a temp file
+
+Part = Union[bytes, BinaryIO]
+
+
+def spool(r: requests.Response, *, max_memory: int = SPOOL_MAX_MEMORY,
+          chunk: int = CHUNK) -> Tuple[BinaryIO, int]:
+    """Copy a `stream=True` response into a spooled temp file; returns (file at 0, size)."""
+    f = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    size = 0
+    try:
+        for block in r.iter_content(chunk):
+            f.write(block)
+            size += len(block)
+    except BaseException:
+        f.close()
+        raise
+    finally:
+        r.close()
+    f.seek(0)
+    return f, size
+
+
+def _size(part: Part) -> int:
+    if isinstance(part, (bytes, bytearray)):
+        return len(part)
+    pos = part.tell()
+    end = part.seek(0, os.SEEK_END)
+    part.seek(pos)
+    return end - pos
+
+
+class BodyStream(io.RawIOBase):
+    """Read-only concatenation of parts with a known total length.
+
+    File parts are read from their position at construction time and never
+    held in memory; `len()` lets requests send a Content-Length instead of
+    chunked encoding.
+    """
+
+    def __init__(self, parts: Iterable[Part]):
+        super().__init__()
+        self._parts: List[Tuple[Part, int, int]] = []  # (part, start offset in part, size)
+        for p in parts:
+            start = 0 if isinstance(p, (bytes, bytearray)) else p.tell()
+            self._parts.append((p, start, _size(p)))
+        self._len = sum(n for _, _, n in self._parts)
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self._len}[whence]
+        self._pos = max(0, min(self._len, base + offset))
+        return self._pos
+
+    def readinto(self, buf) -> int:
+        n = 0
+        want = len(buf)
+        offset = 0
+        for part, start, size in self._parts:
+            if n >= want:
+                break
+            if self._pos < offset + size:
+                rel = self._pos - offset
+                take = min(size - rel, want - n)
+                if isinstance(part, (bytes, bytearray)):
+                    data = part[rel:rel + take]
+                else:
+                    part.seek(start + rel)
+                    data = part.read(take)
+                buf[n:n + len(data)] = data
+                n += len(data)
+                self._pos += len(data)
+                if len(data) < take:
+                    break  # underlying file shrank; report what we have
+            offset += size
+        return n
+
+
+def _quote(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\r", " ").replace("\n", " ")
+
+
+def multipart_body(fields: Iterable[Tuple[str, str]],
+                   files: Sequence[Tuple[str, str, Part, str]]) -> Tuple[BodyStream, str]:
+    """Streamed multipart/form-data body; returns (body, Content-Type header).
+
+    `files` are (field name, filename, content, content type) tuples.
+    """
+    boundary = uuid.uuid4().hex
+    parts: List[Part] = []
+    head = bytearray()
+    for name, value in fields:
+        head += (f"--{boundary}\r\n"
+                 f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n').encode()
+        head += str(value).encode("utf-8") + b"\r\n"
+    for field, filename, content, content_type in files:
+        head += (f"--{boundary}\r\n"
+                 f'Content-Disposition: form-data; name="{_quote(field)}"; filename="{_quote(filename)}"\r\n'
+                 f"Content-Type: {content_type}\r\n\r\n").encode()
+        parts += [bytes(head), content]
+        head = bytearray(b"\r\n")
+    parts.append(bytes(head) + f"--{boundary}--\r\n".encode())
+    return BodyStream(parts), f"multipart/form-data; boundary={boundary}"
@@ -5,7 +5,11 @@
  *
  * Accepts one PDF plus previews labeled 'full','thumbnail','medium','large',
  * moves all into the same YYYY/MM folder, and injects metadata exactly
- * as set-meta-1064.php would.
+ * as set-meta-1064.php would. An image original (sent in the same 'pdf'
+ * field, without a 'full' preview) gets its own size in the metadata.
+ * The attachment fields (slug, title, alt_text, caption and registered
+ * meta) can come in the same request, so the attachment is complete once
+ * it exists; the response lists the fields it applied.
  * Access restricted to Editors and Administrators.
  */
 
@@ -51,14 +55,42 @@ function mp_handle_pdf_with_previews(WP_REST_Request $request) {
     $year_month = dirname($relative);
     $baseurl    = trailingslashit($upload_dir['baseurl']).$year_month.'/';
 
-    // 3) Create attachment post
-    $attach_id = wp_insert_attachment([
+    // 3) Create attachment post (with the REST-style fields, when sent)
+    $applied = [];
+    $post = [
         'post_mime_type'=> $move_pdf['type'],
         'post_title'    => sanitize_file_name(pathinfo($move_pdf['file'], PATHINFO_FILENAME)),
         'post_status'   => 'inherit',
-    ], $move_pdf['file']);
+    ];
+    if($request->has_param('title'))   { $post['post_title']   = sanitize_text_field($request->get_param('title')); $applied[] = 'title'; }
+    if($request->has_param('slug'))    { $post['post_name']    = sanitize_title($request->get_param('slug'));       $applied[] = 'slug'; }
+    if($request->has_param('caption')) { $post['post_excerpt'] = wp_kses_post($request->get_param('caption'));      $applied[] = 'caption'; }
+    $attach_id = wp_insert_attachment(wp_slash($post), $move_pdf['file'], 0, true);
+    if(is_wp_error($attach_id)) {
+        mp_log('Error creating attachment: '.$attach_id->get_error_message());
+        return new WP_Error('insert_error',$attach_id->get_error_message(),['status'=>500]);
+    }
     mp_log('Attachment ID: '.$attach_id);
 
+    if($request->has_param('alt_text')) {
+        update_post_meta($attach_id, '_wp_attachment_image_alt', wp_slash(sanitize_text_field($request->get_param('alt_text'))));
+        $applied[] = 'alt_text';
+    }
+    // only meta registered for REST on attachments, like /wp/v2/media would accept
+    $meta_in = $request->get_param('meta');
+    if(is_array($meta_in) && $meta_in) {
+        $registered = get_registered_meta_keys('post', 'attachment');
+        $unknown = array_diff(array_keys($meta_in), array_keys(array_filter($registered, function($args) {
+            return !empty($args['show_in_rest']);
+        })));
+        foreach($meta_in as $key => $value) {
+            if(in_array($key, $unknown, true)) { continue; }
+            update_post_meta($attach_id, $key, wp_slash($value));
+        }
+        if(!$unknown) { $applied[] = 'meta'; }
+        else { mp_log('Ignored unregistered meta: '.implode(',', $unknown)); }
+    }
+
     // 4) Set _wp_attached_file
     update_post_meta($attach_id, '_wp_attached_file', $relative);
     mp_log('_wp_attached_file set: '.$relative);
@@ -123,6 +155,13 @@ function mp_handle_pdf_with_previews(WP_REST_Request $request) {
         remove_filter('upload_dir','__return_false');
     }
 
+    // 6b) Image originals (no 'full' preview): base on the original itself
+    if($meta['file']==='' && wp_attachment_is_image($attach_id)) {
+        $info = getimagesize($move_pdf['file']);
+        $meta['file'] = $relative;
+        if($info) list($meta['width'],$meta['height']) = $info;
+    }
+
     // 7) Persist metadata
     delete_post_meta($attach_id, '_wp_attachment_metadata');
     update_post_meta($attach_id, '_wp_attachment_metadata', $meta);
@@ -134,5 +173,10 @@ function mp_handle_pdf_with_previews(WP_REST_Request $request) {
     mp_log("GUID updated: {$guid}");
     mp_log('=== Completed metadata injection ===');
 
-    return rest_ensure_response(['attachment_id'=>$attach_id,'metadata'=>$meta]);
+    return rest_ensure_response([
+        'attachment_id' => $attach_id,
+        'metadata'      => $meta,
+        'slug'          => get_post_field('post_name', $attach_id),
+        'fields'        => $applied,
+    ]);
 }
\ No newline at end of file
@@ -0,0 +1,31 @@
+<?php
+/**
+ * Plugin Name: Seed Fingerprint Meta
+ * Description: Exposes a `seed_fingerprint` meta field in REST so the data seeders can skip rewriting unchanged content, and a `seed_sha256` attachment meta so they can skip re-uploading identical files.
+ * Version: 1.2.0
+ */
+
+defined('ABSPATH') || exit;
+
+add_action('init', function () {
+    // address: per-row fingerprint of offices.csv, so the office importers only push changed rows
+    foreach (['post', 'page', 'address'] as $type) {
+        register_post_meta($type, 'seed_fingerprint', [
+            'type'              => 'string',
+            'single'            => true,
+            'show_in_rest'      => true,
+            'auth_callback'     => function () { return current_user_can('edit_posts'); },
+            'sanitize_callback' => 'sanitize_text_field',
+        ]);
+    }
+});
+
+add_action('init', function () {
+    register_post_meta('attachment', 'seed_sha256', [
+        'type'              => 'string',
+        'single'            => true,
+        'show_in_rest'      => true,
+        'auth_callback'     => function () { return current_user_can('upload_files'); },
+        'sanitize_callback' => 'sanitize_text_field',
+    ]);
+});